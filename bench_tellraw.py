@@ -0,0 +1,1083 @@
+#!/usr/bin/env python3
+"""
+tellraw.py 性能测试
+  batch: 比较逐条调用generate_tellraw_commands、批量接口generate_tellraw_commands_many
+         以及只取一个版本命令的TellrawConverter的吞吐量
+  pack:  测试数据包目录转换在不同进程数下的耗时和加速比，以及增量转换无改动重建的耗时
+  bigfile: 比较大文件的内存映射转换、逐行转换和直接复制文件的吞吐量
+  diskcache: 比较不使用磁盘缓存、磁盘缓存为空和磁盘缓存已有结果时批量生成的吞吐量
+  parallel: 测试generate_tellraw_commands_parallel在1、2、4、8、16个工作进程下的吞吐量和加速比
+  formatting: 测试parse_minecraft_formatting处理长文本的耗时，可与其他版本的tellraw.py比较
+  snbt: 测试深层嵌套nbt参数的转换耗时，可与其他版本的tellraw.py比较
+  startup: 测试导入tellraw和单次命令行转换的启动耗时，超出预算时以状态1退出
+  socket: 套接字服务的负载测试客户端，报告吞吐量和延迟百分位数
+  suite: 分别测试转换流程中各个函数在small、typical、pathological语料上的吞吐量、
+         p50/p99延迟和峰值内存，结果以JSON格式保存，可与保存的基准结果比较
+  adversarial: 用构造的畸形输入（不成对的括号、连续的{、超长hasitem数组等）测试各公开函数，
+         单次调用超出时间预算或耗时随输入长度超线性增长时以状态1退出
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import signal
+import subprocess
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import tellraw
+
+# 测试语料中使用的选择器和消息
+SELECTORS = [
+    '@a',
+    '@s',
+    '@p[r=10]',
+    '@a[r=10,rm=2,c=-3]',
+    '@e[type=zombie,distance=..20,limit=5,sort=nearest]',
+    '@a[gamemode=!spectator,level=10..30,tag=boss]',
+    '@initiator[m=default,l=20,lm=5]',
+    '@e[hasitem={item=diamond,quantity=3..,location=slot.weapon.mainhand}]',
+    '@a[nbt={SelectedItem:{id:"minecraft:diamond_sword",Count:1b}},team=red]',
+    '@r[x_rotation=-45..45,y_rotation=90,scores={kills=5..}]',
+    '@a[family=monster, haspermission={camera=enabled}, rx=30, rxm=-30]',
+    '@p[sort=random,limit=3,predicate=ns:p,advancements={story/root=true}]',
+]
+
+MESSAGES = [
+    'Hello world',
+    '§aGreen §lbold§r text',
+    '§6[系统] §e欢迎来到服务器！',
+    '§c§l警告：§r§7请勿在此区域建造',
+    '§x§m删除线§r和§n下划线§r',
+    '§1§2§3§4§5§6§7§8§9§0§a§b§c§d§e§f多彩文字',
+]
+
+
+def build_corpus(size, seed=0):
+    """生成固定随机种子的(选择器, 消息, m_n_handling)记录"""
+    rng = random.Random(seed)
+    return [(rng.choice(SELECTORS), rng.choice(MESSAGES), rng.choice(['none', 'color', 'font']))
+            for _ in range(size)]
+
+
+def run_loop(corpus):
+    """逐条调用generate_tellraw_commands"""
+    count = 0
+    for selector, message, m_n_handling in corpus:
+        tellraw.generate_tellraw_commands(selector, message, m_n_handling)
+        count += 1
+    return count
+
+
+def run_many(corpus):
+    """使用批量接口generate_tellraw_commands_many"""
+    count = 0
+    for _ in tellraw.generate_tellraw_commands_many(corpus):
+        count += 1
+    return count
+
+
+def run_converter_bedrock(corpus):
+    """使用TellrawConverter.convert_many，只取基岩版命令"""
+    count = 0
+    for result in tellraw.TellrawConverter().convert_many(corpus):
+        result.bedrock_command
+        count += 1
+    return count
+
+
+def measure(func, corpus, repeat):
+    """多次运行取最快的一次，返回每秒处理的记录数"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = func(corpus)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count / best
+
+
+def run_batch_benchmark(args):
+    """批量接口吞吐量测试"""
+    corpus = build_corpus(args.size, args.seed)
+
+    # 确认两种方式的结果完全一致
+    if list(tellraw.generate_tellraw_commands_many(corpus[:500])) != [
+            tellraw.generate_tellraw_commands(*record) for record in corpus[:500]]:
+        raise SystemExit('批量接口的结果与逐条调用不一致')
+
+    # 不使用选择器缓存的逐条调用作为基准
+    tellraw.configure_selector_cache(0)
+    uncached_rate = measure(run_loop, corpus, args.repeat)
+    tellraw.configure_selector_cache(args.selector_cache)
+    loop_rate = measure(run_loop, corpus, args.repeat)
+    tellraw.clear_selector_cache()
+    many_rate = measure(run_many, corpus, args.repeat)
+    bedrock_rate = measure(run_converter_bedrock, corpus, args.repeat)
+    info = tellraw.selector_cache_info()
+    print(f'记录数: {args.size}')
+    print(f'generate_tellraw_commands 循环（无缓存）: {uncached_rate:12.0f} 条/秒')
+    print(f'generate_tellraw_commands 循环:           {loop_rate:12.0f} 条/秒  加速比 {loop_rate / uncached_rate:.2f}x')
+    print(f'generate_tellraw_commands_many:           {many_rate:12.0f} 条/秒  加速比 {many_rate / uncached_rate:.2f}x')
+    print(f'TellrawConverter（只取基岩版命令）:       {bedrock_rate:12.0f} 条/秒  加速比 {bedrock_rate / uncached_rate:.2f}x')
+    print(f'选择器缓存: 命中 {info.hits}  未命中 {info.misses}  大小 {info.currsize}/{info.maxsize}')
+    if args.stages:
+        # 关闭选择器缓存，使每条记录都经过选择器的全部阶段
+        tellraw.configure_selector_cache(0)
+        with tellraw.StageTimings() as timings:
+            run_many(corpus)
+        tellraw.configure_selector_cache(args.selector_cache)
+        print('各阶段耗时（不使用选择器缓存）:')
+        print(timings.format_report())
+    if args.memory_report:
+        # 选择器缓存保持开启，与实际批量转换相同
+        tellraw.clear_selector_cache()
+        with tellraw.MemoryReport() as report:
+            run_many(corpus)
+        print(report.format_report())
+    if args.rule_stats:
+        # 同样关闭选择器缓存，统计每条记录实际触发的转换规则
+        tellraw.configure_selector_cache(0)
+        with tellraw.RuleStats() as stats:
+            run_many(corpus)
+        tellraw.configure_selector_cache(args.selector_cache)
+        stats.save(args.rule_stats)
+        summary = stats.as_dict()
+        print(f'规则触发: 共 {summary["total_fires"]} 次，有损 {summary["lossy_fires"]} 次，已写入 {args.rule_stats}')
+        for rule, entry in list(summary['rules'].items())[:10]:
+            lossy = '  有损' if entry['lossy'] else ''
+            print(f'  {rule:<32s}{entry["count"]:>10d} 次  {entry["total_ns"] / 1e6:>10.2f} 毫秒{lossy}')
+
+
+# 并行测试使用的选择器模板，随机数值使大部分选择器不同，选择器缓存基本不会命中
+PARALLEL_SELECTOR_TEMPLATES = [
+    '@a[r={0},rm={1},c=-{2}]',
+    '@e[type=zombie,distance=..{0},limit={2},sort=nearest,tag=t{1}]',
+    '@initiator[m=default,l={0},lm={1},scores={{kills={2}..}}]',
+    '@e[hasitem={{item=diamond,quantity={2}..,location=slot.weapon.mainhand}},r={0}]',
+    '@a[nbt={{SelectedItem:{{id:"minecraft:diamond_sword",Count:{2}b}}}},team=t{1}]',
+    '@a[family=monster, haspermission={{camera=enabled}}, rx={0}, rxm=-{1}]',
+]
+
+
+def build_parallel_corpus(size, seed=0):
+    """生成选择器各不相同的(选择器, 消息, m_n_handling)记录，每条记录都要完整转换选择器"""
+    rng = random.Random(seed)
+    return [(rng.choice(PARALLEL_SELECTOR_TEMPLATES).format(rng.randint(1, 90), rng.randint(1, 90), rng.randint(1, 9)),
+             rng.choice(MESSAGES), rng.choice(['none', 'color', 'font']))
+            for _ in range(size)]
+
+
+def run_parallel_benchmark(args):
+    """多进程批量生成在不同工作进程数下的扩展性测试"""
+    corpus = build_parallel_corpus(args.size, args.seed)
+    worker_counts = [int(workers) for workers in args.workers.split(',')]
+    print(f'记录数: {args.size}  任务块大小: {args.chunk_size}  CPU核心数: {os.cpu_count()}')
+    reference = None
+    baseline = None
+    for workers in worker_counts:
+        best = None
+        for _ in range(args.repeat):
+            tellraw.clear_selector_cache()
+            digest = hashlib.sha256()
+            start = time.perf_counter()
+            for result in tellraw.generate_tellraw_commands_parallel(corpus, jobs=workers,
+                                                                     chunk_size=args.chunk_size):
+                digest.update(repr(result).encode('utf-8'))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        # 不同进程数的结果必须完全相同
+        if reference is None:
+            reference = digest.digest()
+        elif digest.digest() != reference:
+            raise SystemExit(f'{workers}个工作进程的结果与之前不一致')
+        baseline = baseline or best * worker_counts[0]
+        print(f'workers={workers:<3d} {best:8.3f} 秒  {args.size / best:12.0f} 条/秒  '
+              f'加速比 {baseline / best:5.2f}x  效率 {baseline / best / workers:5.0%}')
+
+
+def build_big_function_file(path, size_mb, tellraw_ratio, seed=0):
+    """生成约size_mb MiB的函数文件，tellraw_ratio比例的行是tellraw命令"""
+    rng = random.Random(seed)
+    other_lines = [f'scoreboard players add @a[tag=t{index}] score{index} 1\n'.encode('utf-8') for index in range(64)]
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, 'wb') as f:
+        while written < target:
+            block = []
+            for _ in range(4096):
+                if rng.random() < tellraw_ratio:
+                    block.append(f'tellraw {rng.choice(SELECTORS)} {{"rawtext":[{{"text":"{rng.choice(MESSAGES)}"}}]}}\n'
+                                 .encode('utf-8'))
+                else:
+                    block.append(rng.choice(other_lines))
+            data = b''.join(block)
+            f.write(data)
+            written += len(data)
+    return written
+
+
+def convert_big_file_by_lines(input_path, output_path, target_version):
+    """逐行转换（内存映射之前的做法），作为比较基准"""
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        tellraw._convert_mcfunction_stream(src, dst, target_version)
+
+
+def run_big_file_benchmark(args):
+    """大文件转换测试：内存映射转换与逐行转换的吞吐量，以及直接复制文件的吞吐量（接近磁盘速度的上限）"""
+    workdir = tempfile.mkdtemp(prefix='tellraw_bench_')
+    try:
+        input_path = os.path.join(workdir, 'big.mcfunction')
+        size = build_big_function_file(input_path, args.size_mb, args.tellraw_ratio, args.seed)
+        outputs = {}
+        print(f'文件大小: {size / 1024 / 1024:.0f} MiB  tellraw行比例: {args.tellraw_ratio:.0%}')
+        for name, func in (('直接复制文件', lambda src, dst: shutil.copyfile(src, dst)),
+                           ('逐行转换', lambda src, dst: convert_big_file_by_lines(src, dst, 'java')),
+                           ('内存映射转换', lambda src, dst: tellraw.convert_mcfunction(src, dst, 'java'))):
+            output_path = os.path.join(workdir, f'out{len(outputs)}')
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                func(input_path, output_path)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            with open(output_path, 'rb') as f:
+                outputs[name] = hashlib.sha256(f.read()).hexdigest()
+            os.remove(output_path)
+            print(f'{name:<8s} {best:8.3f} 秒  {size / best / 1024 / 1024:10.1f} MiB/秒')
+        if outputs['逐行转换'] != outputs['内存映射转换']:
+            raise SystemExit('内存映射转换的结果与逐行转换不一致')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_disk_cache_benchmark(args):
+    """磁盘缓存测试：每一轮都清空选择器缓存并新建DiskCache对象，模拟新启动的进程"""
+    corpus = build_parallel_corpus(args.size, args.seed)
+    workdir = tempfile.mkdtemp(prefix='tellraw_bench_')
+    try:
+        path = os.path.join(workdir, 'cache.sqlite3')
+        timings = []
+        reference = None
+        for disk_cache in (None, tellraw.DiskCache(path), tellraw.DiskCache(path)):
+            tellraw.clear_selector_cache()
+            start = time.perf_counter()
+            results = list(tellraw.generate_tellraw_commands_many(corpus, disk_cache=disk_cache))
+            timings.append(time.perf_counter() - start)
+            if disk_cache is not None:
+                disk_cache.close()
+            if reference is None:
+                reference = results
+            elif results != reference:
+                raise SystemExit('使用磁盘缓存的结果与不使用时不一致')
+        print(f'记录数: {args.size}  缓存文件大小: {os.path.getsize(path) / 1024 / 1024:.1f} MiB')
+        for name, seconds in zip(('不使用磁盘缓存', '磁盘缓存为空', '磁盘缓存已有结果'), timings):
+            print(f'{name:<10s} {seconds:8.3f} 秒  {args.size / seconds:12.0f} 条/秒  '
+                  f'加速比 {timings[0] / seconds:5.2f}x')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def build_pack(root, files, lines, seed=0):
+    """生成测试用的数据包目录，文件大小不一，约三分之一的行是tellraw命令"""
+    rng = random.Random(seed)
+    for index in range(files):
+        directory = os.path.join(root, 'data', f'ns{index % 8}', 'functions')
+        os.makedirs(directory, exist_ok=True)
+        # 文件行数在0.2倍到2倍之间变化，用于检验按大小分块的效果
+        count = int(lines * rng.uniform(0.2, 2.0))
+        with open(os.path.join(directory, f'f{index}.mcfunction'), 'w', encoding='utf-8') as f:
+            for _ in range(count):
+                if rng.random() < 0.33:
+                    f.write(f'tellraw {rng.choice(SELECTORS)} {{"rawtext":[{{"text":"{rng.choice(MESSAGES)}"}}]}}\n')
+                else:
+                    f.write(f'scoreboard players add @a score{rng.randrange(100)} 1\n')
+    with open(os.path.join(root, 'pack.mcmeta'), 'w', encoding='utf-8') as f:
+        f.write('{"pack": {"pack_format": 10, "description": "bench"}}\n')
+
+
+def digest_tree(root):
+    """按相对路径顺序计算目录中所有文件内容的摘要"""
+    digest = hashlib.sha256()
+    for directory, dirs, names in os.walk(root):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            digest.update(os.path.relpath(path, root).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def run_pack_benchmark(args):
+    """数据包目录转换在不同进程数下的扩展性测试"""
+    max_jobs = args.max_jobs or os.cpu_count() or 1
+    job_counts = []
+    jobs = 1
+    while jobs < max_jobs:
+        job_counts.append(jobs)
+        jobs *= 2
+    job_counts.append(max_jobs)
+
+    workdir = tempfile.mkdtemp(prefix='tellraw_bench_')
+    try:
+        pack_dir = os.path.join(workdir, 'pack')
+        build_pack(pack_dir, args.files, args.lines, args.seed)
+        reference = None
+        baseline = None
+        print(f'文件数: {args.files}  平均行数: {args.lines}')
+        for jobs in job_counts:
+            output_dir = os.path.join(workdir, f'out{jobs}')
+            best = None
+            for _ in range(args.repeat):
+                shutil.rmtree(output_dir, ignore_errors=True)
+                stats = tellraw.convert_pack(pack_dir, output_dir, 'bedrock', jobs)
+                best = stats['seconds'] if best is None else min(best, stats['seconds'])
+            # 不同进程数的输出必须完全相同
+            digest = digest_tree(output_dir)
+            if reference is None:
+                reference = digest
+            elif digest != reference:
+                raise SystemExit(f'--jobs {jobs} 的结果与单进程不一致')
+            baseline = baseline or best
+            print(f'jobs={jobs:<3d} {best:8.3f} 秒  {stats["lines"] / best:12.0f} 行/秒  '
+                  f'加速比 {baseline / best:5.2f}x  效率 {baseline / best / jobs:5.0%}')
+
+        # 增量转换：第一次生成清单，之后没有改动的重建应当跳过所有文件
+        output_dir = os.path.join(workdir, 'incremental')
+        cold = tellraw.convert_pack(pack_dir, output_dir, 'bedrock', job_counts[-1], incremental=True)
+        warm = tellraw.convert_pack(pack_dir, output_dir, 'bedrock', job_counts[-1], incremental=True)
+        os.remove(os.path.join(output_dir, tellraw.PACK_MANIFEST_NAME))
+        if digest_tree(output_dir) != reference:
+            raise SystemExit('增量转换的结果与完整转换不一致')
+        print(f'增量转换 首次 {cold["seconds"]:8.3f} 秒  无改动重建 {warm["seconds"]:8.3f} 秒  '
+              f'跳过 {warm["skipped"]} 个文件')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def build_book_text(codes, seed=0):
+    """
+    生成包含指定数量格式代码的长文本（类似书本和物品描述）
+    大部分代码与前一个相同，相邻文本需要合并，用于检验合并文本的耗时是否线性
+    """
+    rng = random.Random(seed)
+    code_chars = '0123456789abcdefklmnor'
+    words = ['Lorem', 'ipsum', '你好', '世界', ' ', 'dolor', 'sit amet']
+    parts = []
+    code = '0'
+    for _ in range(codes):
+        if rng.random() < 0.3:
+            code = rng.choice(code_chars)
+        parts.append('§' + code + rng.choice(words))
+    return ''.join(parts)
+
+
+def load_module(path):
+    """从指定路径加载另一个版本的tellraw.py"""
+    spec = importlib.util.spec_from_file_location('tellraw_compare', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_formatting(module, text, repeat):
+    """返回parse_minecraft_formatting处理文本的最短耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        module.parse_minecraft_formatting(text, 'font')
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_formatting_benchmark(args):
+    """长文本格式解析测试，每个格式代码的耗时不随文本长度增长说明是线性时间"""
+    modules = [('当前版本', tellraw)]
+    if args.compare:
+        modules.append((args.compare, load_module(args.compare)))
+    sizes = [args.codes // 8, args.codes // 4, args.codes // 2, args.codes]
+    for name, module in modules:
+        print(f'{name}:')
+        for size in sizes:
+            text = build_book_text(size, args.seed)
+            seconds = time_formatting(module, text, args.repeat)
+            print(f'  {size:8d} 个代码  {seconds * 1000:10.2f} 毫秒  每个代码 {seconds / size * 1e6:8.3f} 微秒')
+
+
+def build_nbt_selector(items, depth):
+    """生成包含items个物品的Inventory nbt参数，每个物品的tag嵌套depth层"""
+    tag = '{Count:1..}'
+    for level in range(depth):
+        tag = f'{{lvl{level}:[{tag}],Damage:0..3}}'
+    inventory = ','.join(f'{{Slot:{slot % 36}b,id:"minecraft:stone",Count:3..,tag:{tag}}}'
+                         for slot in range(items))
+    return f'@a[nbt={{Inventory:[{inventory}]}}]'
+
+
+def run_snbt_benchmark(args):
+    """nbt参数转换测试，每个字符的耗时不随嵌套层数和长度增长说明是线性时间"""
+    modules = [('当前版本', tellraw)]
+    if args.compare:
+        modules.append((args.compare, load_module(args.compare)))
+    cases = [(args.items // 8, args.depth), (args.items, args.depth),
+             (args.items // 8, args.depth * 8), (args.items, args.depth * 8)]
+    for name, module in modules:
+        print(f'{name}:')
+        for items, depth in cases:
+            selector = build_nbt_selector(items, depth)
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                module.filter_selector_parameters(selector, 'bedrock')
+                module.convert_selector_parameters(selector)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f'  {items:6d} 个物品  嵌套 {depth:4d} 层  {len(selector):9d} 字符  '
+                  f'{best * 1000:10.2f} 毫秒  每千字符 {best / len(selector) * 1e6:8.3f} 毫秒')
+
+
+# suite测试使用的语料
+SUITE_CORPORA = {
+    'small': {
+        'selectors': ['@a', '@s', '@p[r=10]', '@e[type=zombie]'],
+        'messages': ['Hello world', '§aGreen'],
+    },
+    'typical': {
+        'selectors': SELECTORS,
+        'messages': MESSAGES,
+    },
+}
+
+# suite测试的函数：名称 -> (使用的语料, 对语料中一条记录调用一次的函数)
+SUITE_FUNCTIONS = {
+    'detect_selector_type': ('selectors', lambda selector: tellraw.detect_selector_type(selector)),
+    'convert_bedrock_selector_to_java': ('selectors', lambda selector: tellraw.convert_bedrock_selector_to_java(selector)),
+    'convert_gamemode_parameters': ('selectors', lambda selector: tellraw.convert_gamemode_parameters(selector, selector)),
+    'filter_selector_parameters': ('selectors', lambda selector: (tellraw.filter_selector_parameters(selector, 'java'),
+                                                                  tellraw.filter_selector_parameters(selector, 'bedrock'))),
+    'parse_minecraft_formatting': ('messages', lambda message: tellraw.parse_minecraft_formatting(message, 'font')),
+    'java_text_json': ('messages', lambda message: tellraw.java_text_json(message, 'font')),
+    'generate_tellraw_commands': ('records', lambda record: tellraw.generate_tellraw_commands(*record)),
+}
+
+SUITE_RESULT_VERSION = 1
+
+
+def build_pathological_corpus():
+    """生成最坏情况的语料：深层嵌套的nbt、不完整的括号、超长参数列表和超长格式文本"""
+    return {
+        'selectors': [
+            build_nbt_selector(40, 16),
+            '@a[nbt=' + '{' * 5000 + ']',
+            '@a[nbt={a:' * 2000 + ']',
+            '@e[' + ','.join(f'tag=t{i}' for i in range(2000)) + ']',
+            '@a[scores={' + ','.join(f'o{i}=1..' for i in range(2000)) + '}]',
+            '@a[hasitem=[' + ','.join(f'{{item=i{i},quantity={i}..}}' for i in range(500)) + ']]',
+            '@a[' + 'x' * 20000,
+        ],
+        'messages': [
+            build_book_text(5000),
+            '§a§l' * 10000,
+            '§' * 20000,
+            'x' * 100000,
+        ],
+    }
+
+
+def suite_corpus(name):
+    """返回指定名称的语料，包括由选择器和消息组合出的generate_tellraw_commands记录"""
+    corpus = dict(build_pathological_corpus() if name == 'pathological' else SUITE_CORPORA[name])
+    corpus['records'] = [(selector, message, m_n_handling)
+                         for selector in corpus['selectors']
+                         for message in corpus['messages'][:2]
+                         for m_n_handling in ('none', 'color')]
+    return corpus
+
+
+def percentile(samples, fraction):
+    """已排序样本的最近秩百分位数"""
+    return samples[min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))]
+
+
+def measure_function(func, items, min_time):
+    """
+    逐次计时，直到总耗时达到min_time秒且每条记录至少调用一次
+    返回(调用次数, 每秒调用次数, p50微秒, p99微秒, 峰值内存KB)
+    """
+    clock = time.perf_counter_ns
+    samples = []
+    total = 0
+    budget = min_time * 1e9
+    while total < budget or not samples:
+        for item in items:
+            start = clock()
+            func(item)
+            elapsed = clock() - start
+            samples.append(elapsed)
+            total += elapsed
+
+    # 峰值内存单独测量，避免tracemalloc影响计时
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for item in items:
+        func(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    samples.sort()
+    return (len(samples), len(samples) / (total / 1e9), percentile(samples, 0.50) / 1000,
+            percentile(samples, 0.99) / 1000, peak / 1024)
+
+
+def compare_with_baseline(results, baseline, max_regression):
+    """与基准结果比较吞吐量，返回吞吐量下降超过max_regression的项目数"""
+    previous = {(entry['function'], entry['corpus']): entry for entry in baseline['results']}
+    regressions = 0
+    print()
+    print(f'与基准结果比较（{baseline.get("timestamp", "未知时间")}）:')
+    for entry in results:
+        old = previous.get((entry['function'], entry['corpus']))
+        if old is None:
+            continue
+        ratio = entry['ops_per_sec'] / old['ops_per_sec']
+        mark = ''
+        if max_regression is not None and ratio < 1 - max_regression:
+            mark = '  <- 性能下降'
+            regressions += 1
+        print(f'  {entry["function"]:34s} {entry["corpus"]:13s} 吞吐量 {ratio:6.2f}x  '
+              f'p99 {old["p99_us"]:10.1f} -> {entry["p99_us"]:10.1f} 微秒{mark}')
+    return regressions
+
+
+def run_suite_benchmark(args):
+    """转换流程各函数的基准测试，结果写入JSON文件"""
+    corpora = args.corpus or ['small', 'typical', 'pathological']
+    functions = args.function or list(SUITE_FUNCTIONS)
+    # 默认关闭选择器缓存，测量的是转换本身而不是缓存命中
+    tellraw.configure_selector_cache(args.selector_cache)
+
+    results = []
+    print('函数' + ' ' * 31 + '语料' + ' ' * 11 + '调用次数' + ' ' * 8 + '次/秒'
+          + '   p50(微秒)   p99(微秒) 峰值内存(KB)')
+    for corpus_name in corpora:
+        corpus = suite_corpus(corpus_name)
+        for name in functions:
+            kind, func = SUITE_FUNCTIONS[name]
+            ops, rate, p50, p99, peak = measure_function(func, corpus[kind], args.min_time)
+            results.append({
+                'function': name,
+                'corpus': corpus_name,
+                'ops': ops,
+                'ops_per_sec': rate,
+                'p50_us': p50,
+                'p99_us': p99,
+                'peak_memory_kb': peak,
+            })
+            print(f'{name:32s} {corpus_name:13s} {ops:8d} {rate:12.0f} {p50:11.1f} {p99:11.1f} {peak:12.1f}')
+
+    report = {
+        'version': SUITE_RESULT_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'selector_cache': args.selector_cache,
+        'min_time': args.min_time,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    print(f'结果已写入 {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_with_baseline(results, baseline, args.max_regression):
+            raise SystemExit(1)
+
+
+# adversarial测试的输入族：输入类型 -> {名称: 由规模n生成输入的函数}，输入长度大致与n成正比
+# 选择器参数（不含方括号），用于参数字符串函数，放进@a[...]后用于选择器函数
+ADVERSARIAL_PARAMS = {
+    'open_braces': lambda n: 'nbt=' + '{' * n,
+    'close_braces': lambda n: 'nbt=' + '}' * n,
+    'nested_keys': lambda n: 'nbt=' + '{a:' * n,
+    'nested_lists': lambda n: 'nbt={a:' + '[' * n,
+    'unterminated_string': lambda n: 'nbt={a:"' + '\\"' * n,
+    'selected_item_fields': lambda n: 'nbt={SelectedItem:{id:"minecraft:stone",' + 'Count:1b,' * n,
+    'inventory_unclosed': lambda n: 'nbt={Inventory:[' + '{Slot:0b,id:"a",Count:1b},' * n,
+    'hasitem_array': lambda n: 'hasitem=[' + ','.join(['{item=stone,quantity=1..}'] * n) + ']',
+    'hasitem_fields': lambda n: 'hasitem={' + 'item=stone,' * n + '}',
+    'hasitem_unclosed': lambda n: 'hasitem={item=stone,data=' + '{' * n,
+    'hasitem_array_unclosed': lambda n: 'hasitem=[' + '{item=stone,' * n,
+    'scores_negated': lambda n: 'scores={' + 'o=!1..,' * n + '}',
+    'commas': lambda n: ',' * n,
+    'equals': lambda n: '=' * n,
+    'tags': lambda n: ','.join(['tag=t'] * n),
+    'range_dots': lambda n: 'distance=' + '.' * n,
+    'limit_sort': lambda n: ','.join(['limit=1,sort=nearest,c=-1'] * n),
+}
+
+# hasitem参数的内容（不含外层大括号或方括号）
+ADVERSARIAL_HASITEM = {
+    'fields': lambda n: 'item=stone,' * n,
+    'open_braces': lambda n: 'item=stone,data={' + '{' * n,
+    'nested_commas': lambda n: 'item=stone,data={' + ',' * n,
+    'quantity_dots': lambda n: 'item=stone,quantity=' + '.' * n,
+    'items': lambda n: ','.join(['{item=stone,quantity=1..}'] * n),
+    'items_unclosed': lambda n: '{item=stone,' * n,
+}
+
+# nbt参数的内容
+ADVERSARIAL_NBT = {
+    'selected_item_fields': lambda n: '{SelectedItem:{id:"minecraft:stone",' + 'Count:1b,' * n,
+    'inventory_unclosed': lambda n: '{Inventory:[' + '{Slot:0b,id:"a",Count:1b},' * n,
+    'item_keys': lambda n: '{Item:' * n,
+    'open_braces': lambda n: '{' * n,
+    'close_braces': lambda n: '{SelectedItem:' + '}' * n,
+    'quotes': lambda n: '{SelectedItem:{id:"' + '\\"' * n,
+}
+
+# 消息文本
+ADVERSARIAL_MESSAGES = {
+    'section_signs': lambda n: '§' * n,
+    'format_codes': lambda n: '§a§l' * n,
+    'm_n_codes': lambda n: '§m§n' * n,
+    'backslashes': lambda n: '\\' * n,
+    'quotes': lambda n: '"' * n,
+    'braces': lambda n: '{' * n,
+    'control_chars': lambda n: '\x01\n' * n,
+}
+
+# tellraw命令的JSON文本部分（选择器之后的内容）
+ADVERSARIAL_TEXTS = {
+    'open_objects': lambda n: '{"text":' * n,
+    'open_arrays': lambda n: '[' * n,
+    'rawtext': lambda n: '{"rawtext":[' + '{"text":"a"},' * n + ']}',
+    'extra': lambda n: '{"text":"a","extra":[' + '{"text":"b","color":"red"},' * n + ']}',
+    'unterminated_string': lambda n: '{"text":"' + '\\"' * n,
+    'braces': lambda n: '{' * n,
+    'plain': lambda n: 'a§' * n,
+}
+
+# 每种输入类型的所有输入族
+ADVERSARIAL_INPUTS = {
+    'params': ADVERSARIAL_PARAMS,
+    'selector': {name: (lambda build: lambda n: '@a[' + build(n) + ']')(build)
+                 for name, build in ADVERSARIAL_PARAMS.items()},
+    'hasitem': ADVERSARIAL_HASITEM,
+    'nbt': ADVERSARIAL_NBT,
+    'message': ADVERSARIAL_MESSAGES,
+    'text': ADVERSARIAL_TEXTS,
+}
+ADVERSARIAL_INPUTS['selector']['no_closing_bracket'] = lambda n: '@a[' + 'tag=t,' * n
+ADVERSARIAL_INPUTS['selector']['player_name'] = lambda n: 'x' * n
+# 服务请求同时覆盖选择器和消息
+ADVERSARIAL_INPUTS['request'] = dict(
+    [(f'selector_{name}', (lambda build: lambda n: json.dumps({'selector': build(n), 'message': 'hi'}))(build))
+     for name, build in ADVERSARIAL_INPUTS['selector'].items()]
+    + [(f'message_{name}', (lambda build: lambda n: json.dumps({'selector': '@a', 'message': build(n)}))(build))
+       for name, build in ADVERSARIAL_MESSAGES.items()])
+
+# adversarial测试的公开函数：名称 -> (输入类型, 对一个输入调用一次的函数)
+ADVERSARIAL_FUNCTIONS = {
+    'parse_selector': ('selector', lambda selector: tellraw.parse_selector(selector)),
+    'detect_selector_type': ('selector', lambda selector: tellraw.detect_selector_type(selector)),
+    'convert_bedrock_selector_to_java': ('selector', lambda selector: tellraw.convert_bedrock_selector_to_java(selector)),
+    'convert_selector_parameters': ('selector', lambda selector: tellraw.convert_selector_parameters(selector)),
+    'convert_gamemode_parameters': ('selector', lambda selector: tellraw.convert_gamemode_parameters(selector, selector)),
+    'convert_limit_c_between_versions': ('selector',
+                                         lambda selector: tellraw.convert_limit_c_between_versions(selector, selector)),
+    'filter_selector_parameters': ('selector', lambda selector: (tellraw.filter_selector_parameters(selector, 'java'),
+                                                                 tellraw.filter_selector_parameters(selector, 'bedrock'))),
+    'convert_selector': ('selector', lambda selector: tellraw.convert_selector(selector)),
+    'generate_tellraw_commands': ('selector', lambda selector: tellraw.generate_tellraw_commands(selector, 'hi')),
+    'convert_limit_c_parameters': ('params', lambda params: tellraw.convert_limit_c_parameters(params)),
+    'convert_sort_parameters': ('params', lambda params: tellraw.convert_sort_parameters(params, '@a')),
+    'convert_hasitem_to_nbt_with_reminders': ('params',
+                                              lambda params: tellraw.convert_hasitem_to_nbt_with_reminders(params)),
+    'convert_nbt_to_hasitem': ('params', lambda params: tellraw.convert_nbt_to_hasitem(params)),
+    'convert_distance_parameters': ('params', lambda params: tellraw.convert_distance_parameters(params, [])),
+    'convert_rotation_parameters': ('params', lambda params: tellraw.convert_rotation_parameters(params, [])),
+    'convert_level_parameters': ('params', lambda params: tellraw.convert_level_parameters(params, [])),
+    'process_range_values': ('params', lambda params: tellraw.process_range_values(params)),
+    'parse_hasitem_simple': ('hasitem', lambda content: tellraw.parse_hasitem_simple(content)),
+    'parse_hasitem_complex': ('hasitem', lambda content: tellraw.parse_hasitem_complex(content)),
+    'try_convert_nbt_content_to_hasitem': ('nbt', lambda content: tellraw.try_convert_nbt_content_to_hasitem(content)),
+    'parse_snbt': ('nbt', lambda content: tellraw.parse_snbt(content)),
+    'convert_colors_to_bedrock': ('message', lambda message: tellraw.convert_colors_to_bedrock(message)),
+    'convert_text_to_java': ('message', lambda message: tellraw.convert_text_to_java(message, 'font')),
+    'parse_minecraft_formatting': ('message', lambda message: tellraw.parse_minecraft_formatting(message, 'font')),
+    'java_text_json': ('message', lambda message: tellraw.java_text_json(message, 'font')),
+    'convert_text_to_bedrock': ('message', lambda message: tellraw.convert_text_to_bedrock(message, 'color')),
+    'convert_message': ('message', lambda message: tellraw.convert_message(message, 'color')),
+    'tellraw_text_to_message': ('text', lambda text: tellraw.tellraw_text_to_message(text)),
+    'split_tellraw_command': ('text', lambda text: tellraw.split_tellraw_command('tellraw @a ' + text)),
+    'convert_mcfunction_line': ('text', lambda text: tellraw.convert_mcfunction_line(
+        ('tellraw @a ' + text + '\n').encode('utf-8'), 'bedrock')),
+    'convert_request_line': ('request', lambda line: tellraw.convert_request_line(line)),
+}
+
+
+class AdversarialTimeout(Exception):
+    """单次调用超出时间预算"""
+
+
+def _adversarial_alarm(signum, frame):
+    raise AdversarialTimeout()
+
+
+def time_adversarial_call(func, item, budget, min_time):
+    """
+    返回对item调用func的平均耗时（秒），调用到总耗时达到min_time为止
+    单次调用超过budget秒时抛出AdversarialTimeout（用SIGALRM中断，正则匹配也能被中断）；
+    函数对畸形输入抛出的异常视为正常结果
+    """
+    calls = 0
+    total = 0.0
+    while total < min_time or not calls:
+        if hasattr(signal, 'setitimer'):
+            signal.setitimer(signal.ITIMER_REAL, budget)
+        start = time.perf_counter()
+        try:
+            func(item)
+        except AdversarialTimeout:
+            raise
+        except Exception:
+            pass
+        finally:
+            elapsed = time.perf_counter() - start
+            if hasattr(signal, 'setitimer'):
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        if elapsed > budget:
+            # 没有SIGALRM的平台上只能在调用结束后检查
+            raise AdversarialTimeout()
+        calls += 1
+        total += elapsed
+    return total / calls
+
+
+def run_adversarial_benchmark(args):
+    """
+    对每个公开函数和每个对应输入族，在n/8、n/4、n/2、n四种规模下计时，
+    单次调用超过时间预算或耗时随输入长度的增长指数超过max_exponent时以状态1退出
+    """
+    functions = args.function or list(ADVERSARIAL_FUNCTIONS)
+    # 测量的是转换本身，不使用选择器缓存
+    tellraw.configure_selector_cache(0)
+    if hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, _adversarial_alarm)
+    sizes = [args.size // 8, args.size // 4, args.size // 2, args.size]
+    failures = []
+    results = []
+    for name in functions:
+        kind, func = ADVERSARIAL_FUNCTIONS[name]
+        for family, build in ADVERSARIAL_INPUTS[kind].items():
+            points = []
+            timed_out = None
+            for n in sizes:
+                item = build(n)
+                try:
+                    seconds = min(time_adversarial_call(func, item, args.budget, args.min_time)
+                                  for _ in range(args.repeat))
+                except AdversarialTimeout:
+                    timed_out = len(item)
+                    break
+                points.append((len(item), seconds))
+            if timed_out is not None:
+                failures.append(f'{name} / {family}: 长度 {timed_out} 的输入超出 {args.budget} 秒预算')
+                print(f'{name:38s} {family:28s} 超出预算（长度 {timed_out}）')
+                continue
+            # 最小和最大规模之间的增长指数：线性为1，二次为2
+            (short_length, short_time), (long_length, long_time) = points[0], points[-1]
+            exponent = math.log(long_time / short_time) / math.log(long_length / short_length)
+            results.append((exponent, name, family, long_length, long_time))
+            if exponent > args.max_exponent:
+                failures.append(f'{name} / {family}: 增长指数 {exponent:.2f}（长度 {short_length} -> {long_length}，'
+                                f'{short_time * 1e3:.3f} -> {long_time * 1e3:.3f} 毫秒）')
+            if args.verbose or exponent > args.max_exponent:
+                print(f'{name:38s} {family:28s} 长度 {long_length:8d}  {long_time * 1e3:10.3f} 毫秒  '
+                      f'增长指数 {exponent:5.2f}')
+
+    results.sort(reverse=True)
+    print(f'共 {len(results) + sum(1 for failure in failures if "预算" in failure)} 组输入，'
+          f'增长指数最高的5组:')
+    for exponent, name, family, length, seconds in results[:5]:
+        print(f'  {name:38s} {family:28s} {exponent:5.2f}  长度 {length} 耗时 {seconds * 1e3:.3f} 毫秒')
+    if failures:
+        print('失败:')
+        for failure in failures:
+            print(f'  {failure}')
+        raise SystemExit(1)
+    print(f'全部通过（单次调用预算 {args.budget} 秒，最大增长指数 {args.max_exponent}）')
+
+
+async def socket_connection_load(address, requests, depth, corpus, latencies):
+    """一个连接上的流水线负载：最多depth个未完成的请求，按顺序匹配响应并记录延迟（秒）"""
+    kind, host, port = tellraw.parse_socket_address(address)
+    if kind == 'unix':
+        reader, writer = await asyncio.open_unix_connection(host, limit=tellraw.SOCKET_LINE_LIMIT)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=tellraw.SOCKET_LINE_LIMIT)
+    window = asyncio.Semaphore(depth)
+    sent = []
+
+    async def send():
+        for index in range(requests):
+            await window.acquire()
+            selector, message, m_n_handling = corpus[index % len(corpus)]
+            request = {'id': index, 'selector': selector, 'message': message,
+                       'm_n_handling': 'none' if m_n_handling == 'mixed' else m_n_handling}
+            sent.append(time.perf_counter())
+            writer.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+            await writer.drain()
+
+    async def receive():
+        for index in range(requests):
+            line = await reader.readline()
+            if not line:
+                raise SystemExit('服务端提前关闭了连接')
+            latencies.append(time.perf_counter() - sent[index])
+            response = json.loads(line)
+            if response.get('id') != index or 'error' in response:
+                raise SystemExit(f'响应与请求不一致: {response}')
+            window.release()
+
+    await asyncio.gather(send(), receive())
+    writer.close()
+    await writer.wait_closed()
+
+
+async def socket_load(address, connections, requests, depth, corpus):
+    """并发运行多个连接，返回(所有请求的延迟列表, 总耗时秒)"""
+    latencies = []
+    per_connection = [requests // connections + (1 if index < requests % connections else 0)
+                      for index in range(connections)]
+    start = time.perf_counter()
+    await asyncio.gather(*[socket_connection_load(address, count, depth, corpus, latencies)
+                           for count in per_connection])
+    return latencies, time.perf_counter() - start
+
+
+def start_socket_server(workers):
+    """在子进程中启动套接字服务（自动分配端口），返回(进程, 地址)"""
+    script = os.path.join(os.path.dirname(os.path.abspath(tellraw.__file__)), 'tellraw.py')
+    process = subprocess.Popen([sys.executable, script, '--serve-socket', '127.0.0.1:0', '--workers', str(workers)],
+                               stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    line = process.stdout.readline()
+    if not line.startswith('正在监听 '):
+        process.kill()
+        raise SystemExit(f'套接字服务启动失败: {line.strip()}')
+    return process, line.split()[-1]
+
+
+def run_socket_benchmark(args):
+    """套接字服务负载测试，未指定--address时在子进程中启动服务"""
+    process = None
+    address = args.address
+    if address is None:
+        process, address = start_socket_server(args.workers)
+    try:
+        corpus = build_corpus(1000, args.seed)
+        latencies, seconds = asyncio.run(socket_load(address, args.connections, args.requests, args.depth, corpus))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    latencies.sort()
+    print(f'地址: {address}  连接数: {args.connections}  流水线深度: {args.depth}  请求数: {len(latencies)}')
+    print(f'吞吐量: {len(latencies) / seconds:10.0f} 请求/秒')
+    for name, fraction in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('p99.9', 0.999), ('最大', 1.0)):
+        print(f'  {name:6s} {percentile(latencies, fraction) * 1000:9.3f} 毫秒')
+
+
+def tellraw_script():
+    """tellraw.py的绝对路径"""
+    return os.path.join(os.path.dirname(os.path.abspath(tellraw.__file__)), 'tellraw.py')
+
+
+def import_time_ms():
+    """在新的解释器中用-X importtime测量导入tellraw的累计耗时（毫秒）"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import tellraw'],
+                            cwd=os.path.dirname(tellraw_script()), capture_output=True, text=True, check=True)
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == 'tellraw':
+            return int(fields[1]) / 1000
+    raise SystemExit('无法从-X importtime的输出中找到tellraw')
+
+
+def wall_time_ms(command):
+    """在tellraw.py所在目录运行一次命令的墙钟耗时（毫秒）"""
+    start = time.perf_counter()
+    subprocess.run(command, cwd=os.path.dirname(tellraw_script()), stdout=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def run_startup_benchmark(args):
+    """
+    启动耗时测试：导入耗时、空解释器启动耗时和单次命令行转换耗时，取中位数与预算比较
+    python3 tellraw.py 每次都要重新编译整个脚本，python3 -m tellraw 使用已缓存的字节码，
+    预算针对后者，前者只作为参考
+    """
+    conversion = ['@a[r=5,m=1]', '§a你好§l世界']
+    # 先运行一次，确保字节码缓存已经生成
+    wall_time_ms([sys.executable, '-m', 'tellraw'] + conversion)
+    imports = [import_time_ms() for _ in range(args.runs)]
+    bare = [wall_time_ms([sys.executable, '-c', 'pass']) for _ in range(args.runs)]
+    module = [wall_time_ms([sys.executable, '-m', 'tellraw'] + conversion) for _ in range(args.runs)]
+    script = [wall_time_ms([sys.executable, tellraw_script()] + conversion) for _ in range(args.runs)]
+    import_ms = statistics.median(imports)
+    bare_ms = statistics.median(bare)
+    module_ms = statistics.median(module)
+    script_ms = statistics.median(script)
+    overhead_ms = module_ms - bare_ms
+    print(f'运行次数: {args.runs}（取中位数）')
+    print(f'导入tellraw（-X importtime累计）: {import_ms:8.1f} 毫秒  预算 {args.import_budget:.0f} 毫秒')
+    print(f'空解释器启动:                   {bare_ms:8.1f} 毫秒')
+    print(f'单次转换 python3 -m tellraw:    {module_ms:8.1f} 毫秒  比空解释器多 {overhead_ms:.1f} 毫秒  '
+          f'预算 {args.oneshot_budget:.0f} 毫秒')
+    print(f'单次转换 python3 tellraw.py:    {script_ms:8.1f} 毫秒  （每次重新编译脚本，仅供参考）')
+    failed = []
+    if import_ms > args.import_budget:
+        failed.append('导入耗时')
+    if overhead_ms > args.oneshot_budget:
+        failed.append('单次命令行转换耗时')
+    if failed:
+        raise SystemExit(f'超出预算: {"、".join(failed)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='tellraw.py 性能测试')
+    subparsers = parser.add_subparsers(dest='command')
+
+    batch = subparsers.add_parser('batch', help='批量接口吞吐量测试（默认）')
+    batch.add_argument('--size', type=int, default=20000, help='测试记录数（默认20000）')
+    batch.add_argument('--repeat', type=int, default=3, help='重复次数，取最快的一次（默认3）')
+    batch.add_argument('--seed', type=int, default=0, help='语料随机种子（默认0）')
+    batch.add_argument('--selector-cache', type=int, default=tellraw.SELECTOR_CACHE_SIZE,
+                       help=f'选择器缓存大小（默认{tellraw.SELECTOR_CACHE_SIZE}）')
+    batch.add_argument('--stages', action='store_true', help='输出generate_tellraw_commands_many各阶段的耗时分解')
+    batch.add_argument('--rule-stats', metavar='FILE', help='把各转换规则的触发次数和耗时写入JSON文件')
+    batch.add_argument('--memory-report', action='store_true',
+                       help='用tracemalloc统计generate_tellraw_commands_many各阶段和每10000条记录的内存占用')
+
+    pack = subparsers.add_parser('pack', help='数据包目录转换扩展性测试')
+    pack.add_argument('--files', type=int, default=256, help='函数文件数（默认256）')
+    pack.add_argument('--lines', type=int, default=400, help='每个文件的平均行数（默认400）')
+    pack.add_argument('--max-jobs', type=int, default=0, help='最大进程数（默认为CPU核心数）')
+    pack.add_argument('--repeat', type=int, default=1, help='重复次数，取最快的一次（默认1）')
+    pack.add_argument('--seed', type=int, default=0, help='语料随机种子（默认0）')
+
+    bigfile = subparsers.add_parser('bigfile', help='大文件转换测试')
+    bigfile.add_argument('--size-mb', type=int, default=200, help='文件大小，MiB（默认200）')
+    bigfile.add_argument('--tellraw-ratio', type=float, default=0.03, help='tellraw行的比例（默认0.03）')
+    bigfile.add_argument('--repeat', type=int, default=1, help='重复次数，取最快的一次（默认1）')
+    bigfile.add_argument('--seed', type=int, default=0, help='语料随机种子（默认0）')
+
+    diskcache = subparsers.add_parser('diskcache', help='磁盘缓存测试')
+    diskcache.add_argument('--size', type=int, default=50000, help='测试记录数（默认50000）')
+    diskcache.add_argument('--seed', type=int, default=0, help='语料随机种子（默认0）')
+
+    parallel = subparsers.add_parser('parallel', help='多进程批量生成的扩展性测试')
+    parallel.add_argument('--size', type=int, default=100000, help='测试记录数（默认100000）')
+    parallel.add_argument('--workers', default='1,2,4,8,16', help='逗号分隔的工作进程数（默认1,2,4,8,16）')
+    parallel.add_argument('--chunk-size', type=int, default=tellraw.PARALLEL_CHUNK_SIZE,
+                          help=f'任务块大小（默认{tellraw.PARALLEL_CHUNK_SIZE}）')
+    parallel.add_argument('--repeat', type=int, default=1, help='重复次数，取最快的一次（默认1）')
+    parallel.add_argument('--seed', type=int, default=0, help='语料随机种子（默认0）')
+
+    formatting = subparsers.add_parser('formatting', help='长文本格式解析测试')
+    formatting.add_argument('--codes', type=int, default=80000, help='最长文本中的格式代码数（默认80000）')
+    formatting.add_argument('--repeat', type=int, default=3, help='重复次数，取最快的一次（默认3）')
+    formatting.add_argument('--seed', type=int, default=0, help='语料随机种子（默认0）')
+    formatting.add_argument('--compare', metavar='PATH', help='同时测试另一个版本的tellraw.py（如改动前的版本）')
+
+    snbt = subparsers.add_parser('snbt', help='深层嵌套nbt参数转换测试')
+    snbt.add_argument('--items', type=int, default=400, help='Inventory中的最多物品数（默认400）')
+    snbt.add_argument('--depth', type=int, default=4, help='物品tag的基本嵌套层数（默认4）')
+    snbt.add_argument('--repeat', type=int, default=3, help='重复次数，取最快的一次（默认3）')
+    snbt.add_argument('--compare', metavar='PATH', help='同时测试另一个版本的tellraw.py（如改动前的版本）')
+
+    suite = subparsers.add_parser('suite', help='转换流程各函数的基准测试')
+    suite.add_argument('--corpus', action='append', choices=['small', 'typical', 'pathological'],
+                       help='只测试指定语料，可重复使用（默认全部）')
+    suite.add_argument('--function', action='append', choices=list(SUITE_FUNCTIONS),
+                       help='只测试指定函数，可重复使用（默认全部）')
+    suite.add_argument('--min-time', type=float, default=0.2, help='每项测试的最短计时秒数（默认0.2）')
+    suite.add_argument('--selector-cache', type=int, default=0, help='选择器缓存大小（默认0，即不使用缓存）')
+    suite.add_argument('--output', default='bench_output.txt', help='JSON结果文件（默认bench_output.txt）')
+    suite.add_argument('--baseline', metavar='PATH', help='与之前保存的JSON结果比较')
+    suite.add_argument('--max-regression', type=float, metavar='FRACTION',
+                       help='吞吐量下降超过该比例（如0.2）时以状态1退出')
+
+    adversarial = subparsers.add_parser('adversarial', help='构造的畸形输入下各公开函数的耗时增长测试')
+    adversarial.add_argument('--size', type=int, default=4000, help='输入族的最大规模（默认4000）')
+    adversarial.add_argument('--budget', type=float, default=1.0, help='单次调用的时间预算，秒（默认1）')
+    # 线性的函数在较小规模下受缓存和内存分配影响，测得的指数可能到1.5；二次的约为2
+    adversarial.add_argument('--max-exponent', type=float, default=1.6,
+                             help='耗时随输入长度增长的最大指数，线性为1，二次为2（默认1.6）')
+    adversarial.add_argument('--min-time', type=float, default=0.005,
+                             help='每种规模至少计时的秒数，取平均（默认0.005）')
+    adversarial.add_argument('--repeat', type=int, default=3, help='重复次数，取最快的一次（默认3）')
+    adversarial.add_argument('--function', action='append', choices=list(ADVERSARIAL_FUNCTIONS),
+                             help='只测试指定的函数（可重复）')
+    adversarial.add_argument('--verbose', action='store_true', help='输出每组输入的结果')
+
+    socket_parser = subparsers.add_parser('socket', help='套接字服务负载测试')
+    socket_parser.add_argument('--address', help='已运行服务的地址（主机:端口 或 unix:路径），默认在子进程中启动服务')
+    socket_parser.add_argument('--workers', type=int, default=tellraw.SOCKET_WORKERS,
+                               help=f'自动启动的服务的工作线程数（默认{tellraw.SOCKET_WORKERS}）')
+    socket_parser.add_argument('--connections', type=int, default=4, help='并发连接数（默认4）')
+    socket_parser.add_argument('--requests', type=int, default=20000, help='总请求数（默认20000）')
+    socket_parser.add_argument('--depth', type=int, default=16, help='每个连接未完成请求数的上限（默认16）')
+    socket_parser.add_argument('--seed', type=int, default=0, help='语料随机种子（默认0）')
+
+    startup = subparsers.add_parser('startup', help='启动耗时测试')
+    startup.add_argument('--runs', type=int, default=9, help='运行次数，取中位数（默认9）')
+    startup.add_argument('--import-budget', type=float, default=30.0,
+                         help='导入tellraw的累计耗时预算，毫秒（默认30）')
+    startup.add_argument('--oneshot-budget', type=float, default=40.0,
+                         help='python3 -m tellraw 单次转换比空解释器多出的耗时预算，毫秒（默认40）')
+
+    args = parser.parse_args()
+    if args.command == 'startup':
+        run_startup_benchmark(args)
+    elif args.command == 'socket':
+        run_socket_benchmark(args)
+    elif args.command == 'suite':
+        run_suite_benchmark(args)
+    elif args.command == 'adversarial':
+        run_adversarial_benchmark(args)
+    elif args.command == 'snbt':
+        run_snbt_benchmark(args)
+    elif args.command == 'pack':
+        run_pack_benchmark(args)
+    elif args.command == 'bigfile':
+        run_big_file_benchmark(args)
+    elif args.command == 'diskcache':
+        run_disk_cache_benchmark(args)
+    elif args.command == 'parallel':
+        run_parallel_benchmark(args)
+    elif args.command == 'formatting':
+        run_formatting_benchmark(args)
+    else:
+        if args.command is None:
+            args = batch.parse_args([])
+        run_batch_benchmark(args)
+
+
+if __name__ == '__main__':
+    main()
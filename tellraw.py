@@ -2,12 +2,19 @@
 """
 Minecraft Tellraw指令生成器
 支持Java版和基岩版的目标选择器和文本消息格式转换
+频繁调用（如git钩子）时建议使用 python3 -m tellraw，可以复用已编译的字节码，
+python3 tellraw.py 每次运行都要重新编译整个脚本
 """
 
+import collections
+import functools
+import itertools
 import json
 import sys
 import os
 import re
+import shutil
+import time
 
 # 加载提示池
 PROMPT_FILE = os.path.join(os.path.dirname(__file__), 'tellraw_prompts.json')
@@ -28,7 +35,7 @@ def load_prompts():
                 "selector_type": "检测到目标选择器类型: {}",
                 "java_command": "Java版: {}",
                 "bedrock_command": "基岩版: {}",
-                "usage": "用法:\n  python3 tellraw.py \'目标选择器' \'文本消息\'  # 命令行模式\n  python3 tellraw.py  # 交互式模式",
+                "usage": "用法:\n  python3 tellraw.py \'目标选择器' \'文本消息\'  # 命令行模式（频繁调用时可用 python3 -m tellraw 代替 python3 tellraw.py，启动更快）\n  python3 tellraw.py  # 交互式模式\n  python3 tellraw.py --m-n-decisions 决策文件 [\'目标选择器\' \'文本消息\']  # 混合模式，记录并重放§m/§n的选择\n  python3 tellraw.py --mcfunction 输入文件 输出文件 java|bedrock  # .mcfunction文件转换模式\n  python3 tellraw.py --pack 输入目录 输出目录 java|bedrock [--jobs 进程数] [--incremental]  # 数据包/行为包目录转换模式，--incremental跳过未改变的文件\n  python3 tellraw.py --serve-stdio  # JSONL服务模式，从标准输入逐行读取JSON请求\n  python3 tellraw.py --serve-socket 主机:端口|unix:路径 [--workers 线程数]  # 套接字服务模式\n  python3 tellraw.py --serve-http 主机:端口  # HTTP服务模式（POST /convert、POST /convert/batch）\n  python3 tellraw.py --profile 输出前缀 其他参数...  # 在cProfile下运行以上任一模式，写入 输出前缀.pstats 和 输出前缀.folded（折叠调用栈）；--pack 需加 --jobs 1 才能分析全部转换\n  python3 tellraw.py --memory-report 其他参数...  # 用tracemalloc统计各阶段、每10000次转换和各函数的内存占用，报告输出到标准错误；--pack 同样需加 --jobs 1",
                 "selector_conversion_note": "基岩版选择器 {} 已转换为Java版 {}"
             },
             "m_n_options": {
@@ -37,7 +44,21 @@ def load_prompts():
             }
         }
 
-PROMPTS = load_prompts()
+# 提示池在第一次需要显示提示时才加载，作为库导入时不读取提示文件
+_prompts = None
+
+def get_prompts():
+    """返回提示池，第一次调用时加载"""
+    global _prompts
+    if _prompts is None:
+        _prompts = load_prompts()
+    return _prompts
+
+def __getattr__(name):
+    # 兼容直接访问模块属性PROMPTS的旧代码
+    if name == 'PROMPTS':
+        return get_prompts()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # 颜色代码映射表 - Java版到基岩版的对应关系
 JAVA_COLORS = {
@@ -119,183 +140,624 @@ FORMAT_CODES = {
     '§r': '§r',  # reset
 }
 
+# ==================== 选择器中间表示（IR） ====================
+# 选择器只扫描一次，检测、转换和过滤都在有序参数列表上进行，最后只生成一次选择器字符串
+
+# 参数区中需要关注的结构字符
+_SELECTOR_STRUCT_RE = re.compile(r'[\[\]{},"\\]')
+# 整数值（limit、c、l、lm等参数只接受整数）
+_INT_VALUE_RE = re.compile(r'[+-]?\d+')
+# 普通数值
+_NUMBER_VALUE_RE = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)')
+# 空白字符
+_WHITESPACE_RE = re.compile(r'\s')
+# 去除等号周围、逗号之后以及方括号内侧的空格，引号内的字符串保持不变
+_COMPACT_RE = re.compile(r'"[^"]*"|\s*=\s*|,\s*|\[\s+|\s+\]')
+
+# 基岩版特有选择器变量到Java版的映射
+BEDROCK_TO_JAVA_SELECTORS = {
+    '@initiator': '@a',  # @initiator 在Java版中最接近 @a (所有玩家)
+    '@c': '@a',  # @c (自己的智能体) 在Java版中没有对应，使用 @a
+    '@v': '@a'   # @v (所有智能体) 在Java版中没有对应，使用 @a
+}
+
+# 用于检测选择器类型的特有参数
+JAVA_SELECTOR_PARAMS = frozenset(['distance', 'x_rotation', 'y_rotation', 'nbt', 'team', 'limit', 'sort', 'predicate', 'advancements', 'level', 'gamemode', 'attributes'])
+BEDROCK_SELECTOR_PARAMS = frozenset(['r', 'rm', 'rx', 'rxm', 'ry', 'rym', 'hasitem', 'family', 'l', 'lm', 'm', 'haspermission', 'has_property', 'c'])
+
+
+def _value_kind(value):
+    """判断参数值的类型：compound、list、string、range、number或word"""
+    if value is None:
+        return None
+    body = value[1:] if value.startswith('!') else value
+    if not body:
+        return 'word'
+    first = body[0]
+    if first == '{':
+        return 'compound'
+    if first == '[':
+        return 'list'
+    if first == '"':
+        return 'string'
+    if '..' in body:
+        return 'range'
+    if _NUMBER_VALUE_RE.fullmatch(body):
+        return 'number'
+    return 'word'
+
+
+class SelectorParam:
+    """
+    选择器中的单个参数
+    name为参数名（没有等号的参数为None），value为等号后的原始值，text为参数原文，
+    tight表示参数名与等号之间没有空格（只有这种写法会被转换规则识别）
+    """
+    __slots__ = ('name', 'value', 'text', 'tight', 'kind')
+
+    def __init__(self, name, value, text=None, tight=True):
+        self.name = name
+        self.value = value
+        self.text = f'{name}={value}' if text is None else text
+        self.tight = tight
+        self.kind = _value_kind(value)
+
+    @property
+    def negated(self):
+        """参数值是否为反选（!开头）"""
+        return bool(self.value) and self.value[0] == '!'
+
+    def matches(self, name):
+        """参数名相同、紧跟等号且值非空时返回True"""
+        return self.name == name and self.tight and bool(self.value)
+
+    def __repr__(self):
+        return f'SelectorParam({self.text!r})'
+
+
+def make_selector_param(text):
+    """由参数原文（如 tag=boss）构造SelectorParam"""
+    text = text.strip()
+    if not text:
+        return None
+    eq = text.find('=')
+    if eq == -1:
+        return SelectorParam(None, None, text, False)
+    name = text[:eq].rstrip()
+    return SelectorParam(name, text[eq + 1:], text, len(name) == eq)
+
+
+class SelectorIR:
+    """
+    目标选择器的中间表示：选择器变量和有序的参数列表
+    转换函数不修改原对象，而是返回新的SelectorIR
+    """
+    __slots__ = ('variable', 'params', 'spaced', 'bracketed')
+
+    def __init__(self, variable, params=None, spaced=False, bracketed=False):
+        self.variable = variable
+        self.params = params if params is not None else []
+        self.spaced = spaced  # 参数区中有 ' = ' 或 ', ' 写法（基岩版习惯）
+        self.bracketed = bracketed  # 原选择器带有完整的参数区
+
+    def get(self, name, pattern=None):
+        """返回第一个可识别的同名参数值，可用pattern限制值的格式；没有则返回None"""
+        for param in self.params:
+            if param.matches(name) and (pattern is None or pattern.fullmatch(param.value)):
+                return param.value
+        return None
+
+    def has(self, name):
+        """是否存在紧跟等号的同名参数（值可以为空）"""
+        for param in self.params:
+            if param.name == name and param.tight:
+                return True
+        return False
+
+    def replace(self, params=None, variable=None):
+        """返回替换了参数列表或选择器变量的新IR"""
+        return SelectorIR(self.variable if variable is None else variable,
+                          self.params if params is None else params,
+                          self.spaced, self.bracketed)
+
+    def without(self, *names, value=None, pattern=None):
+        """移除指定名称的参数，可用value或pattern只移除特定值"""
+        params = [param for param in self.params
+                  if not (param.name in names and param.tight and param.value
+                          and (value is None or param.value == value)
+                          and (pattern is None or pattern.fullmatch(param.value)))]
+        if len(params) == len(self.params):
+            return self
+        return self.replace(params)
+
+    def appended(self, *params):
+        """在参数列表末尾追加参数"""
+        return self.replace(self.params + list(params))
+
+    def emit(self):
+        """生成选择器字符串，没有参数时只返回选择器变量"""
+        if not self.params:
+            return self.variable
+        return self.variable + '[' + ','.join([param.text for param in self.params]) + ']'
+
+    def __repr__(self):
+        return f'SelectorIR({self.emit()!r})'
+
+
+def parse_selector(selector):
+    """
+    单遍扫描目标选择器，生成SelectorIR
+    方括号、大括号和引号内的逗号不会被当作参数分隔符，耗时与选择器长度成线性关系
+    """
+    start = selector.find('[')
+    if start == -1:
+        return SelectorIR(selector)
+
+    params = []
+    depth = 0
+    in_string = False
+    escaped_at = -1
+    segment_start = start + 1
+    end = -1
+    for match in _SELECTOR_STRUCT_RE.finditer(selector, start + 1):
+        pos = match.start()
+        if pos == escaped_at:
+            continue
+        char = selector[pos]
+        if in_string:
+            if char == '\\':
+                escaped_at = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '[' or char == '{':
+            depth += 1
+        elif char == ']' or char == '}':
+            if depth:
+                depth -= 1
+            elif char == ']':
+                end = pos
+                break
+        elif char == ',' and not depth:
+            param = make_selector_param(selector[segment_start:pos])
+            if param is not None:
+                params.append(param)
+            segment_start = pos + 1
+
+    if end == -1:
+        # 参数区不完整，按没有参数的选择器处理
+        return SelectorIR(selector)
+
+    param = make_selector_param(selector[segment_start:end])
+    if param is not None:
+        params.append(param)
+    section = selector[start + 1:end]
+    return SelectorIR(selector[:start], params, ' = ' in section or ', ' in section, True)
+
+
+def _as_selector_ir(selector):
+    """接受选择器字符串或SelectorIR，统一返回SelectorIR"""
+    if isinstance(selector, SelectorIR):
+        return selector
+    return parse_selector(selector)
+
+
+def _compact_text(text):
+    """去除参数文本中多余的空格（Java版格式）"""
+    if not _WHITESPACE_RE.search(text):
+        return text
+    return _COMPACT_RE.sub(lambda m: m.group(0) if m.group(0)[0] == '"' else m.group(0).strip(), text)
+
+
+# ==================== SNBT解析 ====================
+# nbt参数的值是SNBT（字符串形式的NBT），用显式栈单遍解析成带源码位置的轻量语法树，
+# 嵌套层数不受限制，耗时与文本长度成线性关系
+
+# SNBT记号：标点、带引号的字符串或不带引号的单词（数字、范围、true等）
+_SNBT_TOKEN_RE = re.compile(
+    r'\s*(?:([{}\[\],:;])|("[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\')|([^\s{}\[\],:;"\']+))',
+    re.DOTALL)
+# 复合标签中的键和紧随的冒号，如 Count: 或 "custom key":
+_SNBT_KEY_RE = re.compile(
+    r'\s*(?:("[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\')|([^\s{}\[\],:;"\']+))\s*:')
+# 数组类型前缀，如 [I;1,2,3]
+_SNBT_ARRAY_TYPE_RE = re.compile(r'\s*([BIL])\s*;')
+# 带类型后缀的数字，如 3b、1.5f、10L
+_SNBT_NUMBER_RE = re.compile(r'([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)([bBsSlLfFdD]?)')
+# 字符串中的转义字符
+_SNBT_ESCAPE_RE = re.compile(r'\\(.)', re.DOTALL)
+
+# 数字后缀对应的NBT类型，没有后缀时整数为int，小数为double
+SNBT_NUMBER_TYPES = {
+    'b': 'byte',
+    's': 'short',
+    'l': 'long',
+    'f': 'float',
+    'd': 'double',
+}
+
+# 解析器状态
+_SNBT_VALUE = 0       # 等待一个值
+_SNBT_LIST_FIRST = 1  # 列表刚开始，等待值或]
+_SNBT_KEY = 2         # 复合标签中等待键或}
+_SNBT_AFTER = 3       # 值之后等待逗号或结束括号
+
+
+class SNBTNode:
+    """
+    SNBT语法树节点，start和end为节点在源文本中的位置（end不包含）
+    kind为compound、list、string、number、range或word：
+      compound  value为[(键, 节点), ...]
+      list      value为[节点, ...]，raw为数组类型（B、I、L）或None
+      string    value为去掉引号和转义后的内容，raw为源文本
+      number    value为去掉类型后缀的数字文本，raw为源文本
+      range/word value和raw均为源文本
+    """
+    __slots__ = ('kind', 'value', 'raw', 'start', 'end')
+
+    def __init__(self, kind, value, raw=None, start=0, end=0):
+        self.kind = kind
+        self.value = value
+        self.raw = raw
+        self.start = start
+        self.end = end
+
+    @property
+    def number_type(self):
+        """数字节点的NBT类型"""
+        if self.kind != 'number':
+            return None
+        suffix = self.raw[len(self.value):].lower()
+        if suffix:
+            return SNBT_NUMBER_TYPES[suffix]
+        return 'int' if _INT_VALUE_RE.fullmatch(self.value) else 'double'
+
+    def get(self, key, kind=None):
+        """返回复合标签中第一个指定键的子节点，可用kind限制节点类型；没有则返回None"""
+        if self.kind == 'compound':
+            for entry_key, node in self.value:
+                if entry_key == key and (kind is None or node.kind == kind):
+                    return node
+        return None
+
+    def walk(self):
+        """按源文本顺序遍历所有子孙节点，生成(键, 节点)，列表元素的键为None"""
+        stack = [iter(self.value)] if self.kind in ('compound', 'list') else []
+        while stack:
+            for entry in stack[-1]:
+                key, node = entry if isinstance(entry, tuple) else (None, entry)
+                yield key, node
+                if node.kind in ('compound', 'list'):
+                    stack.append(iter(node.value))
+                    break
+            else:
+                stack.pop()
+
+    def find(self, key, kind=None):
+        """按源文本顺序查找第一个指定键的子孙节点，可用kind限制节点类型；没有则返回None"""
+        for entry_key, node in self.walk():
+            if entry_key == key and (kind is None or node.kind == kind):
+                return node
+        return None
+
+    def __repr__(self):
+        return f'SNBTNode({self.kind!r}, {self.start}, {self.end})'
+
+
+def _snbt_scalar(token, quoted, start, end):
+    """由单个记号生成字符串、数字、范围或单词节点"""
+    if quoted:
+        return SNBTNode('string', _SNBT_ESCAPE_RE.sub(r'\1', token[1:-1]), token, start, end)
+    if '..' in token:
+        return SNBTNode('range', token, token, start, end)
+    match = _SNBT_NUMBER_RE.fullmatch(token)
+    if match:
+        return SNBTNode('number', match.group(1), token, start, end)
+    return SNBTNode('word', token, token, start, end)
+
+
+def parse_snbt_at(text, pos=0):
+    """
+    从text的pos处解析一个SNBT值，返回(根节点, 结束位置)
+    格式错误或不完整时抛出ValueError
+    """
+    stack = []
+    state = _SNBT_VALUE
+    key = None
+    while True:
+        if state == _SNBT_KEY:
+            # 键和冒号一起匹配，不是键时按}处理
+            match = _SNBT_KEY_RE.match(text, pos)
+            if match is not None:
+                pos = match.end()
+                key = match.group(2)
+                if key is None:
+                    key = _SNBT_ESCAPE_RE.sub(r'\1', match.group(1)[1:-1])
+                state = _SNBT_VALUE
+                continue
+
+        match = _SNBT_TOKEN_RE.match(text, pos)
+        if match is None:
+            if pos >= len(text) or not text[pos:].strip():
+                raise ValueError('SNBT不完整')
+            raise ValueError(f'SNBT在位置{pos}处有无法识别的字符')
+        group = match.lastindex
+        start, pos = match.span(group)
+        token = match.group(group)
+
+        if state == _SNBT_VALUE or state == _SNBT_LIST_FIRST:
+            if group != 1:
+                node = _snbt_scalar(token, group == 2, start, pos)
+                if not stack:
+                    return node, pos
+                parent = stack[-1]
+                parent.value.append((key, node) if parent.kind == 'compound' else node)
+                state = _SNBT_AFTER
+                continue
+            if token == '{' or token == '[':
+                node = SNBTNode('compound' if token == '{' else 'list', [], None, start)
+                if stack:
+                    parent = stack[-1]
+                    parent.value.append((key, node) if parent.kind == 'compound' else node)
+                stack.append(node)
+                if token == '{':
+                    state = _SNBT_KEY
+                    continue
+                array_match = _SNBT_ARRAY_TYPE_RE.match(text, pos)
+                if array_match:
+                    node.raw = array_match.group(1)
+                    pos = array_match.end()
+                state = _SNBT_LIST_FIRST
+                continue
+            if not (token == ']' and state == _SNBT_LIST_FIRST):
+                raise ValueError(f'SNBT在位置{start}处缺少值')
+        elif state == _SNBT_KEY:
+            if not (token == '}' and not stack[-1].value):
+                raise ValueError(f'SNBT在位置{start}处缺少键')
+        else:
+            if group == 1 and token == ',':
+                state = _SNBT_KEY if stack[-1].kind == 'compound' else _SNBT_VALUE
+                continue
+            if group != 1 or token != ('}' if stack[-1].kind == 'compound' else ']'):
+                raise ValueError(f'SNBT在位置{start}处缺少逗号或结束括号')
+
+        # 结束当前复合标签或列表
+        node = stack.pop()
+        node.end = pos
+        if not stack:
+            return node, pos
+        state = _SNBT_AFTER
+
+
+def parse_snbt(text):
+    """解析完整的SNBT文本，返回根节点；格式错误、不完整或有多余内容时抛出ValueError"""
+    node, end = parse_snbt_at(text)
+    if text[end:].strip():
+        raise ValueError(f'SNBT在位置{end}处有多余内容')
+    return node
+
+
+def _parse_nbt_compound(value):
+    """解析nbt参数值，必须是以{开头的复合标签；不能解析时返回None"""
+    if not value.startswith('{'):
+        return None
+    try:
+        return parse_snbt(value)
+    except ValueError:
+        return None
+
+
+def _sub_nbt_params(params_part, replace):
+    """
+    在参数文本中查找nbt={...}参数，对每个能解析的值调用replace(根节点)，
+    用返回的文本替换整个nbt参数
+    """
+    pieces = []
+    pos = 0
+    search = 0
+    while True:
+        index = params_part.find('nbt={', search)
+        if index == -1:
+            break
+        try:
+            root, end = parse_snbt_at(params_part, index + 4)
+        except ValueError:
+            search = index + 4
+            continue
+        pieces.append(params_part[pos:index])
+        pieces.append(replace(root))
+        pos = search = end
+    if not pieces:
+        return params_part
+    pieces.append(params_part[pos:])
+    return ''.join(pieces)
+
+
 def detect_selector_type(selector):
     """
     检测目标选择器是Java版还是基岩版
     如果是通用的，返回'bedrock'作为默认值
+    selector可以是选择器字符串或SelectorIR
     """
-    # 检查Java版特有参数
-    java_specific_params = ['distance', 'x_rotation', 'y_rotation', 'nbt', 'team', 'limit', 'sort', 'predicate', 'advancements', 'level', 'gamemode', 'attributes']
-    # 检查基岩版特有参数
-    bedrock_specific_params = ['r', 'rm', 'rx', 'rxm', 'ry', 'rym', 'hasitem', 'family', 'l', 'lm', 'm', 'haspermission', 'has_property', 'c']
-    
-    # 检查选择器变量
-    selector_var = selector.split('[')[0] if '[' in selector else selector
-    
+    ir = _as_selector_ir(selector)
+
     # 基岩版特有的选择器变量
-    bedrock_specific_selectors = ['@initiator', '@c', '@v']
-    # Java版特有的选择器参数
-    java_specific_selectors = []
-    
-    # 检查选择器变量
-    if selector_var in bedrock_specific_selectors:
+    if ir.variable in BEDROCK_TO_JAVA_SELECTORS:
         return 'bedrock'
-    elif selector_var in java_specific_selectors:
-        return 'java'
-    
-    # 提取参数部分
+
+    # 统计两个版本特有参数的数量
     java_count = 0
     bedrock_count = 0
-    
-    if '[' in selector and ']' in selector:
-        params_part = selector[selector.find('[')+1:selector.find(']')]
-        params = [p.strip() for p in params_part.split(',')]
-        
-        for param in params:
-            if '=' in param:
-                param_name = param.split('=')[0].strip()
-                if param_name in java_specific_params:
-                    java_count += 1
-                elif param_name in bedrock_specific_params:
-                    bedrock_count += 1
-                
-    
+    for param in ir.params:
+        if param.name in JAVA_SELECTOR_PARAMS:
+            java_count += 1
+        elif param.name in BEDROCK_SELECTOR_PARAMS:
+            bedrock_count += 1
+
     # 检查坐标参数格式
     # Java版: x=1,y=2,z=3 (无空格)
     # 基岩版: x=1, y=2, z=3 (可以有空格)
-    if '[' in selector and ']' in selector:
-        params_part = selector[selector.find('[')+1:selector.find(']')]
-        # 如果有空格在等号周围，更可能是基岩版
-        if ' = ' in params_part or ', ' in params_part:
-            bedrock_count += 1
-    
+    if ir.spaced:
+        bedrock_count += 1
+
     if java_count > bedrock_count:
         return 'java'
-    elif bedrock_count > java_count:
-        return 'bedrock'
-    else:
-        # 当Java参数和基岩参数数量相等时，尝试使用其他启发式方法
-        # 如果参数完全相等或只有通用参数，使用更细致的判断
-        if java_count == 0 and bedrock_count == 0 and '[' in selector and ']' in selector:
-            # 只有通用参数，根据社区使用习惯，Java版更常使用scores等参数
-            # 所以如果只有通用参数，更可能认为是Java版
-            params_part = selector[selector.find('[')+1:selector.find(']')]
-            params = [p.strip() for p in params_part.split(',')]
-            for param in params:
-                if '=' in param:
-                    param_name = param.split('=')[0].strip()
-                    
-        # 默认返回bedrock
-        return 'bedrock'
+    # 数量相等或只有通用参数时默认返回bedrock
+    return 'bedrock'
 
 def convert_bedrock_selector_to_java(selector):
     """
     将基岩版特有的选择器转换为Java版兼容的选择器
     """
-    import re
-    
-    # 基岩版特有选择器变量到Java版的映射
-    bedrock_to_java_mapping = {
-        '@initiator': '@a',  # @initiator 在Java版中最接近 @a (所有玩家)
-        '@c': '@a',  # @c (自己的智能体) 在Java版中没有对应，使用 @a
-        '@v': '@a'   # @v (所有智能体) 在Java版中没有对应，使用 @a
-    }
-    
-    # 检查选择器变量
-    selector_var = selector.split('[')[0] if '[' in selector else selector
-    params_part = ''
-    
-    if '[' in selector and ']' in selector:
-        params_part = selector[selector.find('['):]  # 保留参数部分
-    
-    # 检查是否为基岩版特有选择器
-    if selector_var in bedrock_to_java_mapping:
-        # 保留参数部分，替换选择器变量
-        new_selector = bedrock_to_java_mapping[selector_var] + params_part
-        # 转换参数格式
-        converted_selector, param_reminders = convert_selector_parameters(new_selector)
-        
-        # 添加选择器变量转换的提醒信息
-        conversion_note = f"基岩版选择器 {selector_var} 在Java版中不支持，已转换为 {bedrock_to_java_mapping[selector_var]}"
-        param_reminders.append(conversion_note)
-        
-        return converted_selector, True, param_reminders  # 返回转换后的选择器、转换状态和提醒
-    else:
-        # 即使不是基岩版特有选择器，也要转换参数格式
-        converted_selector, param_reminders = convert_selector_parameters(selector)
-        # 只有当选择器变量发生了实际的基岩版到Java版的转换时才返回True
-        return converted_selector, False, param_reminders  # 返回转换后的选择器、转换状态和提醒
+    java_ir, was_converted, reminders = _bedrock_selector_to_java_ir(_as_selector_ir(selector))
+    return java_ir.emit(), was_converted, reminders  # 返回转换后的选择器、转换状态和提醒
+
+def _bedrock_selector_to_java_ir(ir):
+    """convert_bedrock_selector_to_java的IR版本，返回(SelectorIR, 是否转换了选择器变量, 提醒列表)"""
+    java_variable = BEDROCK_TO_JAVA_SELECTORS.get(ir.variable)
+    if java_variable:
+        if _rule_recorders:
+            start = time.perf_counter_ns()
+        # 保留参数部分，替换选择器变量并转换参数格式
+        converted, reminders = _convert_selector_parameters_ir(ir, java_variable)
+        reminders.append(f"基岩版选择器 {ir.variable} 在Java版中不支持，已转换为 {java_variable}")
+        if _rule_recorders:
+            _rule_fired(f'{ir.variable}->{java_variable}', start, ir.variable, lossy=True)
+        return converted, True, reminders
+    # 即使不是基岩版特有选择器，也要转换参数格式
+    converted, reminders = _convert_selector_parameters_ir(ir)
+    return converted, False, reminders
 
 def convert_selector_parameters(selector, selector_var=None):
     """
     转换选择器参数格式，去除Java版参数中的空格并处理参数转换
     """
-    import re
-    
-    # 如果没有参数部分，直接返回
-    if '[' not in selector or ']' not in selector:
-        return selector, []
-    
-    # 提取选择器变量和参数部分
-    current_selector_var = selector.split('[')[0] if selector_var is None else selector_var
-    params_part = selector[selector.find('['):]
-    
+    converted, reminders = _convert_selector_parameters_ir(_as_selector_ir(selector), selector_var)
+    return converted.emit(), reminders
+
+def _convert_selector_parameters_ir(ir, selector_var=None):
+    """convert_selector_parameters的IR版本"""
+    if not ir.bracketed:
+        return ir.replace(variable=selector_var), []
+
     # 处理hasitem参数转换为nbt参数并收集提醒
-    converted_params, hasitem_reminders = convert_hasitem_to_nbt_with_reminders(params_part)
-    
-    # 只在检测到NBT参数时才调用范围值处理函数
-    if 'nbt=' in converted_params:
-        converted_params = process_range_values(converted_params)
-    
-    # 使用更精确的正则表达式去除所有不必要的空格，确保不会影响字符串值中的空格
-    # 去除等号周围的空格（但不在字符串内部）
-    # 首先保护字符串内容（引号内的内容）
-    string_pattern = r'"([^"]*)"'
-    strings = []
-    def protect_strings(match):
-        strings.append(match.group(0))
-        return f"__STRING_{len(strings)-1}__"
-    
-    # 保护所有字符串
-    converted_params = re.sub(string_pattern, protect_strings, converted_params)
-    
-    # 去除等号周围的空格
-    converted_params = re.sub(r'\s*=\s*', '=', converted_params)
-    # 去除逗号后的空格
-    converted_params = re.sub(r',\s*', ',', converted_params)
-    # 去除方括号内的前后空格
-    converted_params = re.sub(r'\[\s+', '[', converted_params)
-    converted_params = re.sub(r'\s+\]', ']', converted_params)
-    
-    # 恢复字符串内容
-    for i, string in enumerate(strings):
-        converted_params = converted_params.replace(f"__STRING_{i}__", string)
-    
-    all_reminders = hasitem_reminders
-    return current_selector_var + converted_params, all_reminders
+    converted, reminders = _convert_hasitem_params(ir)
+
+    params = []
+    for param in converted.params:
+        # 只处理NBT参数中的范围值
+        if param.name == 'nbt' and param.tight and param.value:
+            processed = process_range_values(param.text)
+            if processed != param.text:
+                param = make_selector_param(processed)
+        # 去除等号周围、逗号之后的空格，字符串值中的空格保持不变
+        compacted = _compact_text(param.text)
+        if compacted != param.text:
+            param = make_selector_param(compacted)
+        params.append(param)
+
+    return converted.replace(params, selector_var), reminders
+
+def _convert_hasitem_params(ir):
+    """
+    将IR中的hasitem参数转换为nbt参数
+    数组格式 hasitem=[{...}] 的提醒排在简单格式 hasitem={...} 之前
+    """
+    complex_reminders = []
+    simple_reminders = []
+    params = []
+    changed = False
+    for param in ir.params:
+        value = param.value
+        if param.name == 'hasitem' and param.tight and value:
+            if _rule_recorders:
+                start = time.perf_counter_ns()
+            nbt_result = None
+            if value[0] == '[' and value[-1] == ']' and '[' not in value[1:-1] and ']' not in value[1:-1]:
+                # 复杂格式 [{}]
+                nbt_result, item_reminders = parse_hasitem_complex(value[1:-1])
+                reminders = complex_reminders
+            elif value[0] == '{' and value.find('}') == len(value) - 1:
+                # 简单格式 {...}
+                nbt_result, item_reminders = parse_hasitem_simple(value[1:-1])
+                reminders = simple_reminders
+            else:
+                params.append(param)
+                continue
+            reminders.extend(item_reminders)
+            if nbt_result:
+                if _rule_recorders:
+                    _rule_fired('hasitem->nbt', start, param.text)
+                param = make_selector_param(nbt_result)
+                changed = True
+            else:
+                # 转换失败，保留原始hasitem参数并添加提醒
+                reminders.append("hasitem参数转换失败，保留原始hasitem参数")
+                if _rule_recorders:
+                    _rule_fired('hasitem->kept', start, param.text, lossy=True)
+        params.append(param)
+    if not changed:
+        return ir, complex_reminders + simple_reminders
+    return ir.replace(params), complex_reminders + simple_reminders
+
+# 以下字符串形式的旧版转换函数使用的正则表达式，在导入时统一编译
+# limit/c参数的整数值
+_LIMIT_INT_PARAM_RE = re.compile(r'limit=([+-]?\d+)')
+_C_INT_PARAM_RE = re.compile(r'c=([+-]?\d+)')
+# limit/c参数的任意值（可以反选）
+_LIMIT_PARAM_RE = re.compile(r'limit=(!?)([^,\]]+)')
+_C_PARAM_RE = re.compile(r'c=(!?)([^,\]]+)')
+# sort参数
+_SORT_PARAM_RE = re.compile(r'sort=([^,\]]+)')
+# hasitem参数的数组格式和简单格式
+_HASITEM_ARRAY_PARAM_RE = re.compile(r'hasitem=\[([^\[\]]*)\]')
+_HASITEM_OBJECT_PARAM_RE = re.compile(r'hasitem=\{([^}]*)\}')
+# hasitem对象中的逗号和大括号
+_HASITEM_FIELD_CHAR_RE = re.compile(r'[{},]')
+
+def _split_hasitem_fields(content):
+    """
+    按分隔字段的逗号分割hasitem对象的内容：其后出现的第一个大括号是}的逗号在大括号内，不分割
+    从右向左扫描一遍，耗时与文本长度成线性关系（用正则前瞻判断时每个逗号都要向后扫描，
+    逗号很多而没有大括号时耗时是二次的）
+    """
+    if ',' not in content:
+        return [content]
+    parts = []
+    end = len(content)
+    inside = False
+    for match in reversed(list(_HASITEM_FIELD_CHAR_RE.finditer(content))):
+        char = match.group()
+        if char == '}':
+            inside = True
+        elif char == '{':
+            inside = False
+        elif not inside:
+            parts.append(content[match.end():end])
+            end = match.start()
+    parts.append(content[:end])
+    parts.reverse()
+    return parts
 
 def convert_limit_c_parameters(params_part):
     """
     将limit和c参数互相转换
     """
-    import re
-    
     reminders = []
     
     # 处理limit参数转换为c参数（Java版到基岩版）
     # 注意：只有在没有sort参数的情况下才直接转换limit为c
     # 如果有sort参数，转换逻辑在convert_sort_parameters中处理
-    limit_pattern = r'limit=([+-]?\d+)'
     def replace_limit_to_c(match):
         limit_value = match.group(1)
         reminders.append(f"Java版limit={limit_value}参数已转换为基岩版c={limit_value}")
         reminders.append("limit只是限制数量，c当由近到远")
         return f'c={limit_value}'
     
-    params_part = re.sub(limit_pattern, replace_limit_to_c, params_part)
+    params_part = _LIMIT_INT_PARAM_RE.sub(replace_limit_to_c, params_part)
     
     # 处理c参数转换为limit参数（基岩版到Java版）
-    c_pattern = r'c=([+-]?\d+)'
     def replace_c_to_limit(match):
         c_value = match.group(1)
         # 当c=数字时，转换为limit=数字,sort=nearest
@@ -308,7 +770,7 @@ def convert_limit_c_parameters(params_part):
             reminders.append(f"基岩版c={c_value}参数已转换为Java版limit={abs_c_val},sort=furthest")
             return f'limit={abs_c_val},sort=furthest'
     
-    params_part = re.sub(c_pattern, replace_c_to_limit, params_part)
+    params_part = _C_INT_PARAM_RE.sub(replace_c_to_limit, params_part)
     
     return params_part, reminders
 
@@ -316,20 +778,16 @@ def convert_sort_parameters(params_part, selector_var):
     """
     将Java版sort参数转换为基岩版c参数
     """
-    import re
-    
     reminders = []
     
     # 查找sort参数
-    sort_pattern = r'sort=([^,\]]+)'
-    match = re.search(sort_pattern, params_part)
+    match = _SORT_PARAM_RE.search(params_part)
     
     if match:
         sort_value = match.group(1)
         
         # 查找limit参数（如果存在）
-        limit_pattern = r'limit=([+-]?\d+)'
-        limit_match = re.search(limit_pattern, params_part)
+        limit_match = _LIMIT_INT_PARAM_RE.search(params_part)
         limit_value = limit_match.group(1) if limit_match else None
         
         # 根据sort值进行转换
@@ -338,12 +796,12 @@ def convert_sort_parameters(params_part, selector_var):
             # 当只有sort=nearest，没有limit时，基岩版转换为c=9999
             c_value = limit_value if limit_value else '9999'
             # 移除sort参数和limit参数
-            params_part = re.sub(sort_pattern, '', params_part)
+            params_part = _SORT_PARAM_RE.sub('', params_part)
             if limit_value:
-                params_part = re.sub(limit_pattern, '', params_part)
+                params_part = _LIMIT_INT_PARAM_RE.sub('', params_part)
             # 添加c参数
-            if re.search(r'c=[+-]?\d+', params_part):
-                params_part = re.sub(r'c=[+-]?\d+', f'c={c_value}', params_part)
+            if _C_INT_PARAM_RE.search(params_part):
+                params_part = _C_INT_PARAM_RE.sub(f'c={c_value}', params_part)
             else:
                 if params_part.endswith('['):
                     params_part = params_part[:-1] + f'c={c_value}]'
@@ -357,12 +815,12 @@ def convert_sort_parameters(params_part, selector_var):
             # 当只有sort=furthest，没有limit时，基岩版转换为c=-9999
             c_value = f"-{limit_value}" if limit_value else '-9999'
             # 移除sort参数和limit参数
-            params_part = re.sub(sort_pattern, '', params_part)
+            params_part = _SORT_PARAM_RE.sub('', params_part)
             if limit_value:
-                params_part = re.sub(limit_pattern, '', params_part)
+                params_part = _LIMIT_INT_PARAM_RE.sub('', params_part)
             # 添加c参数
-            if re.search(r'c=[+-]?\d+', params_part):
-                params_part = re.sub(r'c=[+-]?\d+', f'c={c_value}', params_part)
+            if _C_INT_PARAM_RE.search(params_part):
+                params_part = _C_INT_PARAM_RE.sub(f'c={c_value}', params_part)
             else:
                 if params_part.endswith('['):
                     params_part = params_part[:-1] + f'c={c_value}]'
@@ -373,7 +831,7 @@ def convert_sort_parameters(params_part, selector_var):
             reminders.append(f"Java版sort=furthest已转换为基岩版c={c_value}")
         elif sort_value == 'arbitrary':
             # 基岩版不支持sort=arbitrary，直接移除
-            params_part = re.sub(sort_pattern, '', params_part)
+            params_part = _SORT_PARAM_RE.sub('', params_part)
             reminders.append("Java版sort=arbitrary在基岩版中不支持，已移除")
         elif sort_value == 'random':
             # 当@a[limit=数字,sort=random]或@r[limit=数字,sort=random]时，转换为@r[c=数字]
@@ -382,12 +840,12 @@ def convert_sort_parameters(params_part, selector_var):
             if selector_var in ['@a', '@r']:
                 # 对于@a[sort=random]或@r[sort=random]，转换为@r[c=9999]
                 # 移除sort参数和limit参数
-                params_part = re.sub(sort_pattern, '', params_part)
+                params_part = _SORT_PARAM_RE.sub('', params_part)
                 if limit_value:
-                    params_part = re.sub(limit_pattern, '', params_part)
+                    params_part = _LIMIT_INT_PARAM_RE.sub('', params_part)
                 # 添加c参数
-                if re.search(r'c=[+-]?\d+', params_part):
-                    params_part = re.sub(r'c=[+-]?\d+', f'c={c_value}', params_part)
+                if _C_INT_PARAM_RE.search(params_part):
+                    params_part = _C_INT_PARAM_RE.sub(f'c={c_value}', params_part)
                 else:
                     if params_part.endswith('['):
                         params_part = params_part[:-1] + f'c={c_value}]'
@@ -399,12 +857,12 @@ def convert_sort_parameters(params_part, selector_var):
             else:
                 # 对于其他选择器，如@e[sort=random,limit=N]，转换为@e[c=N]
                 # 移除sort参数和limit参数
-                params_part = re.sub(sort_pattern, '', params_part)
+                params_part = _SORT_PARAM_RE.sub('', params_part)
                 if limit_value:
-                    params_part = re.sub(limit_pattern, '', params_part)
+                    params_part = _LIMIT_INT_PARAM_RE.sub('', params_part)
                 # 添加c参数
-                if re.search(r'c=[+-]?\d+', params_part):
-                    params_part = re.sub(r'c=[+-]?\d+', f'c={c_value}', params_part)
+                if _C_INT_PARAM_RE.search(params_part):
+                    params_part = _C_INT_PARAM_RE.sub(f'c={c_value}', params_part)
                 else:
                     if params_part.endswith('['):
                         params_part = params_part[:-1] + f'c={c_value}]'
@@ -415,14 +873,11 @@ def convert_sort_parameters(params_part, selector_var):
                 reminders.append(f"Java版sort=random已转换为基岩版c={c_value}")
         else:
             # 其他情况砍掉并提示
-            params_part = re.sub(sort_pattern, '', params_part)
+            params_part = _SORT_PARAM_RE.sub('', params_part)
             reminders.append(f"Java版sort={sort_value}在基岩版中不支持，已移除")
     
     # 清理多余的逗号和空括号
-    params_part = re.sub(r',,', ',', params_part)
-    params_part = re.sub(r'\[,', '[', params_part)
-    params_part = re.sub(r',\]', ']', params_part)
-    params_part = re.sub(r'\[\]', '', params_part)
+    params_part = params_part.replace(',,', ',').replace('[,', '[').replace(',]', ']').replace('[]', '')
     
     return params_part, reminders
 
@@ -430,13 +885,10 @@ def convert_hasitem_to_nbt_with_reminders(params_part):
     """
     将基岩版的hasitem参数转换为Java版的nbt参数，并返回提醒信息
     """
-    import re
-    
     reminders = []
     
     # 处理hasitem的复杂格式：hasitem=[{...},{...}] 或 hasitem={...}
     # 先处理复杂格式 [{}]
-    complex_pattern = r'hasitem=\[([^\[\]]*)\]'
     def replace_complex_hasitem(match):
         full_match = match.group(0)  # 完整的匹配，如 hasitem=[{...}]
         content = match.group(1)
@@ -449,10 +901,9 @@ def convert_hasitem_to_nbt_with_reminders(params_part):
             reminders.append(f"hasitem参数转换失败，保留原始hasitem参数")
             return full_match
     
-    params_part = re.sub(complex_pattern, replace_complex_hasitem, params_part)
+    params_part = _HASITEM_ARRAY_PARAM_RE.sub(replace_complex_hasitem, params_part)
     
     # 再处理简单格式 {...}
-    simple_pattern = r'hasitem=\{([^}]*)\}'
     def replace_simple_hasitem(match):
         full_match = match.group(0)  # 完整的匹配，如 hasitem={...}
         content = match.group(1)
@@ -465,516 +916,374 @@ def convert_hasitem_to_nbt_with_reminders(params_part):
             reminders.append(f"hasitem参数转换失败，保留原始hasitem参数")
             return full_match
     
-    params_part = re.sub(simple_pattern, replace_simple_hasitem, params_part)
+    params_part = _HASITEM_OBJECT_PARAM_RE.sub(replace_simple_hasitem, params_part)
     
     # 清理多余的逗号和空括号
-    params_part = re.sub(r',,', ',', params_part)
-    params_part = re.sub(r',\]', ']', params_part)
-    params_part = re.sub(r'\[,', '[', params_part)
+    params_part = params_part.replace(',,', ',').replace(',]', ']').replace('[,', '[')
     
     return params_part, reminders
 
+# Java版游戏模式到基岩版的映射
+JAVA_TO_BEDROCK_GAMEMODE = {
+    'survival': 'survival',  # 生存模式 -> 生存模式
+    'creative': 'creative',  # 创造模式 -> 创造模式
+    'adventure': 'adventure',  # 冒险模式 -> 冒险模式
+    'spectator': 'survival'  # 旁观模式 -> 生存模式（基岩版没有旁观模式）
+}
+
+# 基岩版游戏模式到Java版的映射
+BEDROCK_TO_JAVA_GAMEMODE = {
+    'survival': 'survival',  # 生存模式 -> 生存模式
+    'creative': 'creative',  # 创造模式 -> 创造模式
+    'adventure': 'adventure',  # 冒险模式 -> 冒险模式
+    'default': 'survival',  # 默认模式 -> 生存模式
+    's': 'survival',  # 缩写 -> 全称
+    'c': 'creative',  # 缩写 -> 全称
+    'a': 'adventure',  # 缩写 -> 全称
+    'd': 'survival',  # 缩写 -> 生存模式
+    '0': 'survival',  # 数字 -> 全称
+    '1': 'creative',  # 数字 -> 全称
+    '2': 'adventure',  # 数字 -> 全称
+    '5': 'survival'  # 数字 -> 生存模式
+}
+
+# ==================== 参数转换规则表 ====================
+# 每条规则描述一个参数转换到目标版本（target）时的处理方式，按kind分为：
+#   value  值映射：to为目标参数名，values为值映射表，lossy中的值没有直接对应，转换时总会给出提醒
+#   count  数量参数：to为目标参数名，只转换整数值；negative_reminder用于基岩版负数c值
+#   range  范围参数：Java版范围值与基岩版下限(min)/上限(max)参数互相转换，
+#          pattern为合并基岩版参数时要求的值格式，collapse_equal表示上下限相等时合并为单个值
+#   remove 目标版本中没有对应功能，直接剔除
+# 提醒模板中可用的字段：{name}参数名、{value}原值、{mapped}映射后的值、{converted}转换后的参数
+SELECTOR_PARAM_RULES = (
+    {'name': 'gamemode', 'target': 'bedrock', 'kind': 'value', 'to': 'm',
+     'values': JAVA_TO_BEDROCK_GAMEMODE, 'lossy': ('spectator',),
+     'reminder': "Java版gamemode={value}参数已转换为基岩版m={mapped}",
+     'lossy_reminder': "Java版旁观模式(gamemode={value})在基岩版中不支持，已转换为生存模式",
+     'negated_lossy_reminder': "Java版反选旁观模式(gamemode=!{value})在基岩版中不支持，已转换为反选生存模式"},
+    {'name': 'm', 'target': 'java', 'kind': 'value', 'to': 'gamemode',
+     'values': BEDROCK_TO_JAVA_GAMEMODE, 'lossy': ('default', 'd', '5'),
+     'reminder': "基岩版m={value}参数已转换为Java版gamemode={mapped}",
+     'lossy_reminder': "基岩版默认模式(m={value})在Java版中不支持，已转换为生存模式",
+     'negated_lossy_reminder': "基岩版反选默认模式(m=!{value})在Java版中不支持，已转换为反选生存模式"},
+
+    {'name': 'limit', 'target': 'bedrock', 'kind': 'count', 'to': 'c',
+     'reminder': "Java版limit={value}参数已转换为基岩版c={value}"},
+    {'name': 'c', 'target': 'java', 'kind': 'count', 'to': 'limit',
+     'reminder': "基岩版c={value}参数已转换为Java版limit={value}",
+     'negative_reminder': "基岩版c={value}参数已转换为Java版limit={mapped},sort=furthest"},
+
+    {'name': 'distance', 'target': 'bedrock', 'kind': 'range', 'min': 'rm', 'max': 'r',
+     'pattern': None, 'collapse_equal': False,
+     'reminder': "Java版{name}={value}参数已转换为基岩版{converted}"},
+    {'name': 'x_rotation', 'target': 'bedrock', 'kind': 'range', 'min': 'rxm', 'max': 'rx',
+     'pattern': None, 'collapse_equal': False,
+     'reminder': "Java版{name}={value}参数已转换为基岩版{converted}"},
+    {'name': 'y_rotation', 'target': 'bedrock', 'kind': 'range', 'min': 'rym', 'max': 'ry',
+     'pattern': None, 'collapse_equal': True,
+     'reminder': "Java版{name}={value}参数已转换为基岩版{converted}"},
+    {'name': 'level', 'target': 'bedrock', 'kind': 'range', 'min': 'lm', 'max': 'l',
+     'pattern': _INT_VALUE_RE, 'collapse_equal': False,
+     'reminder': "Java版{name}={value}参数已转换为基岩版{converted}"},
+
+    {'name': 'team', 'target': 'bedrock', 'kind': 'remove',
+     'reminder': "警告：Java版team参数在基岩版中不支持，已移除。基岩版中没有队伍系统的直接对应功能"},
+    {'name': 'predicate', 'target': 'bedrock', 'kind': 'remove',
+     'reminder': "警告：Java版predicate参数在基岩版中不支持，已移除。基岩版中没有谓词系统"},
+    {'name': 'advancements', 'target': 'bedrock', 'kind': 'remove',
+     'reminder': "警告：Java版advancements参数在基岩版中不支持，已移除。基岩版中没有进度系统"},
+    {'name': 'haspermission', 'target': 'java', 'kind': 'remove',
+     'reminder': "警告：基岩版haspermission参数在Java版中没有对应的功能，已移除"},
+    {'name': 'has_property', 'target': 'java', 'kind': 'remove',
+     'reminder': "警告：基岩版has_property参数在Java版中没有对应的功能，已移除"},
+    {'name': 'family', 'target': 'java', 'kind': 'remove',
+     'reminder': "警告：基岩版family参数在Java版中没有直接对应的功能，已移除。建议使用type参数指定实体类型作为替代"},
+)
+
+# 编译后的规则分派表：{目标版本: {参数名: 规则}}，首次使用时生成
+_param_rule_dispatch = None
+# 按规则表顺序排列的范围规则，同时可按Java版参数名查找
+_range_rules = None
+_range_rules_by_name = None
+
+def _compile_param_rules():
+    """将SELECTOR_PARAM_RULES编译为按参数名查找的分派表"""
+    global _param_rule_dispatch, _range_rules, _range_rules_by_name
+    dispatch = {'java': {}, 'bedrock': {}}
+    for rule in SELECTOR_PARAM_RULES:
+        dispatch[rule['target']][rule['name']] = rule
+    _range_rules = tuple(rule for rule in SELECTOR_PARAM_RULES if rule['kind'] == 'range')
+    _range_rules_by_name = {rule['name']: rule for rule in _range_rules}
+    _param_rule_dispatch = dispatch
+
+def get_param_rules(target_version):
+    """返回转换到目标版本时的规则分派表（参数名 -> 规则）"""
+    if _param_rule_dispatch is None:
+        _compile_param_rules()
+    return _param_rule_dispatch[target_version]
+
+def get_range_rules():
+    """返回所有范围规则（Java版distance、x_rotation、y_rotation、level），按规则表顺序排列"""
+    if _range_rules is None:
+        _compile_param_rules()
+    return _range_rules
+
+def get_range_rule(java_name):
+    """按Java版参数名返回范围规则"""
+    if _range_rules_by_name is None:
+        _compile_param_rules()
+    return _range_rules_by_name[java_name]
+
+def _split_negation(value):
+    """拆分参数值开头的反选符号，返回(反选符号, 去除空格后的值)"""
+    if len(value) > 1 and value[0] == '!':
+        return '!', value[1:].strip()
+    return '', value.strip()
+
+def _apply_value_rule(rule, param, reminders, report_all=False):
+    """按值映射规则转换参数（如gamemode <-> m），无法转换时返回原参数"""
+    if _rule_recorders:
+        start = time.perf_counter_ns()
+    negation, value = _split_negation(param.value)
+    mapped = rule['values'].get(value)
+    if mapped is None:
+        # 保持原值
+        return param
+    if value in rule['lossy']:
+        # 目标版本中没有对应的值，需要提醒用户
+        template = rule['negated_lossy_reminder'] if negation else rule['lossy_reminder']
+        reminders.append(template.format(value=value))
+        if _rule_recorders:
+            _rule_fired(f"{rule['name']}={value}->{rule['to']}={mapped}", start, param.text, lossy=True)
+    else:
+        if report_all:
+            reminders.append(rule['reminder'].format(value=value, mapped=mapped))
+        if _rule_recorders:
+            _rule_fired(f"{rule['name']}->{rule['to']}", start, param.text)
+    return SelectorParam(rule['to'], negation + mapped)
+
+def _apply_count_rule(rule, param, reminders, has_sort=False):
+    """
+    按数量规则转换参数（如limit <-> c），返回转换后的参数列表，非整数值返回None
+    基岩版负数c值表示由远到近，转换为Java版时使用绝对值并添加sort=furthest
+    """
+    value = param.value
+    if not _INT_VALUE_RE.fullmatch(value):
+        return None
+    if _rule_recorders:
+        start = time.perf_counter_ns()
+    if value.startswith('-') and 'negative_reminder' in rule:
+        abs_value = value[1:]
+        reminders.append(rule['negative_reminder'].format(value=value, mapped=abs_value))
+        params = [SelectorParam(rule['to'], abs_value)]
+        if not has_sort:
+            params.append(SelectorParam('sort', 'furthest'))
+        if _rule_recorders:
+            # 已有sort参数时由远到近的顺序会丢失
+            if has_sort:
+                _rule_fired(f"{rule['name']}<0->{rule['to']}", start, param.text, lossy=True)
+            else:
+                _rule_fired(f"{rule['name']}<0->{rule['to']}+sort", start, param.text)
+        return params
+    reminders.append(rule['reminder'].format(value=value))
+    if _rule_recorders:
+        _rule_fired(f"{rule['name']}->{rule['to']}", start, param.text)
+    return [SelectorParam(rule['to'], value)]
+
 def convert_gamemode_parameters(java_selector, bedrock_selector):
     """
     转换gamemode和m参数，处理模式映射和提醒
     同时处理其他基岩版到Java版的参数转换
     """
-    import re
-    
-    # Java版游戏模式到基岩版的映射
-    java_to_bedrock_gamemode = {
-        'survival': 'survival',  # 生存模式 -> 生存模式
-        'creative': 'creative',  # 创造模式 -> 创造模式
-        'adventure': 'adventure',  # 冒险模式 -> 冒险模式
-        'spectator': 'survival'  # 旁观模式 -> 生存模式（基岩版没有旁观模式）
-    }
-    
-    # 基岩版游戏模式到Java版的映射
-    bedrock_to_java_gamemode = {
-        'survival': 'survival',  # 生存模式 -> 生存模式
-        'creative': 'creative',  # 创造模式 -> 创造模式
-        'adventure': 'adventure',  # 冒险模式 -> 冒险模式
-        'default': 'survival',  # 默认模式 -> 生存模式
-        's': 'survival',  # 缩写 -> 全称
-        'c': 'creative',  # 缩写 -> 全称
-        'a': 'adventure',  # 缩写 -> 全称
-        'd': 'survival',  # 缩写 -> 生存模式
-        '0': 'survival',  # 数字 -> 全称
-        '1': 'creative',  # 数字 -> 全称
-        '2': 'adventure',  # 数字 -> 全称
-        '5': 'survival'  # 数字 -> 生存模式
-    }
-    
-    # 处理Java版输出的gamemode参数转换（Java版到基岩版）
-    java_converted = java_selector
-    java_reminders = []
-    # 调试：打印输入
-    
-    # 从gamemode到m的转换（Java版到基岩版）
-    gamemode_pattern = r'\bgamemode=(!?)([^,\]]+)'
-    def replace_gamemode_to_bedrock(match):
-        negation = match.group(1)  # ! 或空
-        gamemode_value = match.group(2).strip()
-        
-        # 如果是旁观模式，需要提醒用户并转换为生存模式
-        if gamemode_value == 'spectator':
-            if negation:
-                java_reminders.append(f"Java版反选旁观模式(gamemode=!{gamemode_value})在基岩版中不支持，已转换为反选生存模式")
-            else:
-                java_reminders.append(f"Java版旁观模式(gamemode={gamemode_value})在基岩版中不支持，已转换为生存模式")
-            return f'm={negation}survival'
-        elif gamemode_value in java_to_bedrock_gamemode:
-            return f'm={negation}{java_to_bedrock_gamemode[gamemode_value]}'
-        else:
-            # 保持原值
-            return match.group(0)
-    
-    java_converted = re.sub(gamemode_pattern, replace_gamemode_to_bedrock, java_converted)
-    
-    # 处理基岩版输出的m参数转换（基岩版到Java版）
-    bedrock_converted = bedrock_selector
-    bedrock_reminders = []
-    
-    # 从m到gamemode的转换（基岩版到Java版）
-    m_pattern = r'\bm=(!?)([^,\]]+)'
-    def replace_m_to_java(match):
-        negation = match.group(1)  # ! 或空
-        m_value = match.group(2).strip()
-        
-        # 如果是默认模式，需要提醒用户并转换为生存模式
-        if m_value == 'default' or m_value == 'd' or m_value == '5':
-            if negation:
-                bedrock_reminders.append(f"基岩版反选默认模式(m=!{m_value})在Java版中不支持，已转换为反选生存模式")
-            else:
-                bedrock_reminders.append(f"基岩版默认模式(m={m_value})在Java版中不支持，已转换为生存模式")
-            return f'gamemode={negation}survival'
-        elif m_value in bedrock_to_java_gamemode:
-            return f'gamemode={negation}{bedrock_to_java_gamemode[m_value]}'
-        else:
-            # 保持原值
-            return match.group(0)
-    
-    bedrock_converted = re.sub(m_pattern, replace_m_to_java, bedrock_converted)
-    
-    # 处理limit参数到c参数的转换（Java版到基岩版）
-    limit_pattern = r'\blimit=([+-]?\d+)'
-    def replace_limit_to_c(match):
-        limit_value = match.group(1)
-        java_reminders.append(f"Java版limit={limit_value}参数已转换为基岩版c={limit_value}")
-        return f'c={limit_value}'
-    
-    java_converted = re.sub(limit_pattern, replace_limit_to_c, java_converted)
-    
-    # 处理c参数到limit参数的转换（基岩版到Java版）
-    c_pattern = r'\bc=([+-]?\d+)'
-    def replace_c_to_limit(match):
-        c_value = match.group(1)
-        # 处理负数c值，转换为绝对值并添加sort=furthest参数
-        if c_value.startswith('-'):
-            abs_c_val = c_value[1:]  # 移除负号
-            bedrock_reminders.append(f"基岩版c={c_value}参数已转换为Java版limit={abs_c_val},sort=furthest")
-            # 检查是否已有sort参数
-            if not re.search(r'\bsort=', bedrock_converted):
-                # 添加sort=furthest参数
-                return f'limit={abs_c_val},sort=furthest'
-            else:
-                return f'limit={abs_c_val}'
-        else:
-            bedrock_reminders.append(f"基岩版c={c_value}参数已转换为Java版limit={c_value}")
-            return f'limit={c_value}'
-    
-    bedrock_converted = re.sub(c_pattern, replace_c_to_limit, bedrock_converted)
-    
-    # 添加缺失的基岩版到Java版参数转换逻辑
-    
-    # 处理r/rm参数到distance参数的转换（基岩版到Java版）
-    def convert_r_rm_to_distance(selector):
-        """将基岩版的r和rm参数转换为Java版的distance参数"""
-        nonlocal bedrock_reminders
-        
-        # 提取r和rm参数
-        r_pattern = r'\br=([^,\]]+)'
-        rm_pattern = r'\brm=([^,\]]+)'
-        
-        r_match = re.search(r_pattern, selector)
-        rm_match = re.search(rm_pattern, selector)
-        
-        if not r_match and not rm_match:
-            return selector
-        
-        r_value = r_match.group(1) if r_match else None
-        rm_value = rm_match.group(1) if rm_match else None
-        
-        # 构建distance参数
-        distance_value = ""
-        if rm_value and r_value:
-            # 两个参数都存在：rm..r
-            distance_value = f"{rm_value}..{r_value}"
-            bedrock_reminders.append(f"基岩版rm={rm_value},r={r_value}参数已转换为Java版distance={distance_value}")
-        elif rm_value:
-            # 只有rm参数：rm..
-            distance_value = f"{rm_value}.."
-            bedrock_reminders.append(f"基岩版rm={rm_value}参数已转换为Java版distance={distance_value}")
-        elif r_value:
-            # 只有r参数：..r
-            distance_value = f"..{r_value}"
-            bedrock_reminders.append(f"基岩版r={r_value}参数已转换为Java版distance={distance_value}")
-        
-        # 移除原有的r和rm参数
-        result = re.sub(r_pattern, '', selector)
-        result = re.sub(rm_pattern, '', result)
-        
-        # 添加distance参数
-        if distance_value:
-            # 检查是否已有其他参数
-            if '[' in result and ']' in result:
-                if result.endswith('['):
-                    result = result[:-1] + f"distance={distance_value}]"
-                elif result.endswith(']'):
-                    result = result[:-1] + f",distance={distance_value}]"
-                else:
-                    result = result + f",distance={distance_value}]"
-            else:
-                result = f"[{result}distance={distance_value}]" if '[' in result else f"{result}[distance={distance_value}]"
-        
-        # 清理多余的逗号和空括号
-        result = re.sub(r',,', ',', result)
-        result = re.sub(r'\[,', '[', result)
-        result = re.sub(r',\]', ']', result)
-        result = re.sub(r'\[\]', '', result)
-        
-        return result
-    
-    # 处理rx/rxm参数到x_rotation参数的转换（基岩版到Java版）
-    def convert_rx_rxm_to_x_rotation(selector):
-        """将基岩版的rx和rxm参数转换为Java版的x_rotation参数"""
-        nonlocal bedrock_reminders
-        
-        # 提取rx和rxm参数
-        rx_pattern = r'\brx=([^,\]]+)'
-        rxm_pattern = r'\brxm=([^,\]]+)'
-        
-        rx_match = re.search(rx_pattern, selector)
-        rxm_match = re.search(rxm_pattern, selector)
-        
-        if not rx_match and not rxm_match:
-            return selector
-        
-        rx_value = rx_match.group(1) if rx_match else None
-        rxm_value = rxm_match.group(1) if rxm_match else None
-        
-        # 构建x_rotation参数
-        x_rotation_value = ""
-        if rxm_value and rx_value:
-            # 两个参数都存在：rxm..rx
-            x_rotation_value = f"{rxm_value}..{rx_value}"
-            bedrock_reminders.append(f"基岩版rxm={rxm_value},rx={rx_value}参数已转换为Java版x_rotation={x_rotation_value}")
-        elif rxm_value:
-            # 只有rxm参数：rxm..
-            x_rotation_value = f"{rxm_value}.."
-            bedrock_reminders.append(f"基岩版rxm={rxm_value}参数已转换为Java版x_rotation={x_rotation_value}")
-        elif rx_value:
-            # 只有rx参数：..rx
-            x_rotation_value = f"..{rx_value}"
-            bedrock_reminders.append(f"基岩版rx={rx_value}参数已转换为Java版x_rotation={x_rotation_value}")
-        
-        # 移除原有的rx和rxm参数
-        result = re.sub(rx_pattern, '', selector)
-        result = re.sub(rxm_pattern, '', result)
-        
-        # 添加x_rotation参数
-        if x_rotation_value:
-            # 检查是否已有其他参数
-            if '[' in result and ']' in result:
-                if result.endswith('['):
-                    result = result[:-1] + f"x_rotation={x_rotation_value}]"
-                elif result.endswith(']'):
-                    result = result[:-1] + f",x_rotation={x_rotation_value}]"
-                else:
-                    result = result + f",x_rotation={x_rotation_value}]"
-            else:
-                result = f"[{result}x_rotation={x_rotation_value}]" if '[' in result else f"{result}[x_rotation={x_rotation_value}]"
-        
-        # 清理多余的逗号和空括号
-        result = re.sub(r',,', ',', result)
-        result = re.sub(r'\[,', '[', result)
-        result = re.sub(r',\]', ']', result)
-        result = re.sub(r'\[\]', '', result)
-        
-        return result
-    
-    # 处理ry/rym参数到y_rotation参数的转换（基岩版到Java版）
-    def convert_ry_rym_to_y_rotation(selector):
-        """将基岩版的ry和rym参数转换为Java版的y_rotation参数"""
-        nonlocal bedrock_reminders
-        
-        # 提取ry和rym参数
-        ry_pattern = r'\bry=([^,\]]+)'
-        rym_pattern = r'\brym=([^,\]]+)'
-        
-        ry_match = re.search(ry_pattern, selector)
-        rym_match = re.search(rym_pattern, selector)
-        
-        if not ry_match and not rym_match:
-            return selector
-        
-        ry_value = ry_match.group(1) if ry_match else None
-        rym_value = rym_match.group(1) if rym_match else None
-        
-        # 构建y_rotation参数
-        y_rotation_value = ""
-        if rym_value and ry_value:
-            # 两个参数都存在：rym..ry
-            if rym_value == ry_value:
-                # 如果rym和rym相等，使用单个数字而非范围
-                y_rotation_value = f"{rym_value}"
-                bedrock_reminders.append(f"基岩版rym={rym_value},ry={ry_value}参数（相等值）已转换为Java版y_rotation={y_rotation_value}")
-            else:
-                y_rotation_value = f"{rym_value}..{ry_value}"
-                bedrock_reminders.append(f"基岩版rym={rym_value},ry={ry_value}参数已转换为Java版y_rotation={y_rotation_value}")
-        elif rym_value:
-            # 只有rym参数：rym..
-            y_rotation_value = f"{rym_value}.."
-            bedrock_reminders.append(f"基岩版rym={rym_value}参数已转换为Java版y_rotation={y_rotation_value}")
-        elif ry_value:
-            # 只有ry参数：..ry
-            y_rotation_value = f"..{ry_value}"
-            bedrock_reminders.append(f"基岩版ry={ry_value}参数已转换为Java版y_rotation={y_rotation_value}")
-        
-        # 移除原有的ry和rym参数
-        result = re.sub(ry_pattern, '', selector)
-        result = re.sub(rym_pattern, '', result)
-        
-        # 添加y_rotation参数
-        if y_rotation_value:
-            # 检查是否已有其他参数
-            if '[' in result and ']' in result:
-                if result.endswith('['):
-                    result = result[:-1] + f"y_rotation={y_rotation_value}]"
-                elif result.endswith(']'):
-                    result = result[:-1] + f",y_rotation={y_rotation_value}]"
-                else:
-                    result = result + f",y_rotation={y_rotation_value}]"
-            else:
-                result = f"[{result}y_rotation={y_rotation_value}]" if '[' in result else f"{result}[y_rotation={y_rotation_value}]"
-        
-        # 清理多余的逗号和空括号
-        result = re.sub(r',,', ',', result)
-        result = re.sub(r'\[,', '[', result)
-        result = re.sub(r',\]', ']', result)
-        result = re.sub(r'\[\]', '', result)
-        
-        return result
-    
-    # 处理l/lm参数到level参数的转换（基岩版到Java版）
-    def convert_l_lm_to_level(selector):
-        """将基岩版的l和lm参数转换为Java版的level参数"""
-        nonlocal bedrock_reminders
-        
-        # 提取l和lm参数
-        l_pattern = r'\bl=([^,\]]+)'
-        lm_pattern = r'\blm=([^,\]]+)'
-        
-        l_match = re.search(l_pattern, selector)
-        lm_match = re.search(lm_pattern, selector)
-        
-        if not l_match and not lm_match:
-            return selector
-        
-        l_value = l_match.group(1) if l_match else None
-        lm_value = lm_match.group(1) if lm_match else None
-        
-        # 构建level参数
-        level_value = ""
-        if lm_value and l_value:
-            # 两个参数都存在：lm..l
-            level_value = f"{lm_value}..{l_value}"
-            bedrock_reminders.append(f"基岩版lm={lm_value},l={l_value}参数已转换为Java版level={level_value}")
-        elif lm_value:
-            # 只有lm参数：lm..
-            level_value = f"{lm_value}.."
-            bedrock_reminders.append(f"基岩版lm={lm_value}参数已转换为Java版level={level_value}")
-        elif l_value:
-            # 只有l参数：..l
-            level_value = f"..{l_value}"
-            bedrock_reminders.append(f"基岩版l={l_value}参数已转换为Java版level={level_value}")
-        
-        # 移除原有的l和lm参数
-        result = re.sub(l_pattern, '', selector)
-        result = re.sub(lm_pattern, '', result)
-        
-        # 添加level参数
-        if level_value:
-            # 检查是否已有其他参数
-            if '[' in result and ']' in result:
-                if result.endswith('['):
-                    result = result[:-1] + f"level={level_value}]"
-                elif result.endswith(']'):
-                    result = result[:-1] + f",level={level_value}]"
-                else:
-                    result = result + f",level={level_value}]"
-            else:
-                result = f"[{result}level={level_value}]" if '[' in result else f"{result}[level={level_value}]"
-        
-        # 清理多余的逗号和空括号
-        result = re.sub(r',,', ',', result)
-        result = re.sub(r'\[,', '[', result)
-        result = re.sub(r',\]', ']', result)
-        result = re.sub(r'\[\]', '', result)
-        
-        return result
-    
-    # 应用所有基岩版到Java版的参数转换
-    bedrock_converted = convert_r_rm_to_distance(bedrock_converted)
-    bedrock_converted = convert_rx_rxm_to_x_rotation(bedrock_converted)
-    bedrock_converted = convert_ry_rym_to_y_rotation(bedrock_converted)
-    bedrock_converted = convert_l_lm_to_level(bedrock_converted)
-    
-    # 调试：打印输出
-    
-    return java_converted, bedrock_converted, java_reminders, bedrock_reminders
+    java_converted, java_reminders = _java_params_to_bedrock_ir(_as_selector_ir(java_selector))
+    bedrock_converted, bedrock_reminders = _bedrock_params_to_java_ir(_as_selector_ir(bedrock_selector))
+    return java_converted.emit(), bedrock_converted.emit(), java_reminders, bedrock_reminders
 
-def convert_nbt_to_hasitem(params_part):
+def _convert_value_count_params(ir, target_version):
     """
-    尝试将Java版的nbt参数转换为基岩版的hasitem参数
-    如果可以转换则转换，如果不能转换则保留原nbt参数
+    按规则表原位转换值映射和数量参数，返回(SelectorIR, 值映射提醒, 数量提醒)
+    值映射只在目标版本没有对应值时提醒
+    """
+    rules = get_param_rules(target_version)
+    value_reminders = []
+    count_reminders = []
+    params = []
+    changed = False
+    has_sort = None
+    for param in ir.params:
+        rule = rules.get(param.name)
+        if rule is not None and param.tight and param.value:
+            kind = rule['kind']
+            if kind == 'value':
+                converted = _apply_value_rule(rule, param, value_reminders)
+                changed = changed or converted is not param
+                param = converted
+            elif kind == 'count':
+                if has_sort is None:
+                    has_sort = ir.has('sort')
+                converted = _apply_count_rule(rule, param, count_reminders, has_sort)
+                if converted is not None:
+                    params.extend(converted)
+                    changed = True
+                    continue
+        params.append(param)
+    return (ir.replace(params) if changed else ir), value_reminders, count_reminders
+
+def _java_params_to_bedrock_ir(ir):
+    """Java版gamemode转换为m、limit转换为c（原位替换），返回(SelectorIR, 提醒列表)"""
+    converted, value_reminders, count_reminders = _convert_value_count_params(ir, 'bedrock')
+    return converted, value_reminders + count_reminders
+
+def _bedrock_params_to_java_ir(ir):
+    """
+    基岩版m转换为gamemode、c转换为limit（原位替换），
+    r/rm、rx/rxm、ry/rym、l/lm合并为Java版范围参数并追加到末尾，返回(SelectorIR, 提醒列表)
+    """
+    converted, value_reminders, count_reminders = _convert_value_count_params(ir, 'java')
+    reminders = value_reminders + count_reminders
+    for rule in get_range_rules():
+        converted = _merge_bedrock_range(converted, rule, reminders)
+    return converted, reminders
+
+def _merge_bedrock_range(ir, rule, reminders):
+    """将一对基岩版上下限参数（如r/rm）合并为Java版范围参数（如distance）并追加到末尾"""
+    java_name, min_name, max_name = rule['name'], rule['min'], rule['max']
+    if _rule_recorders:
+        start = time.perf_counter_ns()
+    max_value = ir.get(max_name)
+    min_value = ir.get(min_name)
+    if max_value is None and min_value is None:
+        return ir
+
+    if min_value and max_value:
+        if rule['collapse_equal'] and min_value == max_value:
+            # 上下限相等时使用单个数字而非范围
+            range_value = min_value
+            reminders.append(f"基岩版{min_name}={min_value},{max_name}={max_value}参数（相等值）已转换为Java版{java_name}={range_value}")
+        else:
+            range_value = f"{min_value}..{max_value}"
+            reminders.append(f"基岩版{min_name}={min_value},{max_name}={max_value}参数已转换为Java版{java_name}={range_value}")
+    elif min_value:
+        # 只有下限：min..
+        range_value = f"{min_value}.."
+        reminders.append(f"基岩版{min_name}={min_value}参数已转换为Java版{java_name}={range_value}")
+    else:
+        # 只有上限：..max
+        range_value = f"..{max_value}"
+        reminders.append(f"基岩版{max_name}={max_value}参数已转换为Java版{java_name}={range_value}")
+
+    if _rule_recorders:
+        _rule_fired(f'{min_name}/{max_name}->{java_name}', start, f'{java_name}={range_value}')
+    return ir.without(max_name, min_name).appended(SelectorParam(java_name, range_value))
+
+def convert_nbt_to_hasitem(params_part):
+    """
+    尝试将Java版的nbt参数转换为基岩版的hasitem参数
+    如果可以转换则转换，如果不能转换则保留原nbt参数
     """
-    import re
-    
     # 收集所有转换提醒
     all_reminders = []
-    
-    def replace_nbt(match):
-        full_match = match.group(0)  # 完整匹配，如 nbt={...}
-        nbt_content = match.group(1)  # 大括号内的内容
-        
+
+    def replace_nbt(root):
+        full_match = params_part[root.start - 4:root.end]  # 完整的nbt参数，如 nbt={...}
+        nbt_content = params_part[root.start:root.end]
+
         # 先检查是否包含物品相关信息（SelectedItem、Item、Inventory）
         if not any(keyword in nbt_content for keyword in ['SelectedItem', 'Item', 'Inventory']):
-            # 如果不包含物品信息，直接返回原匹配内容
+            # 如果不包含物品信息，直接返回原参数
             return full_match
-        
-        # 尝试解析nbt内容，看是否可以转换为hasitem
-        hasitem_result, conversion_reminders = try_convert_nbt_content_to_hasitem(nbt_content)
+
+        # 尝试将nbt内容转换为hasitem
+        hasitem_result, conversion_reminders = _snbt_to_hasitem(root)
         # 收集转换提醒
         all_reminders.extend(conversion_reminders)
-        
+
         if hasitem_result:
             # 如果可以转换，返回hasitem参数
             all_reminders.append("nbt参数已转换为hasitem格式，可能无法完全保留原意")
             return f'hasitem={hasitem_result}'
-        else:
-            # 如果不能转换，返回原始nbt参数（保持完整格式）
-            return full_match
-    
-    # 使用非递归正则表达式匹配nbt参数，处理嵌套的大括号结构
-    try:
-        nbt_pattern = r'nbt=(\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\})'
-        result = re.sub(nbt_pattern, replace_nbt, params_part, flags=re.DOTALL)
-    except re.error:
-        # 如果正则表达式失败，尝试更简单的模式
-        try:
-            # 简化的NBT匹配模式，只处理一层嵌套
-            simple_nbt_pattern = r'nbt=(\{[^{}]*\})'
-            result = re.sub(simple_nbt_pattern, replace_nbt, params_part)
-        except re.error:
-            # 如果仍然失败，返回原始参数，不进行转换
-            result = params_part
-            all_reminders.append("NBT参数解析失败，保留原始格式")
-    
-    return result, all_reminders
+        # 如果不能转换，返回原始nbt参数（保持完整格式）
+        return full_match
+
+    # 不能解析的nbt参数保持不变
+    return _sub_nbt_params(params_part, replace_nbt), all_reminders
 
 def try_convert_nbt_content_to_hasitem(nbt_content):
     """
     尝试将nbt内容转换为hasitem内容
     返回转换后的hasitem内容和提醒信息列表，如果不能转换则返回(None, [])
     """
-    import re
-    
+    root = _parse_nbt_compound(nbt_content)
+    if root is None:
+        return None, []
+    return _snbt_to_hasitem(root)
+
+# 物品复合标签中Count、Slot等数值开头的整数部分
+_SNBT_LEADING_INT_RE = re.compile(r'\d+')
+
+def _snbt_leading_int(node):
+    """返回数值节点开头的整数文本（如 3b 中的3），不是数值时返回None"""
+    if node is None or node.kind not in ('number', 'range', 'word'):
+        return None
+    match = _SNBT_LEADING_INT_RE.match(node.raw)
+    return match.group(0) if match else None
+
+def _snbt_item_fields(item):
+    """从物品复合标签中取出(物品ID, Count, Slot)，物品ID去掉minecraft:前缀，没有的项为None"""
+    id_node = item.get('id', 'string')
+    item_id = id_node.value if id_node is not None and id_node.value else None
+    # 移除minecraft:前缀（如果存在）
+    if item_id and item_id.startswith('minecraft:'):
+        item_id = item_id[10:]
+    return item_id, _snbt_leading_int(item.get('Count')), _snbt_leading_int(item.get('Slot'))
+
+def _snbt_to_hasitem(root):
+    """try_convert_nbt_content_to_hasitem的语法树版本，root为nbt参数值的根复合标签"""
     # 初始化提醒列表
     reminders = []
-    
+
     # 检查nbt内容是否包含物品信息
     # 例如: {SelectedItem:{id:"minecraft:diamond_sword"}} 或 {Inventory:[{id:"minecraft:diamond",Count:3b}]}
-    
+    # 各种模式都按源文本顺序查找第一个匹配的键，物品可以位于任意嵌套层级
+
     # 模式1: SelectedItem:{...id:"xxx"..., ...,Slot:0b} - 用于指定槽位
-    selected_item_pattern = r'SelectedItem\s*:\s*\{([^}]*(?:\{[^}]*\}[^}]*)*)\}'
-    match = re.search(selected_item_pattern, nbt_content)
-    if match:
-        item_data = match.group(1)
-        # 提取id
-        id_match = re.search(r'id\s*:\s*["\']([^"\']+)["\']', item_data)
-        if id_match:
-            item_id = id_match.group(1)
-            # 移除minecraft:前缀（如果存在）
-            if item_id.startswith('minecraft:'):
-                item_id = item_id[10:]  # 移除 'minecraft:' 前缀
-            # 提取Count（数量）
-            count_match = re.search(r'Count\s*["\']?\s*:\s*(\d+)[bBfFdD]?', item_data)
-            # 提取Slot信息
-            slot_match = re.search(r'Slot\s*["\']?\s*:\s*(\d+)', item_data)
-            if slot_match:
-                slot_value = slot_match.group(1)
-                slot_str = ""
-                if slot_value == "0":  # 主手
-                    slot_str = ",location=slot.weapon.mainhand"
-                elif slot_value == "1":  # 副手
-                    slot_str = ",location=slot.weapon.offhand"
-                else:
-                    # 对于其他槽位，可以根据需要扩展
-                    slot_str = ",location=slot.inventory,slot=" + slot_value + ".." + slot_value
-                
-                if count_match:
-                    count_value = count_match.group(1)
-                    reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
-                    return "{item=" + item_id + ",quantity=" + count_value + ".." + slot_str + "}", reminders
-                else:
-                    reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
-                    return "{item=" + item_id + slot_str + "}", reminders
-            else:
+    item = root.find('SelectedItem', 'compound')
+    if item is not None:
+        item_id, count_value, slot_value = _snbt_item_fields(item)
+        if item_id:
+            if slot_value is None:
                 # 如果没有显式槽位信息，SelectedItem默认是主手物品
                 slot_str = ",location=slot.weapon.mainhand"
-                if count_match:
-                    count_value = count_match.group(1)
-                    reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
-                    return "{item=" + item_id + ",quantity=" + count_value + ".." + slot_str + "}", reminders
-                else:
-                    reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
-                    return "{item=" + item_id + slot_str + "}", reminders
-    
+            elif slot_value == "0":  # 主手
+                slot_str = ",location=slot.weapon.mainhand"
+            elif slot_value == "1":  # 副手
+                slot_str = ",location=slot.weapon.offhand"
+            else:
+                # 对于其他槽位，可以根据需要扩展
+                slot_str = ",location=slot.inventory,slot=" + slot_value + ".." + slot_value
+            reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
+            if count_value is not None:
+                return "{item=" + item_id + ",quantity=" + count_value + ".." + slot_str + "}", reminders
+            return "{item=" + item_id + slot_str + "}", reminders
+
     # 模式2: Inventory:[{...id:"xxx"..., ...,Slot:0b, ...}, ...] - 指定具体槽位的物品
-    inventory_pattern = r'Inventory\s*:\s*\[([^\]]*)\]'
-    match = re.search(inventory_pattern, nbt_content)
-    if match:
-        inventory_content = match.group(1)
+    inventory = root.find('Inventory', 'list')
+    if inventory is not None:
         # 解析所有物品
         items = []
-        # 使用正则表达式匹配所有物品对象
-        item_objects = re.findall(r'\{([^{}]*(?:\{[^{}]*\}[^{}]*)*)\}', inventory_content)
-        
-        for item_obj in item_objects:
-            # 提取id
-            id_match = re.search(r'id\s*:\s*["\']([^"\']+)["\']', item_obj)
-            if not id_match:
+        for item in inventory.value:
+            if item.kind != 'compound':
+                continue
+            item_id, count_value, slot_value = _snbt_item_fields(item)
+            if not item_id:
                 continue  # 跳过没有id的物品
-                
-            item_id = id_match.group(1)
-            # 移除minecraft:前缀（如果存在）
-            if item_id.startswith('minecraft:'):
-                item_id = item_id[10:]  # 移除 'minecraft:' 前缀
-                
-            # 提取Count（数量）
-            count_match = re.search(r'Count\s*["\']?\s*:\s*(\d+)[bBfFdD]?', item_obj)
-            # 提取Slot信息
-            slot_match = re.search(r'Slot\s*["\']?\s*:\s*(\d+)', item_obj)
-            
+
             # 构建hasitem参数
             item_str = f'item={item_id}'
-            if count_match:
-                count_value = count_match.group(1)
+            if count_value is not None:
                 item_str += f',quantity={count_value}..'
-            
-            if slot_match:
-                slot_value = slot_match.group(1)
+
+            if slot_value is not None:
                 if slot_value == "0":  # 主手
                     item_str += ',location=slot.weapon.mainhand'
                 elif slot_value == "1":  # 副手
@@ -984,84 +1293,58 @@ def try_convert_nbt_content_to_hasitem(nbt_content):
                 else:
                     # 对于其他槽位
                     item_str += f',location=slot.inventory,slot={slot_value}..{slot_value}'
-            
+
             items.append(item_str)
-        
+
         if items:
+            reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
             # 如果有多个物品，构建hasitem数组格式
             if len(items) == 1:
-                reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
                 return f'{{{items[0]}}}', reminders
-            else:
-                # 多个物品使用数组格式
-                items_str = ','.join([f'{{{item}}}' for item in items])
-                reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
-                return f'[{items_str}]', reminders
-    
+            items_str = ','.join([f'{{{item}}}' for item in items])
+            return f'[{items_str}]', reminders
+
     # 模式3: Item:{...id:"xxx"..., ...} (对于物品实体)
-    item_pattern = r'Item\s*:\s*\{([^}]*(?:\{[^}]*\}[^}]*)*)\}'
-    match = re.search(item_pattern, nbt_content)
-    if match:
-        item_data = match.group(1)
-        # 提取id
-        id_match = re.search(r'id\s*:\s*["\']([^"\']+)["\']', item_data)
-        if id_match:
-            item_id = id_match.group(1)
-            # 移除minecraft:前缀（如果存在）
-            if item_id.startswith('minecraft:'):
-                item_id = item_id[10:]  # 移除 'minecraft:' 前缀
-            # 提取Count（数量）
-            count_match = re.search(r'Count\s*["\']?\s*:\s*(\d+)[bBfFdD]?', item_data)
-            if count_match:
-                count_value = count_match.group(1)
-                reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
+    item = root.find('Item', 'compound')
+    if item is not None:
+        item_id, count_value, _ = _snbt_item_fields(item)
+        if item_id:
+            reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
+            if count_value is not None:
                 return '{item=' + item_id + ',quantity=' + count_value + '..}', reminders
-            else:
-                reminders.append("nbt参数转换为hasitem参数，可能无法完全保留原意")
-                return '{item=' + item_id + '}', reminders
-    
+            return '{item=' + item_id + '}', reminders
+
     # 尝试其他可能的NBT模式
     # 模式4: 直接的物品ID匹配，如 {id:"minecraft:diamond"}
-    direct_id_pattern = r'id\s*:\s*["\']([^"\']+)["\']'
-    match = re.search(direct_id_pattern, nbt_content)
-    if match:
-        item_id = match.group(1)
-        # 移除minecraft:前缀（如果存在）
-        if item_id.startswith('minecraft:'):
-            item_id = item_id[10:]  # 移除 'minecraft:' 前缀
-        reminders.append("nbt参数转换为hasitem参数，仅保留物品ID信息")
-        return f'hasitem={{item={item_id}}}', reminders
-    
+    for key, node in root.walk():
+        if key == 'id' and node.kind == 'string' and node.value:
+            item_id = node.value
+            # 移除minecraft:前缀（如果存在）
+            if item_id.startswith('minecraft:'):
+                item_id = item_id[10:]
+            reminders.append("nbt参数转换为hasitem参数，仅保留物品ID信息")
+            return f'hasitem={{item={item_id}}}', reminders
+
     # 模式5: Tags匹配，如 {Tags:["a","b"]}
-    tags_pattern = r'Tags\s*:\s*\[([^\]]*)\]'
-    match = re.search(tags_pattern, nbt_content)
-    if match:
-        tags_content = match.group(1)
-        # 提取所有标签
-        tag_pattern = r'["\']([^"\']+)["\']'
-        tags = re.findall(tag_pattern, tags_content)
-        
-        if tags:
-            # 将每个标签转换为单独的tag参数
-            tag_params = []
-            for tag in tags:
-                tag_params.append(f'tag={tag}')
-            
+    tags = root.find('Tags', 'list')
+    if tags is not None:
+        # 提取所有带引号的标签
+        tag_names = [node.value for node in tags.value if node.kind == 'string' and node.value]
+        if tag_names:
             # 返回第一个标签作为tag参数，因为hasitem不支持多个标签
             reminders.append("nbt参数转换为tag参数，仅保留第一个标签")
-            return tag_params[0], reminders
-    
+            return f'tag={tag_names[0]}', reminders
+
     # 模式6: 实体类型匹配，如 {Type:"minecraft:zombie"}
-    entity_type_pattern = r'Type\s*:\s*["\']([^"\']+)["\']'
-    match = re.search(entity_type_pattern, nbt_content)
-    if match:
-        entity_type = match.group(1)
-        # 移除minecraft:前缀（如果存在）
-        if entity_type.startswith('minecraft:'):
-            entity_type = entity_type[10:]  # 移除 'minecraft:' 前缀
-        reminders.append("nbt参数转换为type参数，仅保留实体类型信息")
-        return f'type={entity_type}', reminders
-    
+    for key, node in root.walk():
+        if key == 'Type' and node.kind == 'string' and node.value:
+            entity_type = node.value
+            # 移除minecraft:前缀（如果存在）
+            if entity_type.startswith('minecraft:'):
+                entity_type = entity_type[10:]
+            reminders.append("nbt参数转换为type参数，仅保留实体类型信息")
+            return f'type={entity_type}', reminders
+
     # 如果没有找到可转换的模式，返回None和空提醒列表
     return None, reminders
 
@@ -1069,8 +1352,6 @@ def convert_limit_c_between_versions(java_selector, bedrock_selector):
     """
     在Java版和基岩版之间转换limit和c参数
     """
-    import re
-    
     # Java版: limit -> 基岩版: c
     java_converted = java_selector
     bedrock_converted = bedrock_selector
@@ -1078,7 +1359,6 @@ def convert_limit_c_between_versions(java_selector, bedrock_selector):
     bedrock_to_java_reminders = []
     
     # Java版的limit转换为基岩版的c (在处理基岩版命令时需要提醒)
-    limit_pattern = r'limit=(!?)([^,\]]+)'
     def replace_limit_to_c(match):
         negation = match.group(1)  # ! 或空
         limit_value = match.group(2).strip()
@@ -1087,10 +1367,9 @@ def convert_limit_c_between_versions(java_selector, bedrock_selector):
         java_to_bedrock_reminders.append("limit只是限制数量，c当由近到远")
         return f'c={negation}{limit_value}'
     
-    bedrock_converted = re.sub(limit_pattern, replace_limit_to_c, bedrock_converted)
+    bedrock_converted = _LIMIT_PARAM_RE.sub(replace_limit_to_c, bedrock_converted)
     
     # 基岩版的c转换为Java版的limit (在处理Java版命令时需要提醒)
-    c_pattern = r'c=(!?)([^,\]]+)'
     def replace_c_to_limit(match):
         negation = match.group(1)  # ! 或空
         c_value = match.group(2).strip()
@@ -1104,622 +1383,320 @@ def convert_limit_c_between_versions(java_selector, bedrock_selector):
             bedrock_to_java_reminders.append(f"基岩版c={c_value}参数已转换为Java版limit={abs_c_val},sort=furthest")
             return f'limit={negation}{abs_c_val},sort=furthest'
     
-    java_converted = re.sub(c_pattern, replace_c_to_limit, java_converted)
+    java_converted = _C_PARAM_RE.sub(replace_c_to_limit, java_converted)
     
     return java_converted, bedrock_converted, java_to_bedrock_reminders, bedrock_to_java_reminders
 
+def _split_java_range(rule, range_value):
+    """
+    按范围规则将Java版范围值拆分为基岩版的上下限参数
+    返回(参数列表, 提醒)，无效格式（如 ..）返回(None, None)
+    """
+    min_name, max_name = rule['min'], rule['max']
+    if '..' in range_value:
+        parts = range_value.split('..')
+        if parts[0] and parts[1]:
+            # 有上下限：5..10 -> min=5,max=10
+            params = [SelectorParam(min_name, parts[0]), SelectorParam(max_name, parts[1])]
+        elif parts[0]:
+            # 只有下限：5.. -> min=5
+            params = [SelectorParam(min_name, parts[0])]
+        elif parts[1]:
+            # 只有上限：..10 -> max=10
+            params = [SelectorParam(max_name, parts[1])]
+        else:
+            # 无效格式
+            return None, None
+    else:
+        # 单个值：10 -> min=10,max=10（精确匹配）
+        params = [SelectorParam(min_name, range_value), SelectorParam(max_name, range_value)]
+    converted = ','.join([param.text for param in params])
+    return params, rule['reminder'].format(name=rule['name'], value=range_value, converted=converted)
+
+def _split_java_range_params(ir, rule, conversion_reminders):
+    """将IR中所有的Java版范围参数原位拆分为基岩版参数"""
+    java_name = rule['name']
+    params = []
+    changed = False
+    for param in ir.params:
+        if param.matches(java_name):
+            if _rule_recorders:
+                start = time.perf_counter_ns()
+            split_params, reminder = _split_java_range(rule, param.value)
+            if split_params:
+                conversion_reminders.append(reminder)
+                params.extend(split_params)
+                changed = True
+                if _rule_recorders:
+                    _rule_fired(f"{java_name}->{rule['min']}/{rule['max']}", start, param.text)
+                continue
+        params.append(param)
+    return ir.replace(params) if changed else ir
+
+def _convert_params_part(java_params_part, java_names, conversion_reminders):
+    """在不带方括号的参数字符串上拆分Java版范围参数"""
+    ir = parse_selector('[' + java_params_part + ']')
+    for java_name in java_names:
+        ir = _split_java_range_params(ir, get_range_rule(java_name), conversion_reminders)
+    return ','.join([param.text for param in ir.params])
+
 def convert_distance_parameters(java_params_part, conversion_reminders):
     """
     将Java版的distance参数转换为基岩版的r/rm参数
     """
-    import re
-    
-    # 处理distance参数
-    distance_pattern = r'distance=([^,\]]+)'
-    
-    def replace_distance(match):
-        full_match = match.group(0)  # 完整匹配，如 distance=5..10
-        distance_value = match.group(1)  # 提取值部分，如 5..10
-        
-        # 检查是否为范围格式
-        if '..' in distance_value:
-            parts = distance_value.split('..')
-            if parts[0] and parts[1]:
-                # 有上下限：5..10 -> rm=5,r=10
-                rm_val = parts[0]
-                r_val = parts[1]
-                conversion_reminders.append(f"Java版distance={distance_value}参数已转换为基岩版rm={rm_val},r={r_val}")
-                return f'rm={rm_val},r={r_val}'
-            elif parts[0]:
-                # 只有下限：5.. -> rm=5
-                rm_val = parts[0]
-                conversion_reminders.append(f"Java版distance={distance_value}参数已转换为基岩版rm={rm_val}")
-                return f'rm={rm_val}'
-            elif parts[1]:
-                # 只有上限：..10 -> r=10
-                r_val = parts[1]
-                conversion_reminders.append(f"Java版distance={distance_value}参数已转换为基岩版r={r_val}")
-                return f'r={r_val}'
-            else:
-                # 无效格式
-                return full_match
-        else:
-            # 单个值：10 -> rm=10,r=10（精确匹配）
-            conversion_reminders.append(f"Java版distance={distance_value}参数已转换为基岩版rm={distance_value},r={distance_value}")
-            return f'rm={distance_value},r={distance_value}'
-    
-    result = re.sub(distance_pattern, replace_distance, java_params_part)
-    
-    # 清理多余的逗号和空括号
-    result = re.sub(r',,', ',', result)
-    result = re.sub(r',\]', ']', result)
-    
-    return result
+    return _convert_params_part(java_params_part, ('distance',), conversion_reminders)
 
 
 def convert_rotation_parameters(java_params_part, conversion_reminders):
     """
     将Java版的x_rotation/y_rotation参数转换为基岩版的rx/rxm和ry/rym参数
     """
-    import re
-    
-    # 处理x_rotation参数
-    x_rotation_pattern = r'x_rotation=([^,\]]+)'
-    
-    def replace_x_rotation(match):
-        full_match = match.group(0)
-        rotation_value = match.group(1)
-        
-        # 检查是否为范围格式
-        if '..' in rotation_value:
-            parts = rotation_value.split('..')
-            if parts[0] and parts[1]:
-                # 有上下限：-45..45 -> rxm=-45,rx=45
-                rxm_val = parts[0]
-                rx_val = parts[1]
-                conversion_reminders.append(f"Java版x_rotation={rotation_value}参数已转换为基岩版rxm={rxm_val},rx={rx_val}")
-                return f'rxm={rxm_val},rx={rx_val}'
-            elif parts[0]:
-                # 只有下限：-45.. -> rxm=-45
-                rxm_val = parts[0]
-                conversion_reminders.append(f"Java版x_rotation={rotation_value}参数已转换为基岩版rxm={rxm_val}")
-                return f'rxm={rxm_val}'
-            elif parts[1]:
-                # 只有上限：..45 -> rx=45
-                rx_val = parts[1]
-                conversion_reminders.append(f"Java版x_rotation={rotation_value}参数已转换为基岩版rx={rx_val}")
-                return f'rx={rx_val}'
-            else:
-                # 无效格式
-                return full_match
-        else:
-            # 单个值：45 -> rxm=45,rx=45（精确匹配）
-            conversion_reminders.append(f"Java版x_rotation={rotation_value}参数已转换为基岩版rxm={rotation_value},rx={rotation_value}")
-            return f'rxm={rotation_value},rx={rotation_value}'
-
-    # 先处理x_rotation参数
-    result = re.sub(x_rotation_pattern, replace_x_rotation, java_params_part)
-    
-    # 处理y_rotation参数
-    y_rotation_pattern = r'y_rotation=([^,\]]+)'
-    
-    def replace_y_rotation(match):
-        full_match = match.group(0)
-        rotation_value = match.group(1)
-        
-        # 检查是否为范围格式
-        if '..' in rotation_value:
-            parts = rotation_value.split('..')
-            if parts[0] and parts[1]:
-                # 有上下限：-45..45 -> rym=-45,ry=45
-                rym_val = parts[0]
-                ry_val = parts[1]
-                conversion_reminders.append(f"Java版y_rotation={rotation_value}参数已转换为基岩版rym={rym_val},ry={ry_val}")
-                return f'rym={rym_val},ry={ry_val}'
-            elif parts[0]:
-                # 只有下限：-45.. -> rym=-45
-                rym_val = parts[0]
-                conversion_reminders.append(f"Java版y_rotation={rotation_value}参数已转换为基岩版rym={rym_val}")
-                return f'rym={rym_val}'
-            elif parts[1]:
-                # 只有上限：..45 -> ry=45
-                ry_val = parts[1]
-                conversion_reminders.append(f"Java版y_rotation={rotation_value}参数已转换为基岩版ry={ry_val}")
-                return f'ry={ry_val}'
-            else:
-                # 无效格式
-                return full_match
-        else:
-            # 单个值：90 -> rym=90,ry=90（精确匹配）
-            conversion_reminders.append(f"Java版y_rotation={rotation_value}参数已转换为基岩版rym={rotation_value},ry={rotation_value}")
-            return f'rym={rotation_value},ry={rotation_value}'
-    
-    # 再处理y_rotation参数
-    result = re.sub(y_rotation_pattern, replace_y_rotation, result)
-    
-    # 清理多余的逗号和空括号
-    result = re.sub(r',,', ',', result)
-    result = re.sub(r',\]', ']', result)
-    
-    return result
+    return _convert_params_part(java_params_part, ('x_rotation', 'y_rotation'), conversion_reminders)
 
 
 def convert_level_parameters(java_params_part, conversion_reminders):
     """
     将Java版的level参数转换为基岩版的l/lm参数
     """
-    import re
-    
-    # 处理level参数
-    level_pattern = r'level=([^,\]]+)'
-    
-    def replace_level(match):
-        full_match = match.group(0)  # 完整匹配，如 level=5..10
-        level_value = match.group(1)  # 提取值部分，如 5..10
-        
-        # 检查是否为范围格式
-        if '..' in level_value:
-            parts = level_value.split('..')
-            if parts[0] and parts[1]:
-                # 有上下限：5..10 -> lm=5,l=10
-                lm_val = parts[0]
-                l_val = parts[1]
-                conversion_reminders.append(f"Java版level={level_value}参数已转换为基岩版lm={lm_val},l={l_val}")
-                return f'lm={lm_val},l={l_val}'
-            elif parts[0]:
-                # 只有下限：5.. -> lm=5
-                lm_val = parts[0]
-                conversion_reminders.append(f"Java版level={level_value}参数已转换为基岩版lm={lm_val}")
-                return f'lm={lm_val}'
-            elif parts[1]:
-                # 只有上限：..10 -> l=10
-                l_val = parts[1]
-                conversion_reminders.append(f"Java版level={level_value}参数已转换为基岩版l={l_val}")
-                return f'l={l_val}'
-            else:
-                # 无效格式
-                return full_match
-        else:
-            # 单个值：10 -> lm=10,l=10
-            conversion_reminders.append(f"Java版level={level_value}参数已转换为基岩版lm={level_value},l={level_value}")
-            return f'lm={level_value},l={level_value}'
-    
-    result = re.sub(level_pattern, replace_level, java_params_part)
-    
-    # 清理多余的逗号和空括号
-    result = re.sub(r',,', ',', result)
-    result = re.sub(r',\]', ']', result)
-    
-    return result
+    return _convert_params_part(java_params_part, ('level',), conversion_reminders)
+
 
+# 基岩版scores参数中的level分数
+_SCORES_LEVEL_RE = re.compile(r'level=([^,\}]+)')
 
 def filter_selector_parameters(selector, target_version):
     """
     根据目标版本过滤选择器参数，对于可转换的参数进行转换，
     只有完全不支持的参数才被剔除
     """
-    import re
-    
-    # Java版特有参数（完全不支持，无法转换）
-    java_specific_params = [
-        'predicate', 'advancements', 'team'
-    ]
-    
-    # 基岩版特有参数（完全不支持，无法转换）
-    bedrock_specific_params = [
-        'haspermission', 'has_property', 'family'
-    ]
-    
+    filtered, conversion_reminders = _filter_selector_parameters_ir(_as_selector_ir(selector), target_version)
+    return filtered.emit(), conversion_reminders
+
+def _filter_selector_parameters_ir(ir, target_version):
+    """filter_selector_parameters的IR版本，返回(SelectorIR, 提醒列表)"""
     # 初始化提醒列表
     conversion_reminders = []
-    
-    # 如果没有参数部分，直接返回
-    if '[' not in selector or ']' not in selector:
-        return selector, conversion_reminders
-    
-    # 提取参数部分
-    selector_var = selector.split('[')[0]
-    params_part = selector[selector.find('[')+1:selector.rfind(']')]
-    
-    # 初始化nbt_conversion_reminders变量
     nbt_conversion_reminders = []
-    
-    # 处理hasitem到nbt的转换（基岩版到Java版）
+
+    # 如果没有参数部分，直接返回
+    if not ir.bracketed:
+        return ir, conversion_reminders
+
+    rules = get_param_rules(target_version)
     if target_version == 'java':
-        params_part, hasitem_to_nbt_reminders = convert_hasitem_to_nbt_with_reminders(params_part)
-        # 添加hasitem转换提醒
+        # 处理hasitem到nbt的转换（基岩版到Java版）
+        ir, hasitem_to_nbt_reminders = _convert_hasitem_params(ir)
         conversion_reminders.extend(hasitem_to_nbt_reminders)
-        
-        # 处理m参数到gamemode的转换（基岩版到Java版）
-        bedrock_to_java_gamemode = {
-            'survival': 'survival',
-            'creative': 'creative',
-            'adventure': 'adventure',
-            'default': 'survival',  # 默认模式 -> 生存模式
-            's': 'survival',  # 缩写 -> 全称
-            'c': 'creative',  # 缩写 -> 全称
-            'a': 'adventure',  # 缩写 -> 全称
-            'd': 'survival',  # 缩写 -> 生存模式
-            '0': 'survival',  # 数字 -> 全称
-            '1': 'creative',  # 数字 -> 全称
-            '2': 'adventure',  # 数字 -> 全称
-            '5': 'survival'  # 数字 -> 生存模式
-        }
-        
-        m_pattern = r'\bm=(!?)([^,\]]+)'
-        def replace_m_to_java(match):
-            negation = match.group(1)  # ! 或空
-            m_value = match.group(2).strip()
-            
-            # 如果是默认模式，需要提醒用户并转换为生存模式
-            if m_value == 'default' or m_value == 'd' or m_value == '5':
-                if negation:
-                    conversion_reminders.append(f"基岩版反选默认模式(m=!{m_value})在Java版中不支持，已转换为反选生存模式")
-                else:
-                    conversion_reminders.append(f"基岩版默认模式(m={m_value})在Java版中不支持，已转换为生存模式")
-                return f'gamemode={negation}survival'
-            elif m_value in bedrock_to_java_gamemode:
-                conversion_reminders.append(f"基岩版m={m_value}参数已转换为Java版gamemode={bedrock_to_java_gamemode[m_value]}")
-                return f'gamemode={negation}{bedrock_to_java_gamemode[m_value]}'
-            else:
-                # 保持原值
-                return match.group(0)
-        
-        params_part = re.sub(m_pattern, replace_m_to_java, params_part)
-        
-        # 特殊处理scores参数中的!=反选：在Java版输出中移除整个scores参数
-        scores_pattern = r'scores=\{([^}]*)\}'
-        
-        def process_scores_negation(match):
-            full_match = match.group(0)
-            scores_content = match.group(1)
-            
-            # 检查是否有反选模式
-            if '![' in scores_content or '!' in scores_content:
-                # Java版不支持scores反选，直接移除整个scores参数
-                conversion_reminders.append(f"基岩版scores反选参数{full_match}在Java版中不支持，已移除")
-                return ''  # 返回空字符串，表示移除整个参数
-            return full_match
-        
-        params_part = re.sub(scores_pattern, process_scores_negation, params_part)
-        
-    # 处理nbt到hasitem的转换（Java版到基岩版）
+
+        params = []
+        scores_reminders = []
+        for param in ir.params:
+            if param.tight and param.value:
+                rule = rules.get(param.name)
+                # 处理m参数到gamemode的转换（基岩版到Java版）
+                if rule is not None and rule['kind'] == 'value':
+                    param = _apply_value_rule(rule, param, conversion_reminders, report_all=True)
+                # 特殊处理scores参数中的!=反选：Java版不支持，移除整个scores参数
+                elif param.name == 'scores' and _is_flat_compound(param.value) and '!' in param.value:
+                    scores_reminders.append(f"基岩版scores反选参数{param.text}在Java版中不支持，已移除")
+                    if _rule_recorders:
+                        _rule_fired('scores!->removed', None, param.text, lossy=True)
+                    continue
+            params.append(param)
+        conversion_reminders.extend(scores_reminders)
+        ir = ir.replace(params)
+
     elif target_version == 'bedrock':
-        params_part, nbt_conversion_reminders_from_nbt = convert_nbt_to_hasitem(params_part)
-        nbt_conversion_reminders = nbt_conversion_reminders_from_nbt
-        
-        # 处理scores参数中的level参数
-        scores_pattern = r'scores=\{([^}]*)\}'
-        
-        def process_scores_level(match):
-            full_match = match.group(0)
-            scores_content = match.group(1)
-            
-            # 处理level参数
-            level_pattern = r'level=([^,\}]+)'
-            def replace_level_in_scores(match):
-                level_value = match.group(1)
-                conversion_reminders.append(f"Java版level={level_value}参数已转换为基岩版lm={level_value},l={level_value}")
-                return f'lm={level_value},l={level_value}'
-            
-            new_scores_content = re.sub(level_pattern, replace_level_in_scores, scores_content)
-            
-            # 如果scores内容发生了变化，返回新的scores参数
-            if new_scores_content != scores_content:
-                return f'scores={{{new_scores_content}}}'
-            return full_match
-        
-        params_part = re.sub(scores_pattern, process_scores_level, params_part)
-    else:
-        nbt_conversion_reminders = []
-    
-    # 根据目标版本进行参数转换
-    if target_version == 'bedrock':
-        # Java版到基岩版的参数转换
-        params_part = convert_distance_parameters(params_part, conversion_reminders)
-        params_part = convert_rotation_parameters(params_part, conversion_reminders)
-        params_part = convert_level_parameters(params_part, conversion_reminders)
-        
+        # 处理nbt到hasitem的转换（Java版到基岩版）
+        params = []
+        for param in ir.params:
+            if param.tight and param.value:
+                if param.name == 'nbt':
+                    param = _nbt_param_to_hasitem(param, nbt_conversion_reminders)
+                # 处理scores参数中的level参数
+                elif param.name == 'scores' and _is_flat_compound(param.value):
+                    param = _scores_level_to_bedrock(param, conversion_reminders)
+            params.append(param)
+        ir = ir.replace(params)
+
+        # Java版到基岩版的范围参数转换
+        for rule in get_range_rules():
+            ir = _split_java_range_params(ir, rule, conversion_reminders)
+
         # 处理gamemode到m的转换（Java版到基岩版）
-        java_to_bedrock_gamemode = {
-            'survival': 'survival',
-            'creative': 'creative',
-            'adventure': 'adventure',
-            'spectator': 'survival'  # 基岩版没有旁观模式，转换为生存模式
-        }
-        
-        gamemode_pattern = r'gamemode=(!?)([^,\]]+)'
-        def replace_gamemode_to_bedrock(match):
-            negation = match.group(1)  # ! 或空
-            gamemode_value = match.group(2).strip()
-            
-            if gamemode_value == 'spectator':
-                if negation:
-                    conversion_reminders.append(f"Java版反选旁观模式(gamemode=!{gamemode_value})在基岩版中不支持，已转换为反选生存模式")
-                else:
-                    conversion_reminders.append(f"Java版旁观模式(gamemode={gamemode_value})在基岩版中不支持，已转换为生存模式")
-                return f'm={negation}survival'
-            elif gamemode_value in java_to_bedrock_gamemode:
-                conversion_reminders.append(f"Java版gamemode={gamemode_value}参数已转换为基岩版m={java_to_bedrock_gamemode[gamemode_value]}")
-                return f'm={negation}{java_to_bedrock_gamemode[gamemode_value]}'
-            else:
-                # 保持原值
-                return match.group(0)
-        
-        params_part = re.sub(gamemode_pattern, replace_gamemode_to_bedrock, params_part)
-        
+        params = []
+        for param in ir.params:
+            rule = rules.get(param.name)
+            if rule is not None and rule['kind'] == 'value' and param.tight and param.value:
+                param = _apply_value_rule(rule, param, conversion_reminders, report_all=True)
+            params.append(param)
+        ir = ir.replace(params)
+
         # 处理sort参数和limit参数的联合转换（Java版到基岩版）
-        sort_pattern = r',?sort=([^,\]]+)'
-        limit_pattern = r'limit=([+-]?\d+)'
-        
-        # 先查找sort和limit参数
-        sort_match = re.search(sort_pattern, params_part)
-        limit_match = re.search(limit_pattern, params_part)
-        sort_value = sort_match.group(1) if sort_match else None
-        limit_value = limit_match.group(1) if limit_match else None
-        
-        if sort_value:
-            if sort_value == 'nearest':
-                # 当limit=数字,sort=nearest时，基岩版转换为c=数字
-                # 当只有sort=nearest，没有limit时，基岩版转换为c=9999
-                c_value = limit_value if limit_value else '9999'
-                params_part = re.sub(sort_pattern, '', params_part)
-                if limit_value:
-                    params_part = re.sub(limit_pattern, '', params_part)
-                # 添加c参数
-                if re.search(r'c=[+-]?\d+', params_part):
-                    params_part = re.sub(r'c=[+-]?\d+', f'c={c_value}', params_part)
-                else:
-                    if params_part.endswith('['):
-                        params_part = params_part[:-1] + f'c={c_value}]'
-                    elif params_part.endswith(']'):
-                        params_part = params_part[:-1] + f',c={c_value}]'
-                    else:
-                        params_part = params_part + f'c={c_value}'
-                conversion_reminders.append(f"Java版sort=nearest已转换为基岩版c={c_value}")
-            elif sort_value == 'furthest':
-                # 当limit=数字,sort=furthest时，基岩版转换为c=-数字
-                # 当只有sort=furthest，没有limit时，基岩版转换为c=-9999
-                c_value = f"-{limit_value}" if limit_value else '-9999'
-                params_part = re.sub(sort_pattern, '', params_part)
-                if limit_value:
-                    params_part = re.sub(limit_pattern, '', params_part)
-                # 添加c参数
-                if re.search(r'c=[+-]?\d+', params_part):
-                    params_part = re.sub(r'c=[+-]?\d+', f'c={c_value}', params_part)
-                else:
-                    if params_part.endswith('['):
-                        params_part = params_part[:-1] + f'c={c_value}]'
-                    elif params_part.endswith(']'):
-                        params_part = params_part[:-1] + f',c={c_value}]'
-                    else:
-                        params_part = params_part + f'c={c_value}'
-                conversion_reminders.append(f"Java版sort=furthest已转换为基岩版c={c_value}")
-            elif sort_value == 'arbitrary':
-                params_part = re.sub(sort_pattern, '', params_part)
-                conversion_reminders.append("Java版sort=arbitrary在基岩版中不支持，已移除")
-            elif sort_value == 'random':
-                # 当@a[limit=数字,sort=random]或@r[limit=数字,sort=random]时，转换为@r[c=数字]
-                # 当只有@a[sort=random]或@r[sort=random]时，转换为基岩版的@r[c=9999]
-                c_value = limit_value if limit_value else '9999'
-                if selector_var in ['@a', '@r']:
-                    params_part = re.sub(sort_pattern, '', params_part)
-                    if limit_value:
-                        params_part = re.sub(limit_pattern, '', params_part)
-                    # 添加c参数
-                    if re.search(r'c=[+-]?\d+', params_part):
-                        params_part = re.sub(r'c=[+-]?\d+', f'c={c_value}', params_part)
-                    else:
-                        if params_part.endswith('['):
-                            params_part = params_part[:-1] + f'c={c_value}]'
-                        elif params_part.endswith(']'):
-                            params_part = params_part[:-1] + f',c={c_value}]'
-                        else:
-                            params_part = params_part + f'c={c_value}'
-                    conversion_reminders.append(f"Java版{selector_var}[sort=random]已转换为基岩版@r[c={c_value}]")
-                else:
-                    params_part = re.sub(sort_pattern, '', params_part)
-                    if limit_value:
-                        params_part = re.sub(limit_pattern, '', params_part)
-                    # 添加c参数
-                    if re.search(r'c=[+-]?\d+', params_part):
-                        params_part = re.sub(r'c=[+-]?\d+', f'c={c_value}', params_part)
-                    else:
-                        if params_part.endswith('['):
-                            params_part = params_part[:-1] + f'c={c_value}]'
-                        elif params_part.endswith(']'):
-                            params_part = params_part[:-1] + f',c={c_value}]'
-                        else:
-                            params_part = params_part + f'c={c_value}'
-                    conversion_reminders.append(f"Java版sort=random已转换为基岩版c={c_value}")
-            else:
-                params_part = re.sub(sort_pattern, '', params_part)
-                conversion_reminders.append(f"Java版sort={sort_value}在基岩版中不支持，已移除")
-        else:
-            # 没有sort参数，只转换limit
-            if limit_value:
-                conversion_reminders.append(f"Java版limit={limit_value}参数已转换为基岩版c={limit_value}")
-                conversion_reminders.append("limit只是限制数量，c当由近到远")
-                params_part = re.sub(limit_pattern, f'c={limit_value}', params_part)
-    
-    # 分割参数，但要处理包含大括号的参数
-    # 使用更智能的方法来分割参数，避免在{}内部分割
-    params = []
-    current_param = ""
-    brace_count = 0
-    in_param_value = False
-    
-    for char in params_part:
-        if char == '{':
-            brace_count += 1
-            in_param_value = True
-        elif char == '}':
-            brace_count -= 1
-            if brace_count == 0:
-                in_param_value = False
-        
-        if char == ',' and brace_count == 0:
-            # 在最外层遇到逗号，分割参数
-            if current_param.strip():
-                params.append(current_param.strip())
-            current_param = ""
-        else:
-            current_param += char
-    
-    # 添加最后一个参数
-    if current_param.strip():
-        params.append(current_param.strip())
-    
-    # 调试：打印分割后的参数
-    
+        ir = _convert_sort_limit_params(ir, conversion_reminders)
+
     # 过滤参数并收集提醒信息
     filtered_params = []
-    removed_params = []
-    
-    for param in params:
-        if '=' in param:
-            param_name = param.split('=')[0].strip()
-            # 特殊处理haspermission参数，它包含大括号
-            if param_name == 'haspermission' and target_version == 'java':
-                removed_params.append(param_name)
-                nbt_conversion_reminders.append(f"警告：基岩版{param_name}参数在Java版中没有对应的功能，已移除")
-                continue  # 跳过此参数，不添加到filtered_params中
-            
-            # 特殊处理nbt参数
-            if param_name == 'nbt':
-                if target_version == 'bedrock':
-                    # Java版的nbt参数在基岩版中不支持
-                    removed_params.append('nbt')
-                    nbt_conversion_reminders.append("警告：Java版nbt参数在基岩版中不支持，已尝试转换为hasitem参数，如果转换失败则已移除")
-                else:
-                    # 保留Java版的nbt参数
-                    filtered_params.append(param)
-            # 根据目标版本过滤参数
-            elif target_version == 'java' and param_name in bedrock_specific_params:
-                removed_params.append(param_name)
-                if param_name == 'family':
-                    nbt_conversion_reminders.append(f"警告：基岩版{param_name}参数在Java版中没有直接对应的功能，已移除。建议使用type参数指定实体类型作为替代")
-                elif param_name == 'haspermission':
-                    nbt_conversion_reminders.append(f"警告：基岩版{param_name}参数在Java版中没有对应的功能，已移除")
-                elif param_name == 'has_property':
-                    nbt_conversion_reminders.append(f"警告：基岩版{param_name}参数在Java版中没有对应的功能，已移除")
-                else:
-                    nbt_conversion_reminders.append(f"警告：基岩版{param_name}参数在Java版中不支持，已移除")
-                # 不将此参数添加到filtered_params中，即跳过此参数
-                continue  # 跳过此参数，不添加到filtered_params中
-            elif target_version == 'bedrock' and param_name in java_specific_params:
-                removed_params.append(param_name)
-                if param_name == 'team':
-                    nbt_conversion_reminders.append(f"警告：Java版{param_name}参数在基岩版中不支持，已移除。基岩版中没有队伍系统的直接对应功能")
-                elif param_name == 'predicate':
-                    nbt_conversion_reminders.append(f"警告：Java版{param_name}参数在基岩版中不支持，已移除。基岩版中没有谓词系统")
-                elif param_name == 'advancements':
-                    nbt_conversion_reminders.append(f"警告：Java版{param_name}参数在基岩版中不支持，已移除。基岩版中没有进度系统")
-                else:
-                    nbt_conversion_reminders.append(f"警告：Java版{param_name}参数在基岩版中不支持，已移除")
-                # 不将此参数添加到filtered_params中，即跳过此参数
+    for param in ir.params:
+        param_name = param.name
+        if param_name is None:
+            # 没有等号的参数（可能是一些特殊参数）
+            filtered_params.append(param)
+        elif param_name == 'nbt':
+            if target_version == 'bedrock':
+                # Java版的nbt参数在基岩版中不支持
+                nbt_conversion_reminders.append("警告：Java版nbt参数在基岩版中不支持，已尝试转换为hasitem参数，如果转换失败则已移除")
+                if _rule_recorders:
+                    _rule_fired('nbt->removed', None, param.text, lossy=True)
             else:
+                # 保留Java版的nbt参数
                 filtered_params.append(param)
         else:
-            # 没有等号的参数（可能是一些特殊参数）
-            filtered_params.append(param)
-    
-    # 重构选择器
-    if filtered_params:
-        new_params_part = '[' + ','.join(filtered_params) + ']'
-        new_selector = selector_var + new_params_part
-    else:
-        # 如果过滤后没有参数，只返回选择器变量
-        new_selector = selector_var
-    
-    # 调试：打印过滤后的选择器
-    
+            rule = rules.get(param_name)
+            if rule is not None and rule['kind'] == 'remove':
+                # 目标版本中没有对应功能的参数直接剔除
+                nbt_conversion_reminders.append(rule['reminder'])
+                if _rule_recorders:
+                    _rule_fired(f'{param_name}->removed', None, param.text, lossy=True)
+            else:
+                filtered_params.append(param)
+
     # 将nbt_conversion_reminders合并到conversion_reminders中
     conversion_reminders.extend(nbt_conversion_reminders)
-    
-    # 清理多余的逗号和空括号
-    new_selector = re.sub(r',,', ',', new_selector)
-    new_selector = re.sub(r',\]', ']', new_selector)
-    new_selector = re.sub(r'\[,', '[', new_selector)
-    
-    return new_selector, conversion_reminders
+    return ir.replace(filtered_params), conversion_reminders
 
-def process_range_values(params_part):
-    """
-    处理参数中的范围数值，提取第一个数字用于不支持范围的参数
-    """
-    import re
-    
-    # Java版的nbt参数不支持范围选择，需要提取第一个数字
-    # 例如：nbt={Inventory:[{id:"minecraft:diamond",Count:3..}]}
-    # 需要转换为：nbt={Inventory:[{id:"minecraft:diamond",Count:3b}]}
-    
-    def replace_range_in_nbt(match):
-        nbt_content = match.group(1)
-        # 处理nbt中的范围数值，改进正则表达式以处理嵌套结构
-        # 查找类似 Count:3.. 或 Count:5..6 的模式
-        
-        # 使用栈来处理嵌套的大括号，确保不会错误处理嵌套结构中的范围
-        def process_nbt_content(content):
-            # 处理Count范围
-            def replace_count_range(count_match):
-                count_value = count_match.group(1)
-                # 如果是范围，提取第一个数字
-                if '..' in count_value:
-                    range_parts = count_value.split('..')
-                    try:
-                        first_num = int(range_parts[0]) if range_parts[0] else 0
-                        return f'Count:{first_num}b'
-                    except ValueError:
-                        return count_match.group(0)
-                return count_match.group(0)
-            
-            # 处理其他可能的数值范围字段
-            def replace_general_range(field_match):
-                field_name = field_match.group(1)
-                field_value = field_match.group(2)
-                # 如果是范围，提取第一个数字
-                if '..' in field_value:
-                    range_parts = field_value.split('..')
-                    try:
-                        first_num = int(range_parts[0]) if range_parts[0] else 0
-                        # 根据字段名决定后缀
-                        suffix = 'b' if field_name in ['Count', 'Damage'] else ''
-                        return f'{field_name}:{first_num}{suffix}'
-                    except ValueError:
-                        return field_match.group(0)
-                return field_match.group(0)
-            
-            # 处理Count范围
-            content = re.sub(r'Count:(\d*\.\.\d*)b', replace_count_range, content)
-            content = re.sub(r'Count:(\d*\.\.\d*)', replace_count_range, content)
-            
-            # 处理其他数值范围
-            content = re.sub(r'(\w+):(\d*\.\.\d*)', replace_general_range, content)
-            
-            return content
-        
-        # 处理nbt内容
-        processed_content = process_nbt_content(nbt_content)
-        
-        return f'nbt={processed_content}'
-    
-    # 使用非递归正则表达式处理nbt参数中的范围数值
-    # 支持有限层级的嵌套结构，避免使用Python不支持的(?R)语法
-    nbt_pattern = r'nbt=(\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\})'
-    try:
-        params_part = re.sub(nbt_pattern, replace_range_in_nbt, params_part, flags=re.DOTALL)
-    except re.error:
-        # 如果正则表达式失败，尝试更简单的模式
-        try:
-            # 简化的NBT匹配模式，只处理一层嵌套
-            simple_nbt_pattern = r'nbt=(\{[^{}]*\})'
-            params_part = re.sub(simple_nbt_pattern, replace_range_in_nbt, params_part)
-        except re.error:
-            # 如果仍然失败，跳过NBT范围处理，保持原参数不变
-            pass
-    
-    return params_part
+def _is_flat_compound(value):
+    """值是否为不含嵌套的大括号结构，如 {a=1,b=2}"""
+    return value[0] == '{' and value.find('}') == len(value) - 1
+
+def _nbt_param_to_hasitem(param, reminders):
+    """尝试将nbt参数转换为hasitem参数，不能转换时返回原参数"""
+    nbt_content = param.value
+    # 先检查是否包含物品相关信息（SelectedItem、Item、Inventory）
+    if not any(keyword in nbt_content for keyword in ['SelectedItem', 'Item', 'Inventory']):
+        return param
+
+    if _rule_recorders:
+        start = time.perf_counter_ns()
+    root = _parse_nbt_compound(nbt_content)
+    if root is None:
+        return param
+    hasitem_result, conversion_reminders = _snbt_to_hasitem(root)
+    reminders.extend(conversion_reminders)
+    if not hasitem_result:
+        return param
+    reminders.append("nbt参数已转换为hasitem格式，可能无法完全保留原意")
+    if _rule_recorders:
+        _rule_fired('nbt->hasitem', start, param.text, lossy=True)
+    return make_selector_param(f'hasitem={hasitem_result}')
+
+def _scores_level_to_bedrock(param, reminders):
+    """将scores参数中的Java版level分数转换为基岩版lm/l"""
+    def replace_level_in_scores(match):
+        level_value = match.group(1)
+        reminders.append(f"Java版level={level_value}参数已转换为基岩版lm={level_value},l={level_value}")
+        return f'lm={level_value},l={level_value}'
+
+    if _rule_recorders:
+        start = time.perf_counter_ns()
+    scores_content = param.value[1:-1]
+    new_scores_content = _SCORES_LEVEL_RE.sub(replace_level_in_scores, scores_content)
+    if new_scores_content == scores_content:
+        return param
+    if _rule_recorders:
+        _rule_fired('scores.level->lm/l', start, param.text)
+    return SelectorParam('scores', f'{{{new_scores_content}}}')
+
+def _convert_sort_limit_params(ir, conversion_reminders):
+    """筛选阶段处理仍然保留的sort和limit参数（Java版到基岩版）"""
+    if _rule_recorders:
+        start = time.perf_counter_ns()
+    sort_value = ir.get('sort')
+    limit_value = ir.get('limit', _INT_VALUE_RE)
+
+    if not sort_value:
+        # 没有sort参数，只转换limit
+        if limit_value:
+            conversion_reminders.append(f"Java版limit={limit_value}参数已转换为基岩版c={limit_value}")
+            conversion_reminders.append("limit只是限制数量，c当由近到远")
+            ir = ir.replace([SelectorParam('c', param.value)
+                             if param.matches('limit') and _INT_VALUE_RE.fullmatch(param.value) else param
+                             for param in ir.params])
+            if _rule_recorders:
+                _rule_fired('limit->c', start, f'limit={limit_value}')
+        return ir
+
+    if sort_value == 'nearest':
+        # 当limit=数字,sort=nearest时，基岩版转换为c=数字；只有sort=nearest时转换为c=9999
+        c_value = limit_value if limit_value else '9999'
+        conversion_reminders.append(f"Java版sort=nearest已转换为基岩版c={c_value}")
+    elif sort_value == 'furthest':
+        # 当limit=数字,sort=furthest时，基岩版转换为c=-数字；只有sort=furthest时转换为c=-9999
+        c_value = f"-{limit_value}" if limit_value else '-9999'
+        conversion_reminders.append(f"Java版sort=furthest已转换为基岩版c={c_value}")
+    elif sort_value == 'random':
+        c_value = limit_value if limit_value else '9999'
+        if ir.variable in ['@a', '@r']:
+            conversion_reminders.append(f"Java版{ir.variable}[sort=random]已转换为基岩版@r[c={c_value}]")
+        else:
+            conversion_reminders.append(f"Java版sort=random已转换为基岩版c={c_value}")
+    else:
+        if sort_value == 'arbitrary':
+            conversion_reminders.append("Java版sort=arbitrary在基岩版中不支持，已移除")
+        else:
+            conversion_reminders.append(f"Java版sort={sort_value}在基岩版中不支持，已移除")
+        if _rule_recorders:
+            _rule_fired(f'sort={sort_value}->removed', start, f'sort={sort_value}', lossy=True)
+        return ir.without('sort')
+
+    # 移除sort参数和limit参数，已有c参数时替换其值，否则在末尾添加c参数
+    ir = ir.without('sort').without('limit', pattern=_INT_VALUE_RE)
+    if ir.get('c', _INT_VALUE_RE) is not None:
+        ir = ir.replace([SelectorParam('c', c_value)
+                         if param.matches('c') and _INT_VALUE_RE.fullmatch(param.value) else param
+                         for param in ir.params])
+    else:
+        ir = ir.appended(SelectorParam('c', c_value))
+    if _rule_recorders:
+        _rule_fired(f'sort={sort_value}->c', start, f'sort={sort_value}')
+    return ir
+
+def process_range_values(params_part):
+    """
+    处理参数中的范围数值，提取第一个数字用于不支持范围的参数
+    """
+    # Java版的nbt参数不支持范围选择，需要提取第一个数字
+    # 例如：nbt={Inventory:[{id:"minecraft:diamond",Count:3..}]}
+    # 需要转换为：nbt={Inventory:[{id:"minecraft:diamond",Count:3b}]}
+    # 不能解析的nbt参数保持不变
+    return _sub_nbt_params(params_part, lambda root: 'nbt=' + _normalize_snbt_ranges(params_part, root))
+
+# nbt中的整数范围值，如 3..、..5、3..5b
+_SNBT_RANGE_VALUE_RE = re.compile(r'(\d*)\.\.\d*([bB]?)')
+# 范围值转换为单个数值时需要加上b后缀的字段
+SNBT_BYTE_RANGE_FIELDS = frozenset(['Count', 'Damage'])
+
+def _normalize_snbt_ranges(text, root):
+    """
+    将语法树中复合标签字段的整数范围值替换为范围的下限（没有下限时为0），
+    返回text中root对应部分替换后的文本
+    """
+    pieces = []
+    pos = root.start
+    for key, node in root.walk():
+        if key is None or node.kind != 'range':
+            continue
+        match = _SNBT_RANGE_VALUE_RE.fullmatch(node.raw)
+        if not match:
+            continue
+        first_num = int(match.group(1)) if match.group(1) else 0
+        # 根据字段名决定后缀
+        suffix = 'b' if key in SNBT_BYTE_RANGE_FIELDS else match.group(2)
+        pieces.append(text[pos:node.start])
+        pieces.append(f'{first_num}{suffix}')
+        pos = node.end
+    pieces.append(text[pos:root.end])
+    return ''.join(pieces)
 
 def parse_hasitem_simple(hasitem_content):
     """
@@ -1727,15 +1704,13 @@ def parse_hasitem_simple(hasitem_content):
     例如：hasitem={item=diamond,quantity=3..} -> nbt={Inventory:[{id:"minecraft:diamond"}]}
     注意：Java版NBT不需要Count值，有了反而会让检测失效
     """
-    import re
-    
     # 初始化提醒列表
     reminders = []
     
     # 解析hasitem参数
     params = {}
     # 分割参数，但要小心处理值中的逗号（例如在[]或{}中）
-    parts = re.split(r',(?![^{}]*\})', hasitem_content)
+    parts = _split_hasitem_fields(hasitem_content)
     
     for part in parts:
         if '=' in part:
@@ -1845,8 +1820,6 @@ def parse_hasitem_complex(hasitem_content):
     -> nbt={Inventory:[{id:"minecraft:diamond"},{id:"minecraft:stick"}]}
     注意：Java版NBT不需要Count值，有了反而会让检测失效
     """
-    import re
-    
     # 解析数组中的每个对象
     # 简单处理：分割每个对象
     objects = []
@@ -1874,7 +1847,7 @@ def parse_hasitem_complex(hasitem_content):
     for obj in objects:
         params = {}
         # 分割参数
-        parts = re.split(r',(?![^{}]*\})', obj)
+        parts = _split_hasitem_fields(obj)
         for part in parts:
             if '=' in part:
                 key, value = part.split('=', 1)
@@ -1968,7 +1941,6 @@ def parse_hasitem_complex(hasitem_content):
 
 def convert_colors_to_bedrock(text):
     """将Java版颜色代码转换为基岩版"""
-    import re
     result = text
     
     # 将Java版颜色名称转换为基岩版颜色代码
@@ -2001,14 +1973,130 @@ def convert_text_to_java(text, m_n_handling="color", m_n_callback=None):
         m_n_handling: §m§n的处理模式 ("color", "font", "mixed", "none")
         m_n_callback: 在混合模式下，遇到§m§n时调用的回调函数
     """
-    import re
-    
     # 使用正则表达式解析颜色代码和文本
     # 匹配§+字符的模式，然后处理后续的文本
     result = parse_minecraft_formatting(text, m_n_handling, m_n_callback)
     
     return result
 
+# §代码字符对应的样式操作：('color', 颜色名)设置颜色，('format', 格式名)开启格式，('reset', None)重置所有格式
+# 表中没有的字符（如空格、大写字母）不产生任何效果
+FORMATTING_CODE_ACTIONS = {
+    '0': ('color', 'black'),
+    '1': ('color', 'dark_blue'),
+    '2': ('color', 'dark_green'),
+    '3': ('color', 'dark_aqua'),
+    '4': ('color', 'dark_red'),
+    '5': ('color', 'dark_purple'),
+    '6': ('color', 'gold'),
+    '7': ('color', 'gray'),
+    '8': ('color', 'dark_gray'),
+    '9': ('color', 'blue'),
+    'a': ('color', 'green'),
+    'b': ('color', 'aqua'),
+    'c': ('color', 'red'),
+    'd': ('color', 'light_purple'),
+    'e': ('color', 'yellow'),
+    'f': ('color', 'white'),
+    # 基岩版颜色代码
+    'g': ('color', 'gold'),  # minecoin_gold
+    'h': ('color', 'white'),  # material_quartz
+    'i': ('color', 'gray'),  # material_iron
+    'j': ('color', 'dark_gray'),  # material_netherite
+    'p': ('color', 'gold'),  # material_gold
+    'q': ('color', 'green'),  # material_emerald
+    's': ('color', 'aqua'),  # material_diamond
+    't': ('color', 'dark_blue'),  # material_lapis
+    'u': ('color', 'light_purple'),  # material_amethyst
+    'v': ('color', 'gold'),  # material_resin
+    # 格式代码
+    'k': ('format', 'obfuscated'),  # 随机字符（混淆）
+    'l': ('format', 'bold'),  # 粗体
+    'o': ('format', 'italic'),  # 斜体
+    'r': ('reset', None),  # 重置所有格式
+}
+
+# §m§n作为颜色代码时的样式操作（基岩版material_redstone、material_copper）
+M_N_COLOR_ACTIONS = {
+    'm': ('color', 'dark_red'),
+    'n': ('color', 'red'),
+}
+
+# §m§n作为格式代码时的样式操作
+M_N_FONT_ACTIONS = {
+    'm': ('format', 'strikethrough'),  # 删除线
+    'n': ('format', 'underlined'),  # 下划线
+}
+
+# 格式代码或一段不含§的文本；结尾单独的§按普通文本处理
+_FORMATTING_TOKEN_RE = re.compile(r'§(.)|([^§]+|§)', re.DOTALL)
+
+def _style_key(current_format):
+    """生成样式的比较键，两段文本的颜色和格式完全相同时键相等"""
+    return (current_format.get('color'), 'obfuscated' in current_format, 'bold' in current_format,
+            'strikethrough' in current_format, 'underlined' in current_format, 'italic' in current_format)
+
+def _formatting_parts(text, m_n_handling, m_n_callback):
+    """
+    按Java版逻辑解析颜色和格式代码，依次产出合并后的(样式, 文本)部分，相同颜色和格式的相邻文本合并为一部分
+    样式为(字段, 值)元组，字段按第一次设置的顺序排列，值为颜色名或True
+    """
+    # §m§n：color模式作为颜色代码，font和none模式作为格式代码，mixed模式逐个询问（没有回调函数时作为格式代码）
+    if m_n_handling == "color":
+        m_n_actions = M_N_COLOR_ACTIONS
+    elif m_n_handling == "mixed" and m_n_callback:
+        m_n_actions = None
+    else:
+        m_n_actions = M_N_FONT_ACTIONS
+
+    current_format = {}
+    # 样式键在遇到文本时才计算，连续的格式代码只计算一次
+    current_key = None
+    # 正在合并的部分的样式、样式键和文本片段，片段在部分结束时一次性拼接
+    last_style = None
+    last_key = None
+    pieces = []
+
+    # 按Java版逻辑处理：相同颜色相同字体形式的文本放在一起处理
+    # findall不创建Match对象；格式代码总是一个字符，code为空字符串表示这是一段文本
+    for code, text_content in _FORMATTING_TOKEN_RE.findall(text):
+        if code:
+            if code == 'm' or code == 'n':
+                if m_n_actions is None:
+                    # 混合模式：调用回调函数让用户选择
+                    action = M_N_COLOR_ACTIONS[code] if m_n_callback('§' + code) == "color" else M_N_FONT_ACTIONS[code]
+                else:
+                    action = m_n_actions[code]
+            else:
+                action = FORMATTING_CODE_ACTIONS.get(code)
+                if action is None:
+                    continue
+            kind, value = action
+            if kind == 'color':
+                current_format['color'] = value
+            elif kind == 'format':
+                current_format[value] = True
+            else:
+                current_format = {}
+            current_key = None
+            continue
+
+        if current_key is None:
+            current_key = _style_key(current_format)
+        if last_style is not None and current_key == last_key:
+            # 格式相同，合并文本
+            pieces.append(text_content)
+            continue
+
+        if last_style is not None:
+            yield last_style, ''.join(pieces)
+        last_style = tuple(current_format.items())
+        last_key = current_key
+        pieces = [text_content]
+
+    if last_style is not None:
+        yield last_style, ''.join(pieces)
+
 def parse_minecraft_formatting(text, m_n_handling="color", m_n_callback=None):
     """解析Minecraft颜色和格式代码，按Java版逻辑合并相同格式的文本
     
@@ -2017,1179 +2105,2504 @@ def parse_minecraft_formatting(text, m_n_handling="color", m_n_callback=None):
         m_n_handling: §m§n的处理模式 ("color", "font", "mixed", "none")
         m_n_callback: 在混合模式下，遇到§m§n时调用的回调函数，返回"color"或"font"
     """
-    import re
-    
-    # 使用正则表达式找到所有格式代码和文本部分
-    tokens = []
-    i = 0
-    while i < len(text):
-        if text[i] == '§' and i + 1 < len(text):
-            code = text[i:i+2]
-            tokens.append(('format_code', code))
-            i += 2
-        else:
-            # 收集非§开头的文本
-            start = i
-            while i < len(text) and text[i] != '§':
-                i += 1
-            if i > start:
-                tokens.append(('text', text[start:i]))
-    
-    # 构建结果
+    # 构建结果：第一部分作为主文本，其余部分放在extra中
     result = {"text": ""}
-    current_format = {}
     extra_parts = []
-    
-    # 按Java版逻辑处理：相同颜色相同字体形式的文本放在一起处理
-    # 特别处理空格：空格放在前面一坨处理，如果开头就是空格，与后面那一坨放在一起处理
-    for token_type, token_value in tokens:
-        if token_type == 'format_code':
-            code = token_value
-            # 特殊处理§m和§n：根据m_n_handling参数决定是作为颜色代码还是格式代码
-            if code in ['§m', '§n']:
-                if m_n_handling == "color":
-                    # 作为颜色代码处理
-                    if code == '§m':
-                        current_format['color'] = 'dark_red'  # material_redstone
-                    elif code == '§n':
-                        current_format['color'] = 'red'  # material_copper -> red
-                elif m_n_handling == "mixed":
-                    # 混合模式：调用回调函数让用户选择
-                    if m_n_callback:
-                        choice = m_n_callback(code)
-                        if choice == "color":
-                            if code == '§m':
-                                current_format['color'] = 'dark_red'
-                            elif code == '§n':
-                                current_format['color'] = 'red'
-                        else:  # font
-                            if code == '§m':
-                                current_format['strikethrough'] = True
-                            elif code == '§n':
-                                current_format['underlined'] = True
-                    else:
-                        # 如果没有回调函数，默认使用格式代码
-                        if code == '§m':
-                            current_format['strikethrough'] = True  # 删除线
-                        elif code == '§n':
-                            current_format['underlined'] = True  # 下划线
-                else:
-                    # 作为格式代码处理（font模式或none模式）
-                    if code == '§m':
-                        current_format['strikethrough'] = True  # 删除线
-                    elif code == '§n':
-                        current_format['underlined'] = True  # 下划线
-            # 颜色代码
-            elif code[1] in '0123456789abcdefg hijpqs tuv':
-                # 颜色代码
-                if code == '§0': 
-                    current_format['color'] = 'black'
-                elif code == '§1': 
-                    current_format['color'] = 'dark_blue'
-                elif code == '§2': 
-                    current_format['color'] = 'dark_green'
-                elif code == '§3': 
-                    current_format['color'] = 'dark_aqua'
-                elif code == '§4': 
-                    current_format['color'] = 'dark_red'
-                elif code == '§5': 
-                    current_format['color'] = 'dark_purple'
-                elif code == '§6': 
-                    current_format['color'] = 'gold'
-                elif code == '§7': 
-                    current_format['color'] = 'gray'
-                elif code == '§8': 
-                    current_format['color'] = 'dark_gray'
-                elif code == '§9': 
-                    current_format['color'] = 'blue'
-                elif code == '§a': 
-                    current_format['color'] = 'green'
-                elif code == '§b': 
-                    current_format['color'] = 'aqua'
-                elif code == '§c': 
-                    current_format['color'] = 'red'
-                elif code == '§d': 
-                    current_format['color'] = 'light_purple'
-                elif code == '§e': 
-                    current_format['color'] = 'yellow'
-                elif code == '§f': 
-                    current_format['color'] = 'white'
-                # 基岩版颜色代码
-                elif code == '§g':
-                    current_format['color'] = 'gold'  # minecoin_gold
-                elif code == '§h':
-                    current_format['color'] = 'white'  # material_quartz
-                elif code == '§i':
-                    current_format['color'] = 'gray'  # material_iron
-                elif code == '§j':
-                    current_format['color'] = 'dark_gray'  # material_netherite
-                elif code == '§p':
-                    current_format['color'] = 'gold'  # material_gold
-                elif code == '§q':
-                    current_format['color'] = 'green'  # material_emerald
-                elif code == '§s':
-                    current_format['color'] = 'aqua'  # material_diamond
-                elif code == '§t':
-                    current_format['color'] = 'dark_blue'  # material_lapis
-                elif code == '§u':
-                    current_format['color'] = 'light_purple'  # material_amethyst
-                elif code == '§v':
-                    current_format['color'] = 'gold'  # material_resin
-                # 颜色代码
-                if code == '§0': 
-                    current_format['color'] = 'black'
-                elif code == '§1': 
-                    current_format['color'] = 'dark_blue'
-                elif code == '§2': 
-                    current_format['color'] = 'dark_green'
-                elif code == '§3': 
-                    current_format['color'] = 'dark_aqua'
-                elif code == '§4': 
-                    current_format['color'] = 'dark_red'
-                elif code == '§5': 
-                    current_format['color'] = 'dark_purple'
-                # 格式代码
-            elif code[1] in 'klmnor':
-                if code == '§k':
-                    current_format['obfuscated'] = True  # 随机字符（混淆）
-                elif code == '§l':
-                    current_format['bold'] = True  # 粗体
-                elif code == '§m' and m_n_handling != "color":
-                    current_format['strikethrough'] = True  # 删除线
-                elif code == '§n' and m_n_handling != "color":
-                    current_format['underlined'] = True  # 下划线
-                elif code == '§o':
-                    current_format['italic'] = True  # 斜体
-                elif code == '§r':
-                    # 重置所有格式
-                    current_format = {}
-        else:  # token_type == 'text'
-            text_content = token_value
-            
-            # 按Java版逻辑：将相同颜色和格式的文本组合在一起
-            # 检查是否可以与前一部分合并
-            if extra_parts:
-                # 检查最后一个部分的格式是否与当前格式相同
-                last_part = extra_parts[-1]
-                
-                # 检查格式是否完全相同（包括所有格式属性）
-                formats_match = True
-                all_format_keys = set(current_format.keys()) | set({k: v for k, v in last_part.items() if k != 'text'}.keys())
-                
-                for key in all_format_keys:
-                    if key == 'text':
-                        continue
-                    if current_format.get(key) != last_part.get(key):
-                        formats_match = False
-                        break
-                        
-                if formats_match:
-                    # 格式相同，合并文本
-                    extra_parts[-1]["text"] += text_content
-                else:
-                    # 格式不同，添加新部分
-                    new_part = {"text": text_content}
-                    new_part.update(current_format)
-                    extra_parts.append(new_part)
-            else:
-                # 检查是否可以与主文本合并
-                if result.get("text"):
-                    # 检查主文本格式是否与当前格式相同
-                    formats_match = True
-                    all_format_keys = set(current_format.keys()) | set({k: v for k, v in result.items() if k != 'text'}.keys())
-                    
-                    for key in all_format_keys:
-                        if key == 'text':
-                            continue
-                        if current_format.get(key) != result.get(key):
-                            formats_match = False
-                            break
-                            
-                    if formats_match:
-                        # 格式相同，合并到主文本
-                        result["text"] += text_content
-                    else:
-                        # 格式不同，添加到extra部分
-                        new_part = {"text": text_content}
-                        new_part.update(current_format)
-                        extra_parts.append(new_part)
-                else:
-                    # 第一部分，设置为主文本
-                    result["text"] = text_content
-                    result.update(current_format)
-    
+    parts = _formatting_parts(text, m_n_handling, m_n_callback)
+    for style, part_text in parts:
+        result.update(style)
+        result["text"] = part_text
+        break
+    for style, part_text in parts:
+        part = {"text": part_text}
+        part.update(style)
+        extra_parts.append(part)
+
     # 添加extra部分（如果有的话）
     if extra_parts:
         result["extra"] = extra_parts
     
     return result
 
+# JSON字符串中需要转义的字符及转义结果，与json.dumps(ensure_ascii=False)相同
+_JSON_ESCAPES = {chr(code): f'\\u{code:04x}' for code in range(0x20)}
+_JSON_ESCAPES.update({'"': '\\"', '\\': '\\\\', '\b': '\\b', '\f': '\\f', '\n': '\\n', '\r': '\\r', '\t': '\\t'})
+_JSON_ESCAPE_TABLE = str.maketrans(_JSON_ESCAPES)
+_JSON_ESCAPE_RE = re.compile('[\x00-\x1f"\\\\]')
+
+def _json_string(value):
+    """把字符串写成JSON字符串（含引号），大多数文本不需要转义，直接加引号"""
+    if _JSON_ESCAPE_RE.search(value) is None:
+        return f'"{value}"'
+    return f'"{value.translate(_JSON_ESCAPE_TABLE)}"'
+
+# Java版JSON文本中一段样式的序列化结果，键为(样式, 是否紧凑)
+_style_json_cache = {}
+
+def _style_json(style, compact):
+    """把样式元组序列化为接在"text"字段后面的JSON片段（以分隔符开头）"""
+    key = (style, compact)
+    fragment = _style_json_cache.get(key)
+    if fragment is None:
+        item_separator, key_separator = (',', ':') if compact else (', ', ': ')
+        fragment = ''.join(f'{item_separator}"{field}"{key_separator}' + ('true' if value is True else _json_string(value))
+                           for field, value in style)
+        _style_json_cache[key] = fragment
+    return fragment
+
+def java_text_json(text, m_n_handling="color", m_n_callback=None, compact=False):
+    """
+    把文本直接转换为Java版JSON文本字符串，结果与json.dumps(parse_minecraft_formatting(...), ensure_ascii=False)
+    相同（compact为True时使用紧凑分隔符），但不构建中间的字典：
+    每一部分的样式片段按样式缓存，文本只在包含需要转义的字符时才查表转义
+    """
+    if compact:
+        text_prefix, item_separator, extra_separator = '{"text":', ',', ',"extra":['
+    else:
+        text_prefix, item_separator, extra_separator = '{"text": ', ', ', ', "extra": ['
+    first = None
+    extra_parts = []
+    for style, part_text in _formatting_parts(text, m_n_handling, m_n_callback):
+        part = text_prefix + _json_string(part_text) + _style_json(style, compact)
+        if first is None:
+            first = part
+        else:
+            extra_parts.append(part + '}')
+    if first is None:
+        return text_prefix + '""}'
+    if not extra_parts:
+        return first + '}'
+    return first + extra_separator + item_separator.join(extra_parts) + ']}'
+
 def convert_text_to_bedrock(text, m_n_handling="color"):
     """将文本转换为基岩版tellraw格式"""
     # 基岩版保持所有颜色代码原样，不进行替换
     # 直接返回原始文本
     return {"rawtext": [{"text": text}]}
 
-def generate_tellraw_commands(selector, message, m_n_handling="none"):
-    """生成Java版和基岩版的tellraw命令"""
-    # 检测选择器类型
-    selector_type = detect_selector_type(selector)
-    
-    # 将基岩版选择器转换为Java版（如果需要）
-    java_selector, was_converted, java_selector_reminders = convert_bedrock_selector_to_java(selector)
-    
-    # 转换gamemode/m参数并收集提醒
-    java_selector_converted, bedrock_selector_converted, java_gamemode_reminders, bedrock_gamemode_reminders = convert_gamemode_parameters(java_selector, selector)
-    
-    # 处理参数转换 - 分别为Java版和基岩版创建不同的参数
-    import re
-    
-    # 提取原始参数信息（从原始选择器提取，用于判断原始输入类型）
-    sort_pattern = r'\bsort=([^,\]]+)'
-    limit_pattern = r'\blimit=([+-]?\d+)'
-    
-    sort_match = re.search(sort_pattern, selector)
-    limit_match = re.search(limit_pattern, selector)
-    
-    original_sort_value = sort_match.group(1) if sort_match else None
-    original_limit_value = limit_match.group(1) if limit_match else None
-    
-    # 提取基岩版c参数
-    c_pattern = r'\bc=([+-]?\d+)'
-    c_match = re.search(c_pattern, selector)
-    original_c_value = c_match.group(1) if c_match else None
-    
-    # 提取基岩版level相关参数 (l, lm) 
-    l_pattern = r'\bl=([+-]?\d+)'  # level上限
-    lm_pattern = r'\blm=([+-]?\d+)'  # level下限
-    level_pattern = r'\blevel=([^,\]]+)'  # Java版level参数
-    l_match = re.search(l_pattern, selector)
-    lm_match = re.search(lm_pattern, selector)
-    level_match = re.search(level_pattern, selector)
-    original_l_value = l_match.group(1) if l_match else None
-    original_lm_value = lm_match.group(1) if lm_match else None
-    original_level_value = level_match.group(1) if level_match else None
-    
-    # 提取基岩版距离相关参数 (r, rm)
-    r_pattern = r'\br=([^,\]]+)'  # r参数（最大距离）
-    rm_pattern = r'\brm=([^,\]]+)'  # rm参数（最小距离）
-    # Java版distance参数
-    distance_pattern = r'\bdistance=([^,\]]+)'  # distance参数
-    
-    r_match = re.search(r_pattern, selector)
-    rm_match = re.search(rm_pattern, selector)
-    distance_match = re.search(distance_pattern, selector)
-    
-    original_r_value = r_match.group(1) if r_match else None
-    original_rm_value = rm_match.group(1) if rm_match else None
-    original_distance_value = distance_match.group(1) if distance_match else None
-    
-    # 提取旋转角度相关参数
-    # Java版旋转角度参数
-    x_rotation_pattern = r'\bx_rotation=([^,\]]+)'  # x_rotation参数（垂直旋转）
-    y_rotation_pattern = r'\by_rotation=([^,\]]+)'  # y_rotation参数（水平旋转）
-    # 基岩版旋转角度参数
-    rx_pattern = r'\brx=([^,\]]+)'  # rx参数（垂直旋转最大值）
-    rxm_pattern = r'\brxm=([^,\]]+)'  # rxm参数（垂直旋转最小值）
-    ry_pattern = r'\bry=([^,\]]+)'  # ry参数（水平旋转最大值）
-    rym_pattern = r'\brym=([^,\]]+)'  # rym参数（水平旋转最小值）
-    
-    x_rotation_match = re.search(x_rotation_pattern, selector)
-    y_rotation_match = re.search(y_rotation_pattern, selector)
-    rx_match = re.search(rx_pattern, selector)
-    rxm_match = re.search(rxm_pattern, selector)
-    ry_match = re.search(ry_pattern, selector)
-    rym_match = re.search(rym_pattern, selector)
-    
-    original_x_rotation_value = x_rotation_match.group(1) if x_rotation_match else None
-    original_y_rotation_value = y_rotation_match.group(1) if y_rotation_match else None
-    original_rx_value = rx_match.group(1) if rx_match else None
-    original_rxm_value = rxm_match.group(1) if rxm_match else None
-    original_ry_value = ry_match.group(1) if ry_match else None
-    original_rym_value = rym_match.group(1) if rym_match else None
-    
-    
-    
-    # 根据原始选择器类型选择转换后的选择器作为基础
-    # 新逻辑：检测出的版本直接套用原始格式
-    if selector_type == 'bedrock':
-        # 对于基岩版输入：
-        # 基岩版输出直接使用原始输入
-        bedrock_selector_final = selector
-        # Java版输出需要将基岩版参数转换为Java版
-        # 使用convert_bedrock_selector_to_java的返回结果，确保选择器变量也被正确转换
-        java_selector_final = java_selector if was_converted else bedrock_selector_converted
-    else:
-        # 对于Java版输入：
-        # Java版输出直接使用原始输入
-        java_selector_final = selector
-        # 基岩版输出需要将Java版参数转换为基岩版
-        # bedrock_selector_converted是将原始selector(Java版)中的m转为gamemode的结果（基本不变）
-        # 所以：
-        # Java版输出应该使用原始的Java版输入
-        # 基岩版输出应该使用java_selector_converted（Java版参数转基岩版）
-        java_selector_final = java_selector  # 保持原始Java版输入
-        bedrock_selector_final = java_selector_converted  # 使用Java版转基岩版的结果
-    
-    # 处理Java版选择器参数转换
-    java_reminders = []
-    if '[' in java_selector_final and ']' in java_selector_final:
-        selector_var = java_selector_final.split('[')[0]
-        params_part = java_selector_final[java_selector_final.find('['):]
-        
-        # 如果原始选择器是基岩版输入（包含c参数、r/rm参数等），需要处理基岩版参数到Java版的转换
-        # 但是，如果java_selector_final已经是bedrock_selector_converted（即已经转换过一次），则不需要再次转换
-        is_bedrock_input = selector_type == 'bedrock'
-        already_converted = (selector_type == 'bedrock' and java_selector_final == bedrock_selector_converted)
-        
-        if is_bedrock_input and not already_converted and (original_l_value or original_lm_value or original_r_value or original_rm_value or original_rx_value or original_rxm_value or original_ry_value or original_rym_value):
-            # 注意：不在这里处理c参数转换，因为它已经在convert_limit_c_between_versions函数中处理了
-            # 这样可以避免重复的提醒信息
-            
-            # 处理基岩版l/lm参数到Java版level参数的转换
-            if original_l_value or original_lm_value:
-                # 先检查是否已存在level参数
-                existing_level_match = re.search(r'\blevel=([^,\]]+)', params_part)
-                existing_level_value = existing_level_match.group(1) if existing_level_match else None
-                
-                # 移除基岩版的l和lm参数（这些应该已经在java_selector_converted中被转换为level参数了）
-                # 但是我们仍然需要移除它们以确保不会保留原始参数
-                if original_l_value:
-                    params_part = re.sub(r'\bl=' + re.escape(original_l_value) + r'(?=[,\]])', '', params_part)
-                if original_lm_value:
-                    params_part = re.sub(r'\blm=' + re.escape(original_lm_value) + r'(?=[,\]])', '', params_part)
-                
-                # 构建Java版level参数
-                level_param = None
-                if original_l_value and original_lm_value:
-                    # l=上限, lm=下限 -> level=下限..上限
-                    if original_l_value == original_lm_value:
-                        # 如果l和lm相等，使用单个数字而非范围
-                        level_param = f'level={original_l_value}'
-                        java_reminders.append(f"基岩版l/lm参数（相等值{original_l_value}）已转换为Java版level={original_l_value}")
-                    else:
-                        level_param = f'level={original_lm_value}..{original_l_value}'
-                        java_reminders.append(f"基岩版l/lm参数已转换为Java版{level_param}")
-                elif original_l_value:
-                    # 只有l -> level=..上限
-                    # 检查是否已存在level参数，如果存在且已经是..开头，则不需要修改
-                    if existing_level_value and existing_level_value.startswith('..'):
-                        # 已有合适的level参数，不需要修改
-                        level_param = None
-                    else:
-                        level_param = f'level=..{original_l_value}'
-                        java_reminders.append(f"基岩版l参数已转换为Java版{level_param}")
-                elif original_lm_value:
-                    # 只有lm -> level=下限..
-                    # 检查是否已存在level参数，如果存在且已经是..结尾，则不需要修改
-                    if existing_level_value and existing_level_value.endswith('..'):
-                        # 已有合适的level参数，不需要修改
-                        level_param = None
-                    else:
-                        level_param = f'level={original_lm_value}..'
-                        java_reminders.append(f"基岩版lm参数已转换为Java版{level_param}")
-                
-                if level_param:
-                    # 先移除已存在的level参数，避免重复
-                    params_part = re.sub(r'\blevel=[^,\]]+', '', params_part)
-                    
-                    # 在方括号内添加level参数
-                    if params_part.endswith('['):
-                        params_part = params_part[:-1] + f'{level_param}]'
-                    elif params_part.endswith(']'):
-                        params_part = params_part[:-1] + f',{level_param}]'
-                    else:
-                        params_part = params_part + f',{level_param}'
-            
-            # 处理基岩版r/rm参数到Java版distance参数的转换
-            if original_r_value or original_rm_value:
-                # 先检查是否已存在distance参数
-                existing_distance_match = re.search(r'\bdistance=([^,\]]+)', params_part)
-                existing_distance_value = existing_distance_match.group(1) if existing_distance_match else None
-                
-                # 移除基岩版的r和rm参数
-                if original_r_value:
-                    params_part = re.sub(r'\br=' + re.escape(original_r_value) + r'(?=[,\]])', '', params_part)
-                if original_rm_value:
-                    params_part = re.sub(r'\brm=' + re.escape(original_rm_value) + r'(?=[,\]])', '', params_part)
-                
-                # 构建Java版distance参数
-                distance_param = None
-                if original_r_value and original_rm_value:
-                    # r=最大距离, rm=最小距离 -> distance=最小距离..最大距离
-                    if original_r_value == original_rm_value:
-                        # 如果r和rm相等，使用单个数字而非范围
-                        distance_param = f'distance={original_rm_value}'
-                        java_reminders.append(f"基岩版r/rm参数（相等值{original_r_value}）已转换为Java版distance={original_r_value}")
-                    else:
-                        distance_param = f'distance={original_rm_value}..{original_r_value}'
-                        java_reminders.append(f"基岩版r/rm参数已转换为Java版{distance_param}")
-                elif original_r_value:
-                    # 只有r -> distance=..最大距离
-                    # 检查是否已存在distance参数，如果存在且已经是..开头，则不需要修改
-                    if existing_distance_value and existing_distance_value.startswith('..'):
-                        # 已有合适的distance参数，不需要修改
-                        distance_param = None
-                    else:
-                        distance_param = f'distance=..{original_r_value}'
-                        java_reminders.append(f"基岩版r参数已转换为Java版{distance_param}")
-                elif original_rm_value:
-                    # 只有rm -> distance=最小距离..
-                    # 检查是否已存在distance参数，如果存在且已经是..结尾，则不需要修改
-                    if existing_distance_value and existing_distance_value.endswith('..'):
-                        # 已有合适的distance参数，不需要修改
-                        distance_param = None
-                    else:
-                        distance_param = f'distance={original_rm_value}..'
-                        java_reminders.append(f"基岩版rm参数已转换为Java版{distance_param}")
-                
-                if distance_param:
-                    # 先移除已存在的distance参数，避免重复
-                    params_part = re.sub(r'\bdistance=[^,\]]+', '', params_part)
-                    
-                    # 在方括号内添加distance参数
-                    if params_part.endswith('['):
-                        params_part = params_part[:-1] + f'{distance_param}]'
-                    elif params_part.endswith(']'):
-                        params_part = params_part[:-1] + f',{distance_param}]'
-                    else:
-                        params_part = params_part + f',{distance_param}'
-            
-            # 处理基岩版rx/rxm参数到Java版x_rotation参数的转换
-            if original_rx_value or original_rxm_value:
-                # 先检查是否已存在x_rotation参数
-                existing_x_rotation_match = re.search(r'\bx_rotation=([^,\]]+)', params_part)
-                existing_x_rotation_value = existing_x_rotation_match.group(1) if existing_x_rotation_match else None
-                
-                # 移除基岩版的rx和rxm参数
-                if original_rx_value:
-                    params_part = re.sub(r'\brx=' + re.escape(original_rx_value) + r'(?=[,\]])', '', params_part)
-                if original_rxm_value:
-                    params_part = re.sub(r'\brxm=' + re.escape(original_rxm_value) + r'(?=[,\]])', '', params_part)
-                
-                # 构建Java版x_rotation参数
-                x_rotation_param = None
-                if original_rx_value and original_rxm_value:
-                    # rx=最大值, rxm=最小值 -> x_rotation=最小值..最大值
-                    if original_rx_value == original_rxm_value:
-                        # 如果rx和rxm相等，使用单个数字而非范围
-                        x_rotation_param = f'x_rotation={original_rxm_value}'
-                        java_reminders.append(f"基岩版rx/rxm参数（相等值{original_rx_value}）已转换为Java版x_rotation={original_rx_value}")
-                    else:
-                        x_rotation_param = f'x_rotation={original_rxm_value}..{original_rx_value}'
-                        java_reminders.append(f"基岩版rx/rxm参数已转换为Java版{x_rotation_param}")
-                elif original_rx_value:
-                    # 只有rx -> x_rotation=..最大值
-                    # 检查是否已存在x_rotation参数，如果存在且已经是..开头，则不需要修改
-                    if existing_x_rotation_value and existing_x_rotation_value.startswith('..'):
-                        # 已有合适的x_rotation参数，不需要修改
-                        x_rotation_param = None
-                    else:
-                        x_rotation_param = f'x_rotation=..{original_rx_value}'
-                        java_reminders.append(f"基岩版rx参数已转换为Java版{x_rotation_param}")
-                elif original_rxm_value:
-                    # 只有rxm -> x_rotation=最小值..
-                    # 检查是否已存在x_rotation参数，如果存在且已经是..结尾，则不需要修改
-                    if existing_x_rotation_value and existing_x_rotation_value.endswith('..'):
-                        # 已有合适的x_rotation参数，不需要修改
-                        x_rotation_param = None
-                    else:
-                        x_rotation_param = f'x_rotation={original_rxm_value}..'
-                        java_reminders.append(f"基岩版rxm参数已转换为Java版{x_rotation_param}")
-                
-                if x_rotation_param:
-                    # 先移除已存在的x_rotation参数，避免重复
-                    params_part = re.sub(r'\bx_rotation=[^,\]]+', '', params_part)
-                    
-                    # 在方括号内添加x_rotation参数
-                    if params_part.endswith('['):
-                        params_part = params_part[:-1] + f'{x_rotation_param}]'
-                    elif params_part.endswith(']'):
-                        params_part = params_part[:-1] + f',{x_rotation_param}]'
-                    else:
-                        params_part = params_part + f',{x_rotation_param}'
-            
-            # 处理基岩版ry/rym参数到Java版y_rotation参数的转换
-            if original_ry_value or original_rym_value:
-                # 先检查是否已存在y_rotation参数
-                existing_y_rotation_match = re.search(r'\by_rotation=([^,\]]+)', params_part)
-                existing_y_rotation_value = existing_y_rotation_match.group(1) if existing_y_rotation_match else None
-                
-                # 移除基岩版的ry和rym参数
-                if original_ry_value:
-                    params_part = re.sub(r'\bry=' + re.escape(original_ry_value) + r'(?=[,\]])', '', params_part)
-                if original_rym_value:
-                    params_part = re.sub(r'\brym=' + re.escape(original_rym_value) + r'(?=[,\]])', '', params_part)
-                
-                # 构建Java版y_rotation参数
-                y_rotation_param = None
-                if original_ry_value and original_rym_value:
-                    # ry=最大值, rym=最小值 -> y_rotation=最小值..最大值
-                    if original_ry_value == original_rym_value:
-                        # 如果ry和rym相等，使用单个数字而非范围
-                        # 这种情况下，确保y_rotation参数一定被添加
-                        y_rotation_param = f'y_rotation={original_rym_value}'
-                        java_reminders.append(f"基岩版ry/rym参数（相等值{original_ry_value}）已转换为Java版y_rotation={original_rym_value}")
-                    else:
-                        y_rotation_param = f'y_rotation={original_rym_value}..{original_ry_value}'
-                        java_reminders.append(f"基岩版ry/rym参数已转换为Java版{y_rotation_param}")
-                elif original_ry_value:
-                    # 只有ry -> y_rotation=..最大值
-                    # 检查是否已存在y_rotation参数，如果存在且已经是..开头，则不需要修改
-                    if existing_y_rotation_value and existing_y_rotation_value.startswith('..'):
-                        # 已有合适的y_rotation参数，不需要修改
-                        y_rotation_param = None
-                    else:
-                        y_rotation_param = f'y_rotation=..{original_ry_value}'
-                        java_reminders.append(f"基岩版ry参数已转换为Java版{y_rotation_param}")
-                elif original_rym_value:
-                    # 只有rym -> y_rotation=最小值..
-                    # 检查是否已存在y_rotation参数，如果存在且已经是..结尾，则不需要修改
-                    if existing_y_rotation_value and existing_y_rotation_value.endswith('..'):
-                        # 已有合适的y_rotation参数，不需要修改
-                        y_rotation_param = None
-                    else:
-                        y_rotation_param = f'y_rotation={original_rym_value}..'
-                        java_reminders.append(f"基岩版rym参数已转换为Java版{y_rotation_param}")
-                
-                # 如果生成了新的y_rotation参数，或者需要确保y_rotation参数存在
-                # 如果生成了新的y_rotation参数，或者需要确保y_rotation参数存在
-                if y_rotation_param:
-                    # 先移除已存在的y_rotation参数，避免重复
-                    params_part = re.sub(r'\by_rotation=[^,\]]+', '', params_part)
-                    
-                    # 在方括号内添加y_rotation参数
-                    if params_part.endswith('['):
-                        params_part = params_part[:-1] + f'{y_rotation_param}]'
-                    elif params_part.endswith(']'):
-                        params_part = params_part[:-1] + f',{y_rotation_param}]'
-                    else:
-                        params_part = params_part + f',{y_rotation_param}'
-            
-            else:
-                # 如果原始选择器是Java版输入，保留原始参数
-                if original_sort_value:
-                    # Java版保留sort参数，不需要对选择器进行转换
-                    java_reminders.append(f"Java版sort={original_sort_value}保留")
-        
-        # 清理多余的逗号
-        params_part = re.sub(r',+', ',', params_part)
-        params_part = re.sub(r'\[,', '[', params_part)
-        params_part = re.sub(r',\]', ']', params_part)
-        params_part = re.sub(r'\[\]', '', params_part)  # 移除空方括号
-        
-        java_selector_final = selector_var + params_part
-    else:
-        java_selector_final = java_selector_converted
-    
-    # 处理基岩版选择器
-    bedrock_reminders = []
-    if '[' in bedrock_selector_final and ']' in bedrock_selector_final:
-        # 调试：打印处理前的基岩版选择器
-        selector_var = bedrock_selector_final.split('[')[0]
-        params_part = bedrock_selector_final[bedrock_selector_final.find('['):]
-        
-        # 如果原始选择器是Java版（包含sort参数或其他Java版参数），需要处理sort参数到c参数的转换等
-        # 检查是否需要处理Java版特有参数到基岩版参数的转换
-        needs_java_to_bedrock_conversion = (
-            original_distance_value or 
-            original_x_rotation_value or original_y_rotation_value or 
-            original_level_value or 
-            original_limit_value or original_sort_value
-        )
-        
-        if needs_java_to_bedrock_conversion:
-            # 处理Java版distance参数到基岩版r/rm参数的转换
-            if original_distance_value:
-                # 先检查是否已存在r和rm参数
-                existing_r_match = re.search(r'\br=([^,\]]+)', params_part)
-                existing_r_value = existing_r_match.group(1) if existing_r_match else None
-                existing_rm_match = re.search(r'\brm=([^,\]]+)', params_part)
-                existing_rm_value = existing_rm_match.group(1) if existing_rm_match else None
-                
-                # 移除Java版distance参数
-                params_part = re.sub(distance_pattern, '', params_part)
-                
-                # 解析distance值
-                if '..' in original_distance_value:
-                    parts = original_distance_value.split('..')
-                    if parts[0] and parts[1]:
-                        # 有上下限：5..10 -> rm=5,r=10
-                        rm_val = parts[0]
-                        r_val = parts[1]
-                        # 检查是否已存在合适的r和rm参数
-                        if existing_r_value and existing_rm_value:
-                            # 已有r和rm参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的r和rm参数，避免重复
-                            params_part = re.sub(r'\br=[^,\]]+', '', params_part)
-                            params_part = re.sub(r'\brm=[^,\]]+', '', params_part)
-                            
-                            # 添加r和rm参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'rm={rm_val},r={r_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',rm={rm_val},r={r_val}]'
-                            else:
-                                params_part = params_part + f',rm={rm_val},r={r_val}'
-                            bedrock_reminders.append(f"Java版distance={original_distance_value}参数已转换为基岩版rm={rm_val},r={r_val}")
-                    elif parts[0]:
-                        # 只有下限：5.. -> rm=5
-                        rm_val = parts[0]
-                        # 检查是否已存在合适的rm参数
-                        if existing_rm_value:
-                            # 已有rm参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的rm参数，避免重复
-                            params_part = re.sub(r'\brm=[^,\]]+', '', params_part)
-                            
-                            # 添加rm参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'rm={rm_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',rm={rm_val}]'
-                            else:
-                                params_part = params_part + f',rm={rm_val}'
-                            bedrock_reminders.append(f"Java版distance={original_distance_value}参数已转换为基岩版rm={rm_val}")
-                    elif parts[1]:
-                        # 只有上限：..10 -> r=10
-                        r_val = parts[1]
-                        # 检查是否已存在合适的r参数
-                        if existing_r_value:
-                            # 已有r参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的r参数，避免重复
-                            params_part = re.sub(r'\br=[^,\]]+', '', params_part)
-                            
-                            # 添加r参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'r={r_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',r={r_val}]'
-                            else:
-                                params_part = params_part + f',r={r_val}'
-                            bedrock_reminders.append(f"Java版distance={original_distance_value}参数已转换为基岩版r={r_val}")
-                else:
-                                # 单个值：10 -> rm=10,r=10（精确匹配）
-                                rm_val = original_distance_value
-                                r_val = original_distance_value
-                                # 检查是否已存在合适的r和rm参数
-                                if existing_r_value and existing_rm_value:
-                                    # 已有r和rm参数，不需要修改
-                                    pass
-                                else:
-                                    # 移除已存在的r和rm参数，避免重复
-                                    params_part = re.sub(r'\br=[^,\]]+', '', params_part)
-                                    params_part = re.sub(r'\brm=[^,\]]+', '', params_part)
-                                    
-                                    # 添加r和rm参数
-                                    if params_part.endswith('['):
-                                        params_part = params_part[:-1] + f'rm={rm_val},r={r_val}]'
-                                    elif params_part.endswith(']'):
-                                        params_part = params_part[:-1] + f',rm={rm_val},r={r_val}]'
-                                    else:
-                                        params_part = params_part + f',rm={rm_val},r={r_val}'
-                                    bedrock_reminders.append(f"Java版distance={original_distance_value}参数已转换为基岩版rm={rm_val},r={r_val}")            
-            # 处理Java版x_rotation参数到基岩版rx/rxm参数的转换
-            if original_x_rotation_value:
-                # 先检查是否已存在rx和rxm参数
-                existing_rx_match = re.search(r'\brx=([^,\]]+)', params_part)
-                existing_rx_value = existing_rx_match.group(1) if existing_rx_match else None
-                existing_rxm_match = re.search(r'\brxm=([^,\]]+)', params_part)
-                existing_rxm_value = existing_rxm_match.group(1) if existing_rxm_match else None
-                
-                # 移除Java版x_rotation参数
-                params_part = re.sub(x_rotation_pattern, '', params_part)
-                
-                # 解析x_rotation值
-                if '..' in original_x_rotation_value:
-                    parts = original_x_rotation_value.split('..')
-                    if parts[0] and parts[1]:
-                        # 有上下限：-45..45 -> rxm=-45,rx=45
-                        rxm_val = parts[0]
-                        rx_val = parts[1]
-                        # 检查是否已存在合适的rx和rxm参数
-                        if existing_rx_value and existing_rxm_value:
-                            # 已有rx和rxm参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的rx和rxm参数，避免重复
-                            params_part = re.sub(r'\brx=[^,\]]+', '', params_part)
-                            params_part = re.sub(r'\brxm=[^,\]]+', '', params_part)
-                            
-                            # 添加rx和rxm参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'rxm={rxm_val},rx={rx_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',rxm={rxm_val},rx={rx_val}]'
-                            else:
-                                params_part = params_part + f',rxm={rxm_val},rx={rx_val}'
-                            bedrock_reminders.append(f"Java版x_rotation={original_x_rotation_value}参数已转换为基岩版rxm={rxm_val},rx={rx_val}")
-                    elif parts[0]:
-                        # 只有下限：-45.. -> rxm=-45
-                        rxm_val = parts[0]
-                        # 检查是否已存在合适的rxm参数
-                        if existing_rxm_value:
-                            # 已有rxm参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的rxm参数，避免重复
-                            params_part = re.sub(r'\brxm=[^,\]]+', '', params_part)
-                            
-                            # 添加rxm参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'rxm={rxm_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',rxm={rxm_val}]'
-                            else:
-                                params_part = params_part + f',rxm={rxm_val}'
-                            bedrock_reminders.append(f"Java版x_rotation={original_x_rotation_value}参数已转换为基岩版rxm={rxm_val}")
-                    elif parts[1]:
-                        # 只有上限：..45 -> rx=45
-                        rx_val = parts[1]
-                        # 检查是否已存在合适的rx参数
-                        if existing_rx_value:
-                            # 已有rx参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的rx参数，避免重复
-                            params_part = re.sub(r'\brx=[^,\]]+', '', params_part)
-                            
-                            # 添加rx参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'rx={rx_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',rx={rx_val}]'
-                            else:
-                                params_part = params_part + f',rx={rx_val}'
-                            bedrock_reminders.append(f"Java版x_rotation={original_x_rotation_value}参数已转换为基岩版rx={rx_val}")
-                else:
-                                # 单个值：45 -> rxm=45,rx=45（精确匹配）
-                                rxm_val = original_x_rotation_value
-                                rx_val = original_x_rotation_value
-                                # 检查是否已存在合适的rx和rxm参数
-                                if existing_rx_value and existing_rxm_value:
-                                    # 已有rx和rxm参数，不需要修改
-                                    pass
-                                else:
-                                    # 移除已存在的rx和rxm参数，避免重复
-                                    params_part = re.sub(r'\brx=[^,\]]+', '', params_part)
-                                    params_part = re.sub(r'\brxm=[^,\]]+', '', params_part)
-                                    
-                                    # 添加rx和rxm参数
-                                    if params_part.endswith('['):
-                                        params_part = params_part[:-1] + f'rxm={rxm_val},rx={rx_val}]'
-                                    elif params_part.endswith(']'):
-                                        params_part = params_part[:-1] + f',rxm={rxm_val},rx={rx_val}]'
-                                    else:
-                                        params_part = params_part + f',rxm={rxm_val},rx={rx_val}'
-                                    bedrock_reminders.append(f"Java版x_rotation={original_x_rotation_value}参数已转换为基岩版rxm={rxm_val},rx={rx_val}")            
-            # 处理Java版y_rotation参数到基岩版ry/rym参数的转换
-            if original_y_rotation_value:
-                # 先检查是否已存在ry和rym参数
-                existing_ry_match = re.search(r'\bry=([^,\]]+)', params_part)
-                existing_ry_value = existing_ry_match.group(1) if existing_ry_match else None
-                existing_rym_match = re.search(r'\brym=([^,\]]+)', params_part)
-                existing_rym_value = existing_rym_match.group(1) if existing_rym_match else None
-                
-                # 移除Java版y_rotation参数
-                params_part = re.sub(y_rotation_pattern, '', params_part)
-                
-                # 解析y_rotation值
-                if '..' in original_y_rotation_value:
-                    parts = original_y_rotation_value.split('..')
-                    if parts[0] and parts[1]:
-                        # 有上下限：-45..45 -> rym=-45,ry=45
-                        rym_val = parts[0]
-                        ry_val = parts[1]
-                        # 检查是否已存在合适的ry和rym参数
-                        if existing_ry_value and existing_rym_value:
-                            # 已有ry和rym参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的ry和rym参数，避免重复
-                            params_part = re.sub(r'\bry=[^,\]]+', '', params_part)
-                            params_part = re.sub(r'\brym=[^,\]]+', '', params_part)
-                            
-                            # 添加ry和rym参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'rym={rym_val},ry={ry_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',rym={rym_val},ry={ry_val}]'
-                            else:
-                                params_part = params_part + f',rym={rym_val},ry={ry_val}'
-                            bedrock_reminders.append(f"Java版y_rotation={original_y_rotation_value}参数已转换为基岩版rym={rym_val},ry={ry_val}")
-                    elif parts[0]:
-                        # 只有下限：-45.. -> rym=-45
-                        rym_val = parts[0]
-                        # 检查是否已存在合适的rym参数
-                        if existing_rym_value:
-                            # 已有rym参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的rym参数，避免重复
-                            params_part = re.sub(r'\brym=[^,\]]+', '', params_part)
-                            
-                            # 添加rym参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'rym={rym_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',rym={rym_val}]'
-                            else:
-                                params_part = params_part + f',rym={rym_val}'
-                            bedrock_reminders.append(f"Java版y_rotation={original_y_rotation_value}参数已转换为基岩版rym={rym_val}")
-                    elif parts[1]:
-                        # 只有上限：..45 -> ry=45
-                        ry_val = parts[1]
-                        # 检查是否已存在合适的ry参数
-                        if existing_ry_value:
-                            # 已有ry参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的ry参数，避免重复
-                            params_part = re.sub(r'\bry=[^,\]]+', '', params_part)
-                            
-                            # 添加ry参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'ry={ry_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',ry={ry_val}]'
-                            else:
-                                params_part = params_part + f',ry={ry_val}'
-                            bedrock_reminders.append(f"Java版y_rotation={original_y_rotation_value}参数已转换为基岩版ry={ry_val}")
-                else:
-                                # 单个值：90 -> rym=90,ry=90（精确匹配）
-                                rym_val = original_y_rotation_value
-                                ry_val = original_y_rotation_value
-                                # 检查是否已存在合适的ry和rym参数
-                                if existing_ry_value and existing_rym_value:
-                                    # 已有ry和rym参数，不需要修改
-                                    pass
-                                else:
-                                    # 移除已存在的ry和rym参数，避免重复
-                                    params_part = re.sub(r'\bry=[^,\]]+', '', params_part)
-                                    params_part = re.sub(r'\brym=[^,\]]+', '', params_part)
-                                    
-                                    # 添加ry和rym参数
-                                    if params_part.endswith('['):
-                                        params_part = params_part[:-1] + f'rym={rym_val},ry={ry_val}]'
-                                    elif params_part.endswith(']'):
-                                        params_part = params_part[:-1] + f',rym={rym_val},ry={ry_val}]'
-                                    else:
-                                        params_part = params_part + f',rym={rym_val},ry={ry_val}'
-                                    bedrock_reminders.append(f"Java版y_rotation={original_y_rotation_value}参数已转换为基岩版rym={rym_val},ry={ry_val}")            
-            # 处理Java版level参数到基岩版l/lm参数的转换
-            if original_level_value:
-                # 先检查是否已存在l和lm参数
-                existing_l_match = re.search(r'\bl=([^,\]]+)', params_part)
-                existing_l_value = existing_l_match.group(1) if existing_l_match else None
-                existing_lm_match = re.search(r'\blm=([^,\]]+)', params_part)
-                existing_lm_value = existing_lm_match.group(1) if existing_lm_match else None
-                
-                # 移除Java版level参数
-                params_part = re.sub(level_pattern, '', params_part)
-                
-                # 解析level值
-                if '..' in original_level_value:
-                    parts = original_level_value.split('..')
-                    if parts[0] and parts[1]:
-                        # 有上下限：5..10 -> lm=5,l=10
-                        lm_val = parts[0]
-                        l_val = parts[1]
-                        # 检查是否已存在合适的l和lm参数
-                        if existing_l_value and existing_lm_value:
-                            # 已有l和lm参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的l和lm参数，避免重复
-                            params_part = re.sub(r'\bl=[^,\]]+', '', params_part)
-                            params_part = re.sub(r'\blm=[^,\]]+', '', params_part)
-                            
-                            # 添加l和lm参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'lm={lm_val},l={l_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',lm={lm_val},l={l_val}]'
-                            else:
-                                params_part = params_part + f',lm={lm_val},l={l_val}'
-                            bedrock_reminders.append(f"Java版level={original_level_value}参数已转换为基岩版lm={lm_val},l={l_val}")
-                    elif parts[0]:
-                        # 只有下限：5.. -> lm=5
-                        lm_val = parts[0]
-                        # 检查是否已存在合适的lm参数
-                        if existing_lm_value:
-                            # 已有lm参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的lm参数，避免重复
-                            params_part = re.sub(r'\blm=[^,\]]+', '', params_part)
-                            
-                            # 添加lm参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'lm={lm_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',lm={lm_val}]'
-                            else:
-                                params_part = params_part + f',lm={lm_val}'
-                            bedrock_reminders.append(f"Java版level={original_level_value}参数已转换为基岩版lm={lm_val}")
-                    elif parts[1]:
-                        # 只有上限：..10 -> l=10
-                        l_val = parts[1]
-                        # 检查是否已存在合适的l参数
-                        if existing_l_value:
-                            # 已有l参数，不需要修改
-                            pass
-                        else:
-                            # 移除已存在的l参数，避免重复
-                            params_part = re.sub(r'\bl=[^,\]]+', '', params_part)
-                            
-                            # 添加l参数
-                            if params_part.endswith('['):
-                                params_part = params_part[:-1] + f'l={l_val}]'
-                            elif params_part.endswith(']'):
-                                params_part = params_part[:-1] + f',l={l_val}]'
-                            else:
-                                params_part = params_part + f',l={l_val}'
-                            bedrock_reminders.append(f"Java版level={original_level_value}参数已转换为基岩版l={l_val}")
-                else:
-                    # 单个值：10 -> l=10,lm=10
-                    l_val = original_level_value
-                    # 检查是否已存在合适的l和lm参数
-                    if existing_l_value and existing_lm_value:
-                        # 已有l和lm参数，不需要修改
-                        pass
-                    else:
-                        # 移除已存在的l和lm参数，避免重复
-                        params_part = re.sub(r'\bl=[^,\]]+', '', params_part)
-                        params_part = re.sub(r'\blm=[^,\]]+', '', params_part)
-                        
-                        # 添加l和lm参数
-                        if params_part.endswith('['):
-                            params_part = params_part[:-1] + f'lm={l_val},l={l_val}]'
-                        elif params_part.endswith(']'):
-                            params_part = params_part[:-1] + f',lm={l_val},l={l_val}]'
-                        else:
-                            params_part = params_part + f',lm={l_val},l={l_val}'
-                        bedrock_reminders.append(f"Java版level={original_level_value}参数已转换为基岩版lm={l_val},l={l_val}")
-            
-            # 处理Java版limit参数到基岩版c参数的转换（如果没有sort参数）
-            # 注意：limit参数的转换已经在convert_limit_c_between_versions函数中处理了，这里不再添加重复提醒
-            if original_limit_value and not original_sort_value:
-                # 先移除已存在的c参数，避免重复
-                params_part = re.sub(r'\bc=[^,\]]+', '', params_part)
-                # 移除Java版limit参数
-                params_part = re.sub(limit_pattern, '', params_part)
-                
-                # 添加c参数
-                if params_part == '[]':
-                    # 如果params_part是空的方括号，直接替换为[c=5]
-                    params_part = f'[c={original_limit_value}]'
-                elif params_part.endswith('['):
-                    params_part = params_part[:-1] + f'c={original_limit_value}]'
-                elif params_part.endswith(']'):
-                    # 检查是否是空方括号
-                    if params_part == '[]':
-                        params_part = f'[c={original_limit_value}]'
-                    else:
-                        params_part = params_part[:-1] + f',c={original_limit_value}]'
-                else:
-                    params_part = params_part + f',c={original_limit_value}'
-                # 不再添加重复的提醒信息，因为convert_limit_c_between_versions函数已经添加了
-        
-        # 处理sort参数
-        if original_sort_value:
-            if original_sort_value == 'nearest':
-                # 根据sort.txt: sort=nearest时，只有大选择器是@a @p时基岩版才开始转换，并且选择器只能用@p
-                # 当大选择器不是这几个时基岩版直接砍掉sort=nearest
-                if selector_var in ['@a', '@p']:
-                    # 只有当选择器是@p或@a时才进行转换
-                    c_value = original_limit_value if original_limit_value else '9999'
-                    # sort=nearest转换为c参数，并将选择器转换为@p
-                    selector_var = '@p'
-                    # 先移除已存在的c参数，避免重复
-                    params_part = re.sub(r'\bc=[^,\]]+', '', params_part)
-                    # 移除sort参数，移除limit参数（基岩版不需要），添加c参数
-                    params_part = re.sub(sort_pattern, '', params_part)
-                    params_part = re.sub(limit_pattern, '', params_part)
-                    if params_part.endswith('['):
-                        params_part = params_part[:-1] + f'c={c_value}]'
-                    elif params_part.endswith(']'):
-                        params_part = params_part[:-1] + f',c={c_value}]'
-                    else:
-                        params_part = params_part + f'c={c_value}'
-                    bedrock_reminders.append(f"Java版sort=nearest已转换为基岩版c={c_value}")
-                else:
-                    # 当选择器不是@p或@a时，直接移除sort=nearest参数
-                    params_part = re.sub(sort_pattern, '', params_part)
-                    params_part = re.sub(limit_pattern, '', params_part)
-                    bedrock_reminders.append("Java版非@p/@a选择器的sort=nearest参数在基岩版中不支持，已移除")
-            elif original_sort_value == 'furthest':
-                # sort=furthest转换为c参数
-                abs_limit_val = original_limit_value if original_limit_value else '9999'
-                c_value = f'-{abs_limit_val}'
-                # 先移除已存在的c参数，避免重复
-                params_part = re.sub(r'\bc=[^,\]]+', '', params_part)
-                # 移除sort参数，移除limit参数（基岩版不需要），添加c参数
-                params_part = re.sub(sort_pattern, '', params_part)
-                params_part = re.sub(limit_pattern, '', params_part)
-                if params_part.endswith('['):
-                    params_part = params_part[:-1] + f'c={c_value}]'
-                elif params_part.endswith(']'):
-                    params_part = params_part[:-1] + f',c={c_value}]'
-                else:
-                    params_part = params_part + f'c={c_value}'
-                bedrock_reminders.append(f"Java版sort=furthest已转换为基岩版c={c_value}")
-            elif original_sort_value == 'arbitrary':
-                # 移除sort参数，基岩版不支持sort=arbitrary
-                params_part = re.sub(sort_pattern, '', params_part)
-                bedrock_reminders.append("Java版sort=arbitrary在基岩版中不支持，已移除")
-            elif original_sort_value == 'random':
-                # 对于sort=random，基岩版中将选择器从@a改为@r，并添加c参数
-                if selector_var == '@a':
-                    selector_var = '@r'
-                    c_value = original_limit_value if original_limit_value else '9999'
-                    # 先移除已存在的c参数，避免重复
-                    params_part = re.sub(r'\bc=[^,\]]+', '', params_part)
-                    # 移除sort参数，移除limit参数（基岩版不需要），添加c参数
-                    params_part = re.sub(sort_pattern, '', params_part)
-                    params_part = re.sub(limit_pattern, '', params_part)
-                    if params_part.endswith('['):
-                        params_part = params_part[:-1] + f'c={c_value}]'
-                    elif params_part.endswith(']'):
-                        params_part = params_part[:-1] + f',c={c_value}]'
-                    else:
-                        params_part = params_part + f'c={c_value}'
-                    bedrock_reminders.append("Java版@a[sort=random]已转换为基岩版@r")
-                else:
-                    # 对于其他选择器（如@p、@e），移除sort参数，保留已转换的c参数
-                    params_part = re.sub(sort_pattern, '', params_part)
-                    # 清理多余的逗号
-                    params_part = re.sub(r',+', ',', params_part)
-                    params_part = re.sub(r'\[,', '[', params_part)
-                    params_part = re.sub(r',\]', ']', params_part)
-                    bedrock_reminders.append(f"Java版sort=random已转换为基岩版c参数")
+# 基岩版上下限参数合并为Java版范围参数时的处理顺序（Java版参数名，对应规则见SELECTOR_PARAM_RULES）
+BEDROCK_RANGE_MERGE_ORDER = ('level', 'distance', 'x_rotation', 'y_rotation')
+
+def _merge_bedrock_ranges_ir(ir, source, java_reminders):
+    """
+    基岩版选择器变量被转换后，将原始选择器中的l/lm、r/rm、rx/rxm、ry/rym参数
+    合并为Java版的level、distance、x_rotation、y_rotation参数
+    """
+    originals = []
+    for java_name in BEDROCK_RANGE_MERGE_ORDER:
+        rule = get_range_rule(java_name)
+        max_name, min_name, pattern = rule['max'], rule['min'], rule['pattern']
+        originals.append((max_name, min_name, java_name, source.get(max_name, pattern), source.get(min_name, pattern)))
+    if not any(max_value or min_value for _, _, _, max_value, min_value in originals):
+        return ir
+
+    for max_name, min_name, java_name, max_value, min_value in originals:
+        if not max_value and not min_value:
+            continue
+        if _rule_recorders:
+            start = time.perf_counter_ns()
+        # 先检查是否已存在Java版参数
+        existing_value = ir.get(java_name)
+
+        # 移除基岩版的上下限参数
+        if max_value:
+            ir = ir.without(max_name, value=max_value)
+        if min_value:
+            ir = ir.without(min_name, value=min_value)
+
+        # 构建Java版范围参数
+        range_value = None
+        if max_value and min_value:
+            if max_value == min_value:
+                # 上下限相等时使用单个数字而非范围
+                range_value = max_value
+                java_reminders.append(f"基岩版{max_name}/{min_name}参数（相等值{max_value}）已转换为Java版{java_name}={max_value}")
             else:
-                # 移除sort参数
-                params_part = re.sub(sort_pattern, '', params_part)
-                # 移除limit参数（如果存在）
-                params_part = re.sub(limit_pattern, '', params_part)
-                bedrock_reminders.append(f"Java版sort={original_sort_value}被移除")
+                range_value = f'{min_value}..{max_value}'
+                java_reminders.append(f"基岩版{max_name}/{min_name}参数已转换为Java版{java_name}={range_value}")
+        elif max_value:
+            # 只有上限 -> ..上限，已有..开头的参数时不需要修改
+            if not (existing_value and existing_value.startswith('..')):
+                range_value = f'..{max_value}'
+                java_reminders.append(f"基岩版{max_name}参数已转换为Java版{java_name}={range_value}")
         else:
-            # 如果原始选择器是Java版（只有limit参数，没有sort参数），需要处理limit参数到c参数的转换
-            # 注意：如果已经处理过limit参数转换（在needs_java_to_bedrock_conversion中），则不再重复处理
-            if original_limit_value and not original_sort_value and not needs_java_to_bedrock_conversion:
-                # 检查params_part是否已经包含c参数
-                if 'c=' not in params_part:
-                    # 先移除已存在的c参数，避免重复
-                    params_part = re.sub(r'\bc=[^,\]]+', '', params_part)
-                    # 只有limit参数，没有sort参数，直接转换为c参数
-                    params_part = re.sub(limit_pattern, f'c={original_limit_value}', params_part)
-                    bedrock_reminders.append(f"Java版limit={original_limit_value}参数已转换为基岩版c={original_limit_value}")
-                else:
-                    # 如果已经包含c参数，不需要再次转换
-                    pass
-        
-        # 清理多余的逗号
-        params_part = re.sub(r',+', ',', params_part)
-        
-        # 特殊处理：如果params_part以逗号开头，移除开头的逗号
-        if params_part.startswith(','):
-            params_part = params_part[1:]
-        
-        params_part = re.sub(r'\[,', '[', params_part)
-        params_part = re.sub(r',\]', ']', params_part)
-        # 不移除空方括号，因为可能会误删内容
-        
-        bedrock_selector_final = selector_var + params_part
-        # 调试：打印处理后的基岩版选择器
-    else:
-        bedrock_selector_final = bedrock_selector_converted
-    
-    # 过滤Java版参数，移除基岩版特有的参数（完全不支持）
-    java_selector_filtered, java_removed_params = filter_selector_parameters(java_selector_final, 'java')
-    
-    # 过滤基岩版参数，移除Java版特有的参数（完全不支持）
-    # 调试：打印过滤前的基岩版选择器
-    bedrock_selector_filtered, bedrock_removed_params = filter_selector_parameters(bedrock_selector_final, 'bedrock')
-    # 调试：打印过滤后的基岩版选择器
-    
-    # 额外处理：确保基岩版选择器中不包含l和lm参数（这些是基岩版参数，但在Java版中没有对应）
-    # 但基岩版应该保留这些参数，因为它们是基岩版的参数
-    # 实际上，l和lm是基岩版参数，应该保留在基岩版中，因为基岩版本身就支持这些参数
-    
-    # 合并所有提醒信息
-    all_java_reminders = java_gamemode_reminders + java_reminders + java_selector_reminders
-    all_bedrock_reminders = bedrock_gamemode_reminders + bedrock_reminders
-    
-    # 生成Java版命令
-    if m_n_handling == "mixed":
-        # 混合模式：定义回调函数
-        def m_n_callback(code):
-            code_name = "§m(删除线)" if code == '§m' else "§n(下划线)"
-            print(PROMPTS["prompts"]["m_n_mixed_choice"].format(code_name))
-            choice = input("请选择 (1/2): ").strip()
-            if choice == '1':
-                return "font"
-            elif choice == '2':
-                return "color"
-            else:
-                print("无效选择，默认使用字体方式")
-                return "font"
-        
-        java_json = convert_text_to_java(message, m_n_handling, m_n_callback)
+            # 只有下限 -> 下限..，已有..结尾的参数时不需要修改
+            if not (existing_value and existing_value.endswith('..')):
+                range_value = f'{min_value}..'
+                java_reminders.append(f"基岩版{min_name}参数已转换为Java版{java_name}={range_value}")
+
+        if range_value:
+            # 先移除已存在的同名参数，避免重复
+            ir = ir.without(java_name).appended(SelectorParam(java_name, range_value))
+            if _rule_recorders:
+                _rule_fired(f'{min_name}/{max_name}->{java_name}', start, f'{java_name}={range_value}')
+
+    ry_value, rym_value = originals[-1][3:]
+    sort_value = source.get('sort')
+    if not ry_value and not rym_value and sort_value:
+        # Java版保留sort参数
+        java_reminders.append(f"Java版sort={sort_value}保留")
+    return ir
+
+def _split_java_ranges_ir(ir, source, bedrock_reminders):
+    """
+    将原始选择器中的Java版distance、x_rotation、y_rotation、level、limit、sort参数
+    转换为基岩版参数，sort参数会同时改变选择器变量和c参数
+    """
+    limit_value = source.get('limit', _INT_VALUE_RE)
+    sort_value = source.get('sort')
+    range_values = [(rule, source.get(rule['name'])) for rule in get_range_rules()]
+    if not (limit_value or sort_value or any(value for _, value in range_values)):
+        return ir
+
+    for rule, range_value in range_values:
+        if not range_value:
+            continue
+        if _rule_recorders:
+            start = time.perf_counter_ns()
+        # 移除Java版范围参数
+        ir = ir.without(rule['name'])
+        split_params, reminder = _split_java_range(rule, range_value)
+        if not split_params:
+            continue
+        names = [param.name for param in split_params]
+        if all(ir.get(name) for name in names):
+            # 已有对应的基岩版参数，不需要修改
+            continue
+        # 移除已存在的同名参数，避免重复
+        ir = ir.without(*names).appended(*split_params)
+        bedrock_reminders.append(reminder)
+        if _rule_recorders:
+            _rule_fired(f"{rule['name']}->{rule['min']}/{rule['max']}", start, f"{rule['name']}={range_value}")
+
+    # 只有limit参数时转换为c参数（提醒和规则统计已在gamemode转换阶段添加）
+    if limit_value and not sort_value:
+        ir = ir.without('c').without('limit', pattern=_INT_VALUE_RE).appended(SelectorParam('c', limit_value))
+
+    if not sort_value:
+        return ir
+    if _rule_recorders:
+        start = time.perf_counter_ns()
+
+    if sort_value == 'nearest':
+        # sort=nearest时，只有选择器是@a或@p才转换为@p[c=...]，其他选择器直接移除sort=nearest
+        if ir.variable in ['@a', '@p']:
+            c_value = limit_value if limit_value else '9999'
+            ir = ir.without('c', 'sort').without('limit', pattern=_INT_VALUE_RE)
+            ir = ir.replace(variable='@p').appended(SelectorParam('c', c_value))
+            bedrock_reminders.append(f"Java版sort=nearest已转换为基岩版c={c_value}")
+            rule, lossy = 'sort=nearest->@p[c]', False
+        else:
+            ir = ir.without('sort').without('limit', pattern=_INT_VALUE_RE)
+            bedrock_reminders.append("Java版非@p/@a选择器的sort=nearest参数在基岩版中不支持，已移除")
+            rule, lossy = 'sort=nearest->removed', True
+    elif sort_value == 'furthest':
+        c_value = f"-{limit_value if limit_value else '9999'}"
+        ir = ir.without('c', 'sort').without('limit', pattern=_INT_VALUE_RE).appended(SelectorParam('c', c_value))
+        bedrock_reminders.append(f"Java版sort=furthest已转换为基岩版c={c_value}")
+        rule, lossy = 'sort=furthest->c', False
+    elif sort_value == 'arbitrary':
+        # 基岩版不支持sort=arbitrary
+        ir = ir.without('sort')
+        bedrock_reminders.append("Java版sort=arbitrary在基岩版中不支持，已移除")
+        rule, lossy = 'sort=arbitrary->removed', True
+    elif sort_value == 'random':
+        # sort=random时，@a转换为@r并添加c参数，其他选择器保留已转换的c参数
+        if ir.variable == '@a':
+            c_value = limit_value if limit_value else '9999'
+            ir = ir.without('c', 'sort').without('limit', pattern=_INT_VALUE_RE)
+            ir = ir.replace(variable='@r').appended(SelectorParam('c', c_value))
+            bedrock_reminders.append("Java版@a[sort=random]已转换为基岩版@r")
+            rule, lossy = '@a[sort=random]->@r', False
+        else:
+            ir = ir.without('sort')
+            bedrock_reminders.append("Java版sort=random已转换为基岩版c参数")
+            rule, lossy = 'sort=random->c', False
     else:
-        java_json = convert_text_to_java(message, m_n_handling)
-    
-    java_command = f'tellraw {java_selector_filtered} {json.dumps(java_json, ensure_ascii=False)}'
-    
-    # 生成基岩版命令
-    bedrock_json = convert_text_to_bedrock(message, m_n_handling)
-    bedrock_command = f'tellraw {bedrock_selector_filtered} {json.dumps(bedrock_json, ensure_ascii=False)}'
-    
-    return java_command, bedrock_command, was_converted, java_selector if was_converted else None, java_removed_params, bedrock_removed_params, all_java_reminders, all_bedrock_reminders
+        ir = ir.without('sort').without('limit', pattern=_INT_VALUE_RE)
+        bedrock_reminders.append(f"Java版sort={sort_value}被移除")
+        rule, lossy = f'sort={sort_value}->removed', True
+    if _rule_recorders:
+        _rule_fired(rule, start, f'sort={sort_value}', lossy)
+    return ir
 
-def handle_m_n_codes(message):
+# ==================== 阶段计时 ====================
+# 已注册的阶段计时钩子，每个钩子以(阶段名, 耗时纳秒)调用；列表为空时各阶段不计时，
+# 转换过程只多一次列表是否为空的判断
+_stage_hooks = []
+
+# 转换过程中计时的阶段及说明，按执行顺序排列
+CONVERSION_STAGES = {
+    'parse': '解析选择器',
+    'detect': '检测选择器类型',
+    'variable_mapping': '基岩版选择器变量转换为Java版',
+    'gamemode': 'gamemode/m参数转换',
+    'range_rebuild': 'l/lm/r/rm/rx/rxm/ry/rym与范围参数互相转换',
+    'filter': 'filter_selector_parameters过滤参数',
+    'emit': '生成选择器字符串',
+    'selector': '选择器转换合计（包括缓存命中）',
+    'java_text': 'Java版消息解析和序列化',
+    'bedrock_text': '基岩版消息转换',
+    'assemble': 'generate组装命令和提醒列表',
+    'scan': '.mcfunction行的解码、拆分和消息解析',
+    'write': '.mcfunction写入转换后的命令行',
+}
+
+def register_stage_hook(hook):
+    """注册阶段计时钩子，hook(阶段名, 耗时纳秒)在每个阶段结束时调用"""
+    _stage_hooks.append(hook)
+
+def unregister_stage_hook(hook):
+    """取消注册阶段计时钩子"""
+    _stage_hooks.remove(hook)
+
+def _stage_done(stage, start):
+    """通知所有钩子一个阶段的耗时，返回当前时间作为下一阶段的开始时间"""
+    now = time.perf_counter_ns()
+    elapsed = now - start
+    for hook in _stage_hooks:
+        hook(stage, elapsed)
+    return now
+
+class StageTimings:
     """
-    处理§m§n代码，询问用户选择
-    选项1: Java版使用字体方式，基岩版使用颜色代码方式
-    选项2: Java版和基岩版都使用颜色代码方式
-    选项3: 混合模式：每次遇到§m§n都询问
+    按阶段累计调用次数和耗时（纳秒）的钩子，在with块内自动注册：
+        with StageTimings() as timings:
+            ...
+        print(timings.format_report())
+    选择器缓存命中时只记录selector阶段，需要完整的选择器阶段分解时可先configure_selector_cache(0)；
+    selector、java_text、bedrock_text由TellrawConverter.generate和TellrawResult在实际转换时记录
     """
-    if '§m' in message or '§n' in message:
-        print(PROMPTS["prompts"]["m_n_choice"])
-        
-        choice = input("请选择 (1/2/3): ").strip()
-        if choice == '1':
-            # Java版使用字体，基岩版使用颜色代码
-            return message, "font", None
-        elif choice == '2':
-            # 都使用颜色代码
-            return message, "color", None
-        elif choice == '3':
-            # 混合模式
-            return message, "mixed", None
+
+    def __init__(self):
+        # {阶段名: [调用次数, 总耗时纳秒]}
+        self.stages = {}
+
+    def __call__(self, stage, elapsed_ns):
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [1, elapsed_ns]
         else:
-            print("无效选择，默认使用选项1")
-            return message, "font", None
-    
-    return message, "none", None
+            entry[0] += 1
+            entry[1] += elapsed_ns
 
-def get_user_input():
-    """获取用户交互式输入"""
-    print("=== Minecraft Tellraw 生成器 ===")
+    def __enter__(self):
+        register_stage_hook(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        unregister_stage_hook(self)
+
+    def reset(self):
+        """清空已记录的数据"""
+        self.stages.clear()
+
+    def as_dict(self):
+        """返回{阶段名: {"calls": 调用次数, "total_ns": 总耗时, "mean_ns": 平均耗时}}，按CONVERSION_STAGES的顺序排列"""
+        order = {stage: index for index, stage in enumerate(CONVERSION_STAGES)}
+        return {stage: {'calls': calls, 'total_ns': total, 'mean_ns': total // calls}
+                for stage, (calls, total) in sorted(self.stages.items(),
+                                                    key=lambda item: (order.get(item[0], len(order)), item[0]))}
+
+    def format_report(self):
+        """返回各阶段调用次数、总耗时、平均耗时和占比的文本表格"""
+        stages = self.as_dict()
+        # selector阶段包含选择器的各个子阶段，不计入占比的分母
+        total = sum(entry['total_ns'] for stage, entry in stages.items() if stage != 'selector') or 1
+        lines = [f'{"阶段":<18s}{"调用次数":>10s}{"总耗时(毫秒)":>12s}{"平均(微秒)":>10s}{"占比":>8s}']
+        for stage, entry in stages.items():
+            share = '' if stage == 'selector' else f'{entry["total_ns"] / total:.1%}'
+            lines.append(f'{stage:<20s}{entry["calls"]:>12d}{entry["total_ns"] / 1e6:>16.2f}'
+                         f'{entry["mean_ns"] / 1e3:>14.2f}{share:>10s}')
+        return '\n'.join(lines)
+
+
+# ==================== 规则触发统计 ====================
+# 已注册的规则触发记录器，每个记录器以(规则名, 耗时纳秒, 触发的参数文本, 是否有损)调用；
+# 列表为空时各转换分支只多一次列表是否为空的判断
+# 规则名使用“源->目标”的形式，如 hasitem->nbt、gamemode=spectator->m=survival、c<0->limit+sort、
+# family->removed；有损表示转换后无法完全保留原意（值被替换、参数被移除或顺序丢失）
+_rule_recorders = []
+
+# RuleStats为每条规则保留的参数示例数
+RULE_SAMPLE_LIMIT = 3
+
+def register_rule_recorder(recorder):
+    """注册规则触发记录器，recorder(规则名, 耗时纳秒, 参数文本, 是否有损)在每次规则触发时调用"""
+    _rule_recorders.append(recorder)
+
+def unregister_rule_recorder(recorder):
+    """取消注册规则触发记录器"""
+    _rule_recorders.remove(recorder)
+
+def _rule_fired(rule, start, detail, lossy=False):
+    """通知所有记录器一条规则已触发，start为None表示规则只是剔除参数，没有需要计时的转换"""
+    elapsed = 0 if start is None else time.perf_counter_ns() - start
+    for recorder in _rule_recorders:
+        recorder(rule, elapsed, detail, lossy)
+
+class RuleStats:
+    """
+    按规则累计触发次数和耗时（纳秒）的记录器，在with块内自动注册：
+        with RuleStats() as stats:
+            ...
+        stats.save('rules.json')
+    规则只在实际转换选择器时触发，选择器缓存命中的记录不会重复计数；
+    统计语料中每条命令的触发次数时应先configure_selector_cache(0)
+    """
+
+    def __init__(self, sample_limit=RULE_SAMPLE_LIMIT):
+        self.sample_limit = sample_limit
+        # {规则名: [触发次数, 总耗时纳秒, 是否有损, 参数示例列表]}
+        self.rules = {}
+
+    def __call__(self, rule, elapsed_ns, detail, lossy):
+        entry = self.rules.get(rule)
+        if entry is None:
+            self.rules[rule] = [1, elapsed_ns, lossy, [detail] if self.sample_limit else []]
+            return
+        entry[0] += 1
+        entry[1] += elapsed_ns
+        samples = entry[3]
+        if len(samples) < self.sample_limit and detail not in samples:
+            samples.append(detail)
+
+    def __enter__(self):
+        register_rule_recorder(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        unregister_rule_recorder(self)
+
+    def reset(self):
+        """清空已记录的数据"""
+        self.rules.clear()
+
+    def as_dict(self):
+        """
+        返回{"total_fires": 总触发次数, "lossy_fires": 有损触发次数, "rules": {规则名: {...}}}，
+        规则按触发次数从多到少排列，每条规则包括count、total_ns、mean_ns、lossy和samples
+        """
+        rules = {rule: {'count': count, 'total_ns': total, 'mean_ns': total // count,
+                        'lossy': lossy, 'samples': list(samples)}
+                 for rule, (count, total, lossy, samples) in sorted(self.rules.items(),
+                                                                   key=lambda item: (-item[1][0], item[0]))}
+        return {'total_fires': sum(entry['count'] for entry in rules.values()),
+                'lossy_fires': sum(entry['count'] for entry in rules.values() if entry['lossy']),
+                'rules': rules}
+
+    def to_json(self):
+        """as_dict的JSON文本"""
+        return json.dumps(self.as_dict(), ensure_ascii=False, indent=2)
+
+    def save(self, path):
+        """把统计结果写入JSON文件（先写临时文件再替换）"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+            f.write('\n')
+        os.replace(temp_path, path)
+
+
+# ==================== 性能分析 ====================
+# 折叠调用栈中耗时低于该值（微秒）的调用路径不再展开
+PROFILE_MIN_STACK_US = 1
+
+def _iter_code_qualnames(filenames):
+    """
+    逐个产出filenames中已加载模块的所有代码对象及其限定名(代码对象, 限定名)，包括嵌套函数，
+    外层函数先于嵌套函数产出，嵌套函数的限定名带上外层函数名，如 convert_limit_c_parameters.replace_limit_to_c
+    """
+    found = []
+
+    def visit(code, qualname):
+        found.append((code, qualname))
+        for const in code.co_consts:
+            if hasattr(const, 'co_code'):
+                visit(const, f'{qualname}.{const.co_name}')
+
+    def visit_function(value):
+        # 静态方法/类方法、property和lru_cache等包装取出实际的函数
+        value = getattr(value, '__func__', value)
+        value = getattr(value, 'fget', value)
+        value = getattr(value, '__wrapped__', value)
+        code = getattr(value, '__code__', None)
+        if code is not None and code.co_filename in filenames:
+            visit(code, value.__qualname__.replace('.<locals>', ''))
+
+    for module in list(sys.modules.values()):
+        if getattr(module, '__file__', None) not in filenames:
+            continue
+        for value in list(vars(module).values()):
+            if isinstance(value, type):
+                for attr in vars(value).values():
+                    visit_function(attr)
+            else:
+                visit_function(value)
+    return found
+
+def _code_qualnames(filenames):
+    """返回{(文件名, 起始行号, 函数名): 限定名}，用于给pstats中的函数加上外层函数或类名"""
+    return {(code.co_filename, code.co_firstlineno, code.co_name): qualname
+            for code, qualname in _iter_code_qualnames(filenames)}
+
+def _profile_frame_label(func, qualnames):
+    """pstats函数键(文件名, 行号, 函数名)在折叠调用栈中的名称，不含分号"""
+    filename, lineno, name = func
+    if filename == '~':
+        # 内置函数
+        label = name
+    else:
+        label = f'{os.path.basename(filename)}:{qualnames.get(func, name)}'
+    return label.replace(';', ',')
+
+def collapsed_stacks(stats):
+    """
+    把pstats.Stats转换为折叠调用栈文本（每行为“帧;帧;帧 微秒”），可直接交给flamegraph.pl、speedscope等工具
+    cProfile只记录调用者和被调用者之间的耗时，每条调用路径上的自身耗时按调用边的累计耗时比例分摊，
+    被多处调用的函数的路径耗时是估算值；递归调用不再展开
+    """
+    entries = stats.stats
+    qualnames = _code_qualnames({func[0] for func in entries})
+    children = collections.defaultdict(list)
+    roots = []
+    for func, (_, _, _, _, callers) in entries.items():
+        known_callers = [caller for caller in callers if caller in entries]
+        for caller in known_callers:
+            children[caller].append((func, callers[caller][3]))
+        # 跳过runcall结束时停止分析器的调用
+        if not known_callers and func[2] != "<method 'disable' of '_lsprof.Profiler' objects>":
+            roots.append(func)
+    labels = {func: _profile_frame_label(func, qualnames) for func in entries}
+    totals = collections.Counter()
+
+    def walk(func, path, on_path, share):
+        _, _, inline_time, cumulative_time, _ = entries[func]
+        own_us = inline_time * share * 1e6
+        if own_us >= 0.5:
+            totals[';'.join(path)] += own_us
+        for child, edge_time in children[func]:
+            child_cumulative = entries[child][3]
+            if child in on_path or not child_cumulative:
+                continue
+            child_share = share * min(1.0, edge_time / child_cumulative)
+            if child_cumulative * child_share * 1e6 < PROFILE_MIN_STACK_US:
+                continue
+            path.append(labels[child])
+            on_path.add(child)
+            walk(child, path, on_path, child_share)
+            on_path.discard(child)
+            path.pop()
+
+    for root in roots:
+        walk(root, [labels[root]], {root}, 1.0)
+    return ''.join(f'{stack} {round(us)}\n' for stack, us in sorted(totals.items()) if round(us) > 0)
+
+def profile_call(prefix, func, *args, **kwargs):
+    """
+    在cProfile下调用func，结束后（包括抛出异常或sys.exit时）写入
+    prefix.pstats（可用pstats或snakeviz等工具查看）和prefix.folded（折叠调用栈，可生成火焰图）
+    """
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(prefix + '.pstats')
+        with open(prefix + '.folded', 'w', encoding='utf-8') as f:
+            f.write(collapsed_stacks(pstats.Stats(profiler)))
+
+
+# ==================== 内存报告 ====================
+# 内存报告每多少次转换汇总一次
+MEMORY_REPORT_WINDOW = 10000
+# tracemalloc为每个内存块保存的调用栈帧数，用于把标准库（如json）中的分配归到调用它的tellraw.py函数；
+# 记录每一帧都要计算行号，作为脚本运行时模块顶层帧的代码很长，计算很慢，帧数不宜过多
+MEMORY_TRACE_FRAMES = 4
+# 内存报告中列出的函数数
+MEMORY_REPORT_TOP = 15
+# 内存报告中标志一次转换结束的阶段：generate组装结果、.mcfunction写入转换后的命令行
+MEMORY_CONVERSION_STAGES = frozenset(['assemble', 'write'])
+
+class MemoryReport:
+    """
+    用tracemalloc统计转换各阶段和每window次转换的内存占用，作为阶段计时钩子在with块内注册：
+        with MemoryReport() as report:
+            ...
+        print(report.format_report())
+    每次阶段通知时读取tracemalloc的当前内存和峰值，与上一次通知之间的变化计入该阶段：
+    保留为阶段结束时比开始时多占用的字节数（如放入缓存的结果），峰值为阶段内最多比开始时多占用的字节数。
+    selector阶段只包括parse到emit子阶段之外的部分，缓存命中时为整个选择器转换；
+    调用者在两次转换之间分配或释放的内存（如丢弃上一条结果）计入下一次转换的第一个阶段。
+    MEMORY_CONVERSION_STAGES中的阶段各计为一次转换（批量接口的每条记录、.mcfunction中每条转换后的命令），
+    每个统计窗口结束时和退出时拍快照，按调用栈中最内层的tellraw.py函数汇总仍占用的内存。
+    tracemalloc会使转换慢数倍，只用于分析
+    """
+
+    def __init__(self, window=MEMORY_REPORT_WINDOW, frames=MEMORY_TRACE_FRAMES):
+        self.window = window
+        self.frames = frames
+        # {阶段名: [次数, 保留字节合计, 最大峰值]}
+        self.stages = {}
+        # [(累计转换次数, 窗口内峰值, 窗口内保留字节)]，峰值和保留都相对于窗口开始时
+        self.windows = []
+        # {函数: 结束时占用的字节数}、{函数: 所有快照中的最大占用}
+        self.sites = {}
+        self.max_sites = {}
+        self.conversions = 0
+        self.start_bytes = 0
+        self.end_bytes = 0
+        self.peak_bytes = 0
+        self._tracemalloc = None
+        self._started = False
+        self._line_functions = None
+
+    def __enter__(self):
+        import dis
+        import tracemalloc
+        self._tracemalloc = tracemalloc
+        # 行号到函数的映射在开始跟踪之前建立，不计入报告；嵌套函数在外层函数之后产出，覆盖外层函数中的同一行
+        self._line_functions = {(code.co_filename, line): qualname
+                                for code, qualname in _iter_code_qualnames({__file__})
+                                for _, line in dis.findlinestarts(code)}
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start(self.frames)
+        self.start_bytes = self._last = self._window_start = self._window_peak = self.peak_bytes = \
+            tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        register_stage_hook(self)
+        return self
+
+    def __call__(self, stage, elapsed_ns):
+        current, peak = self._tracemalloc.get_traced_memory()
+        self._tracemalloc.reset_peak()
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = self.stages[stage] = [0, 0, 0]
+        entry[0] += 1
+        entry[1] += current - self._last
+        entry[2] = max(entry[2], peak - self._last)
+        self._last = current
+        if peak > self._window_peak:
+            self._window_peak = peak
+        if stage in MEMORY_CONVERSION_STAGES:
+            self.conversions += 1
+            if self.conversions % self.window == 0:
+                self._close_window(current)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        unregister_stage_hook(self)
+        current, peak = self._tracemalloc.get_traced_memory()
+        self._window_peak = max(self._window_peak, peak)
+        if self.conversions % self.window:
+            self._close_window(current)
+        self.end_bytes = current
+        self.sites = dict(self._snapshot_sites().most_common())
+        if self._started:
+            self._tracemalloc.stop()
+
+    def _close_window(self, current):
+        """结束一个统计窗口：记录窗口内的峰值和保留字节，并按函数汇总当前占用"""
+        self.windows.append((self.conversions, self._window_peak - self._window_start,
+                             current - self._window_start))
+        self.peak_bytes = max(self.peak_bytes, self._window_peak)
+        self._snapshot_sites()
+        # 快照本身也会分配内存，从快照之后开始下一个窗口
+        self._last = self._window_start = self._window_peak = self._tracemalloc.get_traced_memory()[0]
+        self._tracemalloc.reset_peak()
+
+    def _snapshot_sites(self):
+        """拍快照并按调用栈中最内层的tellraw.py函数汇总占用的字节数，同时更新max_sites"""
+        snapshot = self._tracemalloc.take_snapshot()
+        line_functions = self._line_functions
+        sites = collections.Counter()
+        for trace in snapshot.traces:
+            function = '其他（调用栈中没有tellraw.py函数）'
+            # 调用栈从最早的帧排到最近的帧
+            for frame in reversed(trace.traceback):
+                qualname = line_functions.get((frame.filename, frame.lineno))
+                if qualname is not None:
+                    function = qualname
+                    break
+            if function.startswith('MemoryReport.'):
+                # 报告自己记录的数据
+                continue
+            sites[function] += trace.size
+        del snapshot
+        for function, size in sites.items():
+            if size > self.max_sites.get(function, 0):
+                self.max_sites[function] = size
+        return sites
+
+    def as_dict(self):
+        """返回报告数据，字节数都相对于进入with块时的占用（sites和max_sites除外）"""
+        return {
+            'conversions': self.conversions,
+            'start_bytes': self.start_bytes,
+            'end_bytes': self.end_bytes,
+            'peak_bytes': self.peak_bytes,
+            'stages': {stage: {'calls': calls, 'retained_bytes': retained, 'max_peak_bytes': peak}
+                       for stage, (calls, retained, peak) in self.stages.items()},
+            'windows': [{'conversions': conversions, 'peak_bytes': peak, 'retained_bytes': retained}
+                        for conversions, peak, retained in self.windows],
+            'sites': dict(self.sites),
+            'max_sites': dict(sorted(self.max_sites.items(), key=lambda item: -item[1])),
+        }
+
+    def format_report(self, top=MEMORY_REPORT_TOP):
+        """返回文本报告：总体占用、各阶段、每个统计窗口和占用最多的tellraw.py函数"""
+        mib = 1024 * 1024
+        lines = [f'转换次数: {self.conversions}  开始 {self.start_bytes / mib:.1f} MiB  '
+                 f'结束 {self.end_bytes / mib:.1f} MiB  峰值 {self.peak_bytes / mib:.1f} MiB',
+                 '',
+                 '各阶段（保留=阶段结束时比开始时多占用的字节，峰值=阶段内最多多占用的字节）:',
+                 f'{"阶段":<18s}{"次数":>10s}{"保留合计(KiB)":>12s}{"平均保留(B)":>10s}{"最大峰值(KiB)":>12s}']
+        order = {stage: index for index, stage in enumerate(CONVERSION_STAGES)}
+        for stage, (calls, retained, peak) in sorted(self.stages.items(),
+                                                       key=lambda item: (order.get(item[0], len(order)), item[0])):
+            lines.append(f'{stage:<20s}{calls:>12d}{retained / 1024:>16.1f}{retained / calls:>14.1f}'
+                         f'{peak / 1024:>16.1f}')
+        lines += ['', f'每{self.window}次转换:',
+                  f'{"累计转换次数":>12s}{"峰值(KiB)":>13s}{"保留(KiB)":>13s}']
+        for conversions, peak, retained in self.windows:
+            lines.append(f'{conversions:>18d}{peak / 1024:>15.1f}{retained / 1024:>15.1f}')
+        lines += ['', '占用内存最多的tellraw.py函数（按调用栈中最内层的tellraw.py函数汇总）:',
+                  f'{"结束时(KiB)":>13s}{"快照中最大(KiB)":>15s}  函数']
+        for function, size in sorted(self.max_sites.items(), key=lambda item: -item[1])[:top]:
+            lines.append(f'{self.sites.get(function, 0) / 1024:>16.1f}{size / 1024:>20.1f}  {function}')
+        return '\n'.join(lines)
+
+
+# 选择器转换结果LRU缓存的默认大小
+SELECTOR_CACHE_SIZE = 1024
+
+def convert_selector(selector):
+    """
+    转换目标选择器，返回(Java版选择器, 基岩版选择器, 是否转换了选择器变量, 转换后的Java版选择器,
+    Java版过滤提醒, 基岩版过滤提醒, Java版提醒, 基岩版提醒)，提醒均为元组
+    结果按选择器字符串缓存在有界LRU缓存中，相同的选择器只转换一次
+    """
+    return _cached_convert_selector(selector)
+
+def _convert_selector_uncached(selector):
+    """convert_selector的实际转换过程，不使用缓存；注册了阶段计时钩子时记录各阶段耗时"""
+    timed = bool(_stage_hooks)
+    if timed:
+        start = time.perf_counter_ns()
+    # 选择器只解析一次，后续各阶段都在同一个IR上进行转换
+    source = parse_selector(selector)
+    if timed:
+        start = _stage_done('parse', start)
+
+    # 检测选择器类型
+    selector_type = detect_selector_type(source)
+    if timed:
+        start = _stage_done('detect', start)
+
+    # 将基岩版选择器转换为Java版（如果需要）
+    java_ir, was_converted, java_selector_reminders = _bedrock_selector_to_java_ir(source)
+    if timed:
+        start = _stage_done('variable_mapping', start)
+
+    # 转换gamemode/m参数并收集提醒
+    java_to_bedrock_ir, java_gamemode_reminders = _java_params_to_bedrock_ir(java_ir)
+    bedrock_to_java_ir, bedrock_gamemode_reminders = _bedrock_params_to_java_ir(source)
+    if timed:
+        start = _stage_done('gamemode', start)
+
+    # 检测出的版本直接套用原始格式，另一个版本使用转换后的结果
+    java_reminders = []
+    bedrock_reminders = []
+    if selector_type == 'bedrock':
+        bedrock_final = source
+        if was_converted:
+            # 选择器变量已被转换，还需要把基岩版范围参数转换为Java版
+            java_final = java_ir
+            if java_final.bracketed:
+                java_final = _merge_bedrock_ranges_ir(java_final, source, java_reminders)
+        else:
+            java_final = bedrock_to_java_ir
+    else:
+        java_final = java_ir
+        bedrock_final = java_to_bedrock_ir
+
+    # 处理Java版特有参数到基岩版参数的转换
+    if bedrock_final.bracketed:
+        bedrock_final = _split_java_ranges_ir(bedrock_final, source, bedrock_reminders)
+    if timed:
+        start = _stage_done('range_rebuild', start)
+
+    # 过滤参数，移除另一版本特有的参数（完全不支持）
+    java_selector_filtered, java_removed_params = _filter_selector_parameters_ir(java_final, 'java')
+    bedrock_selector_filtered, bedrock_removed_params = _filter_selector_parameters_ir(bedrock_final, 'bedrock')
+    if timed:
+        start = _stage_done('filter', start)
+    java_selector_filtered = java_selector_filtered.emit()
+    bedrock_selector_filtered = bedrock_selector_filtered.emit()
+    converted_selector = java_ir.emit() if was_converted else None
+    if timed:
+        _stage_done('emit', start)
+
+    # 合并所有提醒信息
+    all_java_reminders = java_gamemode_reminders + java_reminders + java_selector_reminders
+    all_bedrock_reminders = bedrock_gamemode_reminders + bedrock_reminders
+
+    # 结果会被缓存共享，提醒使用不可变的元组
+    return (java_selector_filtered, bedrock_selector_filtered, was_converted,
+            converted_selector, tuple(java_removed_params), tuple(bedrock_removed_params),
+            tuple(all_java_reminders), tuple(all_bedrock_reminders))
+
+_cached_convert_selector = functools.lru_cache(maxsize=SELECTOR_CACHE_SIZE)(_convert_selector_uncached)
+
+def configure_selector_cache(maxsize=SELECTOR_CACHE_SIZE):
+    """重新设置选择器缓存大小（None表示不限制，0表示不缓存），原有缓存内容会被清空"""
+    global _cached_convert_selector
+    _cached_convert_selector = functools.lru_cache(maxsize=maxsize)(_convert_selector_uncached)
+
+def selector_cache_info():
+    """返回选择器缓存的命中、未命中次数和当前大小（functools的CacheInfo）"""
+    return _cached_convert_selector.cache_info()
+
+def clear_selector_cache():
+    """清空选择器缓存及其统计信息"""
+    _cached_convert_selector.cache_clear()
+
+def _mixed_m_n_callback(code):
+    """混合模式下询问用户§m/§n代码的处理方式"""
+    code_name = "§m(删除线)" if code == '§m' else "§n(下划线)"
+    print(get_prompts()["prompts"]["m_n_mixed_choice"].format(code_name))
+    choice = input("请选择 (1/2): ").strip()
+    if choice == '1':
+        return "font"
+    elif choice == '2':
+        return "color"
+    else:
+        print("无效选择，默认使用字体方式")
+        return "font"
+
+# 混合模式下§m/§n代码可选的处理方式
+M_N_DECISIONS = ('font', 'color')
+
+def normalize_m_n_decisions(decisions):
+    """
+    规范化§m/§n决策表，返回{出现位置或代码: 处理方式}，decisions为None时返回None
+    列表按出现顺序（从0开始）给出每个§m/§n的处理方式，None表示不指定；
+    字典的键可以是出现位置（整数或数字字符串）或代码（§m、§n、m、n），值为font或color。
+    格式无效时抛出ValueError
+    """
+    if decisions is None:
+        return None
+    if isinstance(decisions, (list, tuple)):
+        decisions = {index: choice for index, choice in enumerate(decisions) if choice is not None}
+    elif not isinstance(decisions, dict):
+        raise ValueError("m_n_decisions必须是列表或对象")
+    normalized = {}
+    for key, choice in decisions.items():
+        if choice not in M_N_DECISIONS:
+            raise ValueError(f"§m/§n的处理方式只能是font或color: {choice!r}")
+        if isinstance(key, int) and not isinstance(key, bool) and key >= 0:
+            normalized[key] = choice
+        elif isinstance(key, str) and key.isdigit():
+            normalized[int(key)] = choice
+        elif key in ('m', 'n', '§m', '§n'):
+            normalized['§' + key[-1]] = choice
+        else:
+            raise ValueError(f"无效的§m/§n决策键: {key!r}")
+    return normalized
+
+class MNDecisionPolicy:
+    """
+    混合模式下§m/§n代码的决策策略，不需要交互也能确定每个§m/§n的处理方式
+      defaults   每个代码的默认处理方式，如{"§m": "font", "§n": "color"}
+      recorded   已记录的决策{消息: [按出现顺序的处理方式]}，相同消息按记录重放
+      fallback   以上都没有给出时调用的函数（如交互询问），参数为代码，返回font或color；
+                 为None时使用font，不会阻塞
+      record     是否把每条消息实际使用的决策写入recorded，供save保存后重放
+    决策优先级：单条请求的位置决策 > 单条请求的代码决策 > 已记录的决策 > defaults > fallback
+    """
+
+    def __init__(self, defaults=None, recorded=None, fallback=None, record=True):
+        self.defaults = normalize_m_n_decisions(defaults) or {}
+        if any(not isinstance(key, str) for key in self.defaults):
+            raise ValueError("defaults只能按代码（§m、§n）指定处理方式")
+        self.recorded = {} if recorded is None else recorded
+        self.fallback = fallback
+        self.record = record
+
+    def callback_for(self, message, decisions=None):
+        """
+        返回转换message时使用的m_n_callback，decisions为normalize_m_n_decisions的结果，
+        只作用于这一次转换
+        """
+        previous = self.recorded.get(message, ())
+        made = []
+
+        def decide(code):
+            index = len(made)
+            choice = None
+            if decisions:
+                choice = decisions.get(index) or decisions.get(code)
+            if choice is None and index < len(previous):
+                choice = previous[index]
+            if choice is None:
+                choice = self.defaults.get(code)
+            if choice is None and self.fallback is not None:
+                choice = self.fallback(code)
+            choice = 'color' if choice == 'color' else 'font'
+            made.append(choice)
+            if self.record and index == 0:
+                self.recorded[message] = made
+            return choice
+
+        return decide
+
+    @classmethod
+    def load(cls, path, defaults=None, fallback=None, record=True):
+        """从JSON文件读取已记录的决策，文件不存在时从空记录开始"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        recorded = data.get('decisions') if isinstance(data, dict) else None
+        if not isinstance(recorded, dict) or not all(
+                isinstance(choices, list) and all(choice in M_N_DECISIONS for choice in choices)
+                for choices in recorded.values()):
+            if data:
+                raise ValueError(f"无效的§m/§n决策文件: {path}")
+            recorded = {}
+        return cls(defaults, recorded, fallback, record)
+
+    def save(self, path):
+        """把已记录的决策写入JSON文件（先写临时文件再替换，中断时不会留下半个文件）"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'decisions': self.recorded}, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        os.replace(temp_path, path)
+
+def _java_message_text(message, m_n_handling, m_n_callback=_mixed_m_n_callback, compact=False):
+    """
+    转换消息文本为Java版JSON文本，混合模式下用m_n_callback逐个询问§m/§n代码的处理方式
+    compact为True时使用紧凑分隔符
+    """
+    if m_n_handling == "mixed":
+        return java_text_json(message, m_n_handling, m_n_callback, compact)
+    return java_text_json(message, m_n_handling, None, compact)
+
+def _bedrock_message_text(message, m_n_handling):
+    """转换消息文本为基岩版JSON文本"""
+    return json.dumps(convert_text_to_bedrock(message, m_n_handling), ensure_ascii=False)
+
+def convert_message(message, m_n_handling="none"):
+    """转换消息文本，返回(Java版JSON文本, 基岩版JSON文本)"""
+    return _java_message_text(message, m_n_handling), _bedrock_message_text(message, m_n_handling)
+
+
+class TellrawResult:
+    """
+    一条tellraw命令的转换结果，由TellrawConverter.convert返回
+    选择器、Java版消息和基岩版消息在第一次访问相关属性时才转换，只需要一个版本的命令时
+    不会转换另一个版本的消息；提醒为元组，多个结果之间可以共享
+    """
+    __slots__ = ('_converter', 'selector', 'message', 'm_n_handling', 'm_n_decisions',
+                 '_selector_result', '_java_text', '_bedrock_text')
+
+    def __init__(self, converter, selector, message, m_n_handling, m_n_decisions=None):
+        self._converter = converter
+        self.selector = selector
+        self.message = message
+        self.m_n_handling = m_n_handling
+        self.m_n_decisions = m_n_decisions
+        self._selector_result = None
+        self._java_text = None
+        self._bedrock_text = None
+
+    def _selector_part(self, index):
+        if self._selector_result is None:
+            if _stage_hooks:
+                start = time.perf_counter_ns()
+                self._selector_result = self._converter.convert_selector(self.selector)
+                _stage_done('selector', start)
+            else:
+                self._selector_result = self._converter.convert_selector(self.selector)
+        return self._selector_result[index]
+
+    @property
+    def java_text(self):
+        """Java版JSON文本"""
+        if self._java_text is None:
+            if _stage_hooks:
+                start = time.perf_counter_ns()
+                self._java_text = self._converter.java_text(self.message, self.m_n_handling, self.m_n_decisions)
+                _stage_done('java_text', start)
+            else:
+                self._java_text = self._converter.java_text(self.message, self.m_n_handling, self.m_n_decisions)
+        return self._java_text
+
+    @property
+    def bedrock_text(self):
+        """基岩版JSON文本"""
+        if self._bedrock_text is None:
+            if _stage_hooks:
+                start = time.perf_counter_ns()
+                self._bedrock_text = self._converter.bedrock_text(self.message, self.m_n_handling)
+                _stage_done('bedrock_text', start)
+            else:
+                self._bedrock_text = self._converter.bedrock_text(self.message, self.m_n_handling)
+        return self._bedrock_text
+
+    @property
+    def java_selector(self):
+        return self._selector_part(0)
+
+    @property
+    def bedrock_selector(self):
+        return self._selector_part(1)
+
+    @property
+    def java_command(self):
+        return f'tellraw {self._selector_part(0)} {self.java_text}'
+
+    @property
+    def bedrock_command(self):
+        return f'tellraw {self._selector_part(1)} {self.bedrock_text}'
+
+    @property
+    def was_converted(self):
+        """选择器变量是否从基岩版转换为了Java版"""
+        return self._selector_part(2)
+
+    @property
+    def converted_selector(self):
+        """选择器变量转换后的Java版选择器，没有转换时为None"""
+        return self._selector_part(3)
+
+    @property
+    def java_removed_params(self):
+        return self._selector_part(4)
+
+    @property
+    def bedrock_removed_params(self):
+        return self._selector_part(5)
+
+    @property
+    def java_reminders(self):
+        return self._selector_part(6)
+
+    @property
+    def bedrock_reminders(self):
+        return self._selector_part(7)
+
+    def command(self, target_version):
+        """返回目标版本（java或bedrock）的命令"""
+        return self.java_command if target_version == 'java' else self.bedrock_command
+
+    def as_tuple(self):
+        """
+        返回与generate_tellraw_commands相同的元组，由已缓存的选择器结果和消息文本组成，
+        不会重新转换；移除的参数和提醒为新建的列表
+        """
+        self._selector_part(0)
+        (java_selector, bedrock_selector, was_converted, converted_selector, java_removed_params,
+         bedrock_removed_params, java_reminders, bedrock_reminders) = self._selector_result
+        return (f'tellraw {java_selector} {self.java_text}', f'tellraw {bedrock_selector} {self.bedrock_text}',
+                was_converted, converted_selector, list(java_removed_params), list(bedrock_removed_params),
+                list(java_reminders), list(bedrock_reminders))
+
+    def __repr__(self):
+        return f'TellrawResult({self.selector!r}, {self.message!r}, {self.m_n_handling!r})'
+
+
+# 磁盘缓存默认最多保留的条目数，超出后删除最久未使用的条目
+DISK_CACHE_MAX_ENTRIES = 200000
+# 磁盘缓存在内存中积累多少条新结果后写入一次
+DISK_CACHE_FLUSH_SIZE = 512
+# 超出条目上限时删除到上限的这个比例，避免每次写入都触发删除
+DISK_CACHE_EVICT_RATIO = 0.9
+# 等待其他进程释放数据库锁的最长秒数
+DISK_CACHE_TIMEOUT = 30.0
+
+class DiskCache:
+    """
+    保存在sqlite3数据库文件中的转换结果缓存，新进程可以直接复用之前的转换结果
+    键由tool_fingerprint()（tellraw.py的版本）和(选择器, 消息, m_n_handling)组成，规则改变后
+    旧条目不会再被命中，并随淘汰删除。值为generate_tellraw_commands的结果，同时包含两个版本的命令。
+    条目数超过max_entries时按最近使用时间淘汰。数据库使用WAL模式，多个进程可以同时读写同一个文件；
+    每个进程（包括fork出的工作进程）使用自己的连接，对象可以被pickle后传给工作进程，
+    但同一个对象不能在多个线程中同时使用。父进程持有同一文件的连接时fork出的子进程再访问它会
+    破坏sqlite的文件锁，创建工作进程前应先调用close（generate_tellraw_commands_parallel会自动关闭）。
+    新结果和命中记录先积累在内存中，每DISK_CACHE_FLUSH_SIZE条、调用flush或close以及进程退出时写入
+    """
+
+    def __init__(self, path, max_entries=DISK_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._prefix = None
+        self._connection = None
+        self._pid = None
+        self._pending = {}
+        self._used = set()
+
+    def __getstate__(self):
+        return {'path': self.path, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_entries'])
+
+    def _connect(self):
+        """返回当前进程的数据库连接，第一次使用时创建数据表"""
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        # 只有使用磁盘缓存时才需要sqlite3和atexit
+        import atexit
+        import sqlite3
+        self._pending = {}
+        self._used = set()
+        connection = sqlite3.connect(self.path, timeout=DISK_CACHE_TIMEOUT, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS conversions '
+                           '(key TEXT PRIMARY KEY, value TEXT NOT NULL, used INTEGER NOT NULL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS conversions_used ON conversions (used)')
+        self._connection = connection
+        self._pid = os.getpid()
+        self._prefix = tool_fingerprint()[:16] + '\n'
+        atexit.register(self.flush)
+        return connection
+
+    def _key(self, selector, message, m_n_handling, compact):
+        return self._prefix + json.dumps([selector, message, m_n_handling, compact], ensure_ascii=False)
+
+    def get(self, selector, message, m_n_handling, compact=False):
+        """返回缓存的generate_tellraw_commands结果，没有命中时返回None，compact为Java版JSON文本是否紧凑"""
+        connection = self._connect()
+        key = self._key(selector, message, m_n_handling, compact)
+        value = self._pending.get(key)
+        if value is None:
+            row = connection.execute('SELECT value FROM conversions WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            value = row[0]
+            self._used.add(key)
+            if len(self._used) >= DISK_CACHE_FLUSH_SIZE:
+                self.flush()
+        return tuple(json.loads(value))
+
+    def put(self, selector, message, m_n_handling, result, compact=False):
+        """保存一条generate_tellraw_commands结果"""
+        self._connect()
+        self._pending[self._key(selector, message, m_n_handling, compact)] = json.dumps(result, ensure_ascii=False)
+        if len(self._pending) >= DISK_CACHE_FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """把内存中积累的新结果和命中记录写入数据库，条目数超出上限时淘汰最久未使用的条目"""
+        if self._connection is None or self._pid != os.getpid() or not (self._pending or self._used):
+            return
+        now = time.time_ns()
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('UPDATE conversions SET used = ? WHERE key = ?',
+                                   [(now, key) for key in self._used])
+            connection.executemany('INSERT OR REPLACE INTO conversions (key, value, used) VALUES (?, ?, ?)',
+                                   [(key, value, now) for key, value in self._pending.items()])
+            if self._pending:
+                count = connection.execute('SELECT COUNT(*) FROM conversions').fetchone()[0]
+                if count > self.max_entries:
+                    connection.execute('DELETE FROM conversions WHERE key IN '
+                                       '(SELECT key FROM conversions ORDER BY used LIMIT ?)',
+                                       (count - int(self.max_entries * DISK_CACHE_EVICT_RATIO),))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._pending.clear()
+        self._used.clear()
+
+    def clear(self):
+        """删除所有缓存条目"""
+        connection = self._connect()
+        self._pending.clear()
+        self._used.clear()
+        connection.execute('DELETE FROM conversions')
+
+    def close(self):
+        """写入积累的结果并关闭连接"""
+        self.flush()
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+# 批量生成时消息缓存最多保留的条目数，超出后清空重新缓存
+BATCH_CACHE_SIZE = 4096
+
+class TellrawConverter:
+    """
+    可复用的tellraw命令转换器，保存默认的§m/§n处理方式和转换缓存
+      m_n_handling         默认的§m/§n处理方式
+      selector_cache_size  选择器缓存大小，None表示使用模块共享的convert_selector缓存
+      message_cache_size   每个版本的消息缓存条目数，超出后清空重新缓存，0表示不缓存
+      m_n_callback         混合模式下询问§m/§n代码处理方式的函数
+      m_n_policy           混合模式下的MNDecisionPolicy，None表示没有其他决策来源时调用m_n_callback，
+                           且不记录决策
+      disk_cache           DiskCache，generate先查询磁盘缓存，没有命中时转换并写入；混合模式不使用
+      compact_json         Java版JSON文本是否使用紧凑分隔符（不含空格），默认与json.dumps相同
+    """
+
+    def __init__(self, m_n_handling="none", selector_cache_size=None, message_cache_size=BATCH_CACHE_SIZE,
+                 m_n_callback=_mixed_m_n_callback, m_n_policy=None, disk_cache=None, compact_json=False):
+        self.m_n_handling = m_n_handling
+        self.disk_cache = disk_cache
+        self.compact_json = compact_json
+        self.message_cache_size = message_cache_size
+        self.m_n_callback = m_n_callback
+        if m_n_policy is None:
+            m_n_policy = MNDecisionPolicy(fallback=m_n_callback, record=False)
+        self.m_n_policy = m_n_policy
+        if selector_cache_size is None:
+            self.convert_selector = convert_selector
+        else:
+            self.convert_selector = functools.lru_cache(maxsize=selector_cache_size)(_convert_selector_uncached)
+        self._java_texts = {}
+        self._bedrock_texts = {}
+
+    def _store(self, cache, key, text):
+        """把转换结果放入消息缓存，缓存已满时先清空"""
+        if self.message_cache_size:
+            if len(cache) >= self.message_cache_size:
+                cache.clear()
+            cache[key] = text
+
+    def java_text(self, message, m_n_handling=None, m_n_decisions=None):
+        """
+        Java版JSON文本，混合模式下由m_n_policy逐个决定§m/§n代码的处理方式，不使用缓存
+        m_n_decisions为normalize_m_n_decisions的结果，只作用于这条消息
+        """
+        key = (message, m_n_handling or self.m_n_handling)
+        text = self._java_texts.get(key)
+        if text is None:
+            if key[1] == "mixed":
+                return _java_message_text(message, "mixed", self.m_n_policy.callback_for(message, m_n_decisions),
+                                          self.compact_json)
+            text = _java_message_text(message, key[1], None, self.compact_json)
+            self._store(self._java_texts, key, text)
+        return text
+
+    def bedrock_text(self, message, m_n_handling=None):
+        """基岩版JSON文本"""
+        key = (message, m_n_handling or self.m_n_handling)
+        text = self._bedrock_texts.get(key)
+        if text is None:
+            text = _bedrock_message_text(*key)
+            self._store(self._bedrock_texts, key, text)
+        return text
+
+    def convert(self, selector, message, m_n_handling=None, m_n_decisions=None):
+        """
+        返回一条命令的TellrawResult，m_n_handling为None时使用转换器的默认值，
+        m_n_decisions为混合模式下这条消息的§m/§n决策表（见normalize_m_n_decisions）
+        """
+        return TellrawResult(self, selector, message, m_n_handling or self.m_n_handling,
+                             normalize_m_n_decisions(m_n_decisions))
+
+    def generate(self, selector, message, m_n_handling=None, m_n_decisions=None):
+        """立即转换全部内容，返回与generate_tellraw_commands相同的元组，提醒为新建的列表"""
+        m_n_handling = m_n_handling or self.m_n_handling
+        disk_cache = self.disk_cache if m_n_handling != "mixed" else None
+        if disk_cache is not None:
+            result = disk_cache.get(selector, message, m_n_handling, self.compact_json)
+            if result is not None:
+                return result
+        if m_n_decisions is not None:
+            m_n_decisions = normalize_m_n_decisions(m_n_decisions)
+        timed = bool(_stage_hooks)
+        if timed:
+            start = time.perf_counter_ns()
+            selector_result = self.convert_selector(selector)
+            start = _stage_done('selector', start)
+            java_text = self.java_text(message, m_n_handling, m_n_decisions)
+            start = _stage_done('java_text', start)
+            bedrock_text = self.bedrock_text(message, m_n_handling)
+            start = _stage_done('bedrock_text', start)
+        else:
+            selector_result = self.convert_selector(selector)
+            java_text = self.java_text(message, m_n_handling, m_n_decisions)
+            bedrock_text = self.bedrock_text(message, m_n_handling)
+        (java_selector, bedrock_selector, was_converted, converted_selector, java_removed_params,
+         bedrock_removed_params, java_reminders, bedrock_reminders) = selector_result
+        result = (f'tellraw {java_selector} {java_text}', f'tellraw {bedrock_selector} {bedrock_text}',
+                  was_converted, converted_selector, list(java_removed_params), list(bedrock_removed_params),
+                  list(java_reminders), list(bedrock_reminders))
+        if timed:
+            _stage_done('assemble', start)
+        if disk_cache is not None:
+            disk_cache.put(selector, message, m_n_handling, result, self.compact_json)
+        return result
+
+    def convert_many(self, records):
+        """
+        批量转换，records为(选择器, 消息)、(选择器, 消息, m_n_handling)或
+        (选择器, 消息, m_n_handling, m_n_decisions)的可迭代对象，按输入顺序逐条产出TellrawResult
+        """
+        default = self.m_n_handling
+        for record in records:
+            if len(record) == 2:
+                yield TellrawResult(self, record[0], record[1], default)
+            else:
+                yield self.convert(*record)
+
+    def clear_caches(self):
+        """清空消息缓存和转换器自己的选择器缓存"""
+        self._java_texts.clear()
+        self._bedrock_texts.clear()
+        if self.convert_selector is not convert_selector:
+            self.convert_selector.cache_clear()
+
+
+# generate_tellraw_commands使用的转换器，不缓存消息
+_default_converter = TellrawConverter(message_cache_size=0)
+
+def generate_tellraw_commands(selector, message, m_n_handling="none", m_n_policy=None, m_n_decisions=None):
+    """
+    生成Java版和基岩版的tellraw命令
+    混合模式下§m/§n代码依次按m_n_decisions（这条消息的决策表）和m_n_policy（MNDecisionPolicy）决定
+    处理方式，都没有给出时询问用户
+    """
+    if m_n_policy is not None:
+        return TellrawConverter(message_cache_size=0, m_n_policy=m_n_policy,
+                                disk_cache=_default_converter.disk_cache).generate(
+            selector, message, m_n_handling, m_n_decisions)
+    return _default_converter.generate(selector, message, m_n_handling, m_n_decisions)
+
+def set_disk_cache(disk_cache):
+    """设置generate_tellraw_commands使用的DiskCache，None表示不使用磁盘缓存，返回之前的设置"""
+    previous = _default_converter.disk_cache
+    _default_converter.disk_cache = disk_cache
+    return previous
+
+def generate_tellraw_commands_many(records, m_n_handling="none", m_n_policy=None, disk_cache=None):
+    """
+    批量生成tellraw命令
+    records为(选择器, 消息)、(选择器, 消息, m_n_handling)或(选择器, 消息, m_n_handling, m_n_decisions)
+    的可迭代对象，按输入顺序逐条产出与generate_tellraw_commands相同的结果。
+    批处理流水线中使用混合模式时应传入不带fallback的m_n_policy，避免等待用户输入。
+    选择器转换结果由convert_selector的LRU缓存复用，同一批次内相同消息的转换结果也会被复用；
+    结果逐条生成，不会一次性占用全部内存。只需要部分结果时可直接使用TellrawConverter。
+    传入disk_cache（DiskCache）时先查询磁盘缓存，批量结束时写入新的结果
+    """
+    generate = TellrawConverter(m_n_handling, m_n_policy=m_n_policy, disk_cache=disk_cache).generate
+    try:
+        for record in records:
+            yield generate(*record)
+    finally:
+        if disk_cache is not None:
+            disk_cache.flush()
+
+
+# ==================== 多进程批量生成 ====================
+# 每个任务块的默认记录数，块越大进程间通信的开销占比越小，单个块的结果占用的内存越多
+PARALLEL_CHUNK_SIZE = 2000
+# 每个工作进程最多排队的任务块数，限制已读入但尚未输出的记录数
+PARALLEL_CHUNKS_PER_JOB = 2
+# 工作进程异常退出后重建进程池的最多次数，超出后剩余的任务块在当前进程中转换
+PARALLEL_MAX_RESTARTS = 2
+
+def _generate_chunk(chunk, m_n_handling, m_n_policy, disk_cache):
+    """转换一个任务块（在工作进程中执行），返回结果列表"""
+    return list(generate_tellraw_commands_many(chunk, m_n_handling, m_n_policy, disk_cache))
+
+def generate_tellraw_commands_parallel(records, m_n_handling="none", jobs=None, chunk_size=PARALLEL_CHUNK_SIZE,
+                                       m_n_policy=None, disk_cache=None):
+    """
+    用多个工作进程批量生成tellraw命令，按输入顺序逐条产出与generate_tellraw_commands_many相同的结果
+    records为任意可迭代对象，按chunk_size条一块分批读取，同时最多有jobs * PARALLEL_CHUNKS_PER_JOB
+    个任务块在排队或转换，内存占用与记录总数无关。jobs默认为CPU核心数，为1时在当前进程中转换。
+    工作进程无法询问用户，混合模式下m_n_policy为None时使用不带fallback的MNDecisionPolicy，
+    传入的m_n_policy及其fallback必须可以被pickle，决策记录不会传回当前进程。
+    某条记录转换出错时，先输出它之前的全部结果，再抛出与逐条转换相同的异常；
+    工作进程异常退出（如被系统终止）时重建进程池并重新提交未完成的任务块，
+    重建PARALLEL_MAX_RESTARTS次后仍失败则在当前进程中完成剩余的转换。
+    disk_cache（DiskCache）会传给每个工作进程，各自打开连接读写同一个缓存文件
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if chunk_size < 1:
+        raise ValueError("chunk_size必须大于0")
+    if m_n_policy is None:
+        m_n_policy = MNDecisionPolicy(record=False)
+    if jobs <= 1:
+        yield from generate_tellraw_commands_many(records, m_n_handling, m_n_policy, disk_cache)
+        return
+
+    # 只有多进程转换需要concurrent.futures（会导入logging等模块），避免拖慢启动
+    import concurrent.futures
+    iterator = iter(records)
+    chunks = iter(lambda: list(itertools.islice(iterator, chunk_size)), [])
+    # 工作进程随提交的任务逐个fork出来，fork时当前进程不能持有磁盘缓存的连接
+    if disk_cache is not None:
+        disk_cache.close()
+    max_pending = jobs * PARALLEL_CHUNKS_PER_JOB
+    # 按输入顺序排队的[任务块, future]，future为None表示在当前进程中转换
+    pending = collections.deque()
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+    restarts = 0
+
+    def submit(chunk):
+        if executor is None:
+            return None
+        try:
+            return executor.submit(_generate_chunk, chunk, m_n_handling, m_n_policy, disk_cache)
+        except concurrent.futures.BrokenExecutor:
+            return None
+
+    try:
+        while True:
+            while len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append([chunk, submit(chunk)])
+            if not pending:
+                break
+
+            chunk, future = pending[0]
+            results = None
+            if future is not None:
+                try:
+                    results = future.result()
+                except concurrent.futures.BrokenExecutor:
+                    # 工作进程异常退出，进程池中所有未完成的任务都已失败，重建后重新提交
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    restarts += 1
+                    executor = None
+                    if restarts <= PARALLEL_MAX_RESTARTS:
+                        executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+                    for item in pending:
+                        item[1] = submit(item[0])
+                    continue
+                except Exception:
+                    # 记录转换出错（或异常无法传回），下面在当前进程中重新转换，在出错的记录处抛出原来的异常
+                    pass
+            pending.popleft()
+            if results is None:
+                yield from generate_tellraw_commands_many(chunk, m_n_handling, m_n_policy, disk_cache)
+                if disk_cache is not None and executor is not None:
+                    disk_cache.close()
+            else:
+                yield from results
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ==================== .mcfunction 文件转换 ====================
+# Java版JSON文本组件中的格式字段及对应的格式代码
+JSON_FORMAT_FIELDS = (
+    ('obfuscated', '§k'),
+    ('bold', '§l'),
+    ('strikethrough', '§m'),
+    ('underlined', '§n'),
+    ('italic', '§o'),
+)
+# 可以还原为§格式代码的JSON文本组件字段
+_JSON_TEXT_KEYS = frozenset(['text', 'color', 'extra'] + [field for field, _ in JSON_FORMAT_FIELDS])
+# 没有任何颜色和格式的样式
+_PLAIN_STYLE = (None, ())
+
+def _default_m_n_handling(message):
+    """命令行和文件模式下§m§n代码的默认处理方式"""
+    if '§m' in message or '§n' in message:
+        return "color"
+    return "none"
+
+def _collect_json_segments(component, style, segments):
+    """
+    将Java版JSON文本组件展开为(样式, 文本)片段，子组件继承父组件的样式
+    遇到无法还原的内容（selector、score、translate、点击事件、十六进制颜色等）时返回False
+    """
+    if isinstance(component, str):
+        segments.append((style, component))
+        return True
+    if isinstance(component, list):
+        if not component:
+            return True
+        # 列表中第一个组件的样式会被后面的组件继承
+        if not _collect_json_segments(component[0], style, segments):
+            return False
+        if isinstance(component[0], dict):
+            style = _json_component_style(component[0], style)
+            if style is None:
+                return False
+        return all(_collect_json_segments(child, style, segments) for child in component[1:])
+    if not isinstance(component, dict) or not isinstance(component.get('text'), str):
+        return False
+    if not _JSON_TEXT_KEYS.issuperset(component):
+        return False
+    style = _json_component_style(component, style)
+    if style is None:
+        return False
+    segments.append((style, component['text']))
+    extra = component.get('extra', [])
+    if not isinstance(extra, list):
+        return False
+    return all(_collect_json_segments(child, style, segments) for child in extra)
+
+def _json_component_style(component, style):
+    """合并组件自身的颜色和格式与继承的样式，返回(颜色代码, 格式代码元组)，无法还原时返回None"""
+    color, formats = style
+    if 'color' in component:
+        color = JAVA_COLORS.get(component['color'])
+        if color is None:
+            return None
+    active = set(formats)
+    for field, code in JSON_FORMAT_FIELDS:
+        value = component.get(field)
+        if value is True:
+            active.add(code)
+        elif value is False:
+            active.discard(code)
+        elif value is not None:
+            return None
+    return color, tuple(code for _, code in JSON_FORMAT_FIELDS if code in active)
+
+def _segments_to_message(segments):
+    """将(样式, 文本)片段拼接为带§格式代码的消息"""
+    parts = []
+    current = _PLAIN_STYLE
+    for style, text in segments:
+        if not text:
+            continue
+        if style != current:
+            color, formats = style
+            if color:
+                # 颜色代码会同时清除之前的格式
+                parts.append(color)
+            elif current != _PLAIN_STYLE:
+                parts.append('§r')
+            parts.extend(formats)
+            current = style
+        parts.append(text)
+    return ''.join(parts)
+
+def tellraw_text_to_message(text):
+    """
+    将tellraw命令中的文本部分还原为带§格式代码的消息
+    支持基岩版rawtext、Java版JSON文本组件和纯文本，返回(消息, m_n_handling)；
+    包含无法还原的内容或以{、[开头但不是有效的JSON时返回None
+    """
+    try:
+        component = json.loads(text)
+    except ValueError:
+        if text[:1] in ('{', '['):
+            # 格式错误的JSON不能当作纯文本，否则错误的命令会被改写成另一条有效的命令
+            return None
+        # 不是JSON，按纯文本处理
+        return text, _default_m_n_handling(text)
+
+    if isinstance(component, dict) and 'rawtext' in component:
+        # 基岩版格式：{"rawtext": [{"text": "..."}]}
+        rawtext = component['rawtext']
+        if len(component) != 1 or not isinstance(rawtext, list):
+            return None
+        parts = []
+        for item in rawtext:
+            if not isinstance(item, dict) or len(item) != 1 or not isinstance(item.get('text'), str):
+                return None
+            parts.append(item['text'])
+        message = ''.join(parts)
+        return message, _default_m_n_handling(message)
+
+    segments = []
+    if not _collect_json_segments(component, _PLAIN_STYLE, segments):
+        return None
+    message = _segments_to_message(segments)
+    # Java版的§m§n来自删除线和下划线格式，转换时保持字体方式
+    if '§m' in message or '§n' in message:
+        return message, "font"
+    return message, "none"
+
+def split_tellraw_command(command):
+    """
+    拆分tellraw命令，返回(选择器, 文本部分)，不是tellraw命令时返回None
+    选择器参数区中可以包含空格，方括号、大括号和引号内的内容不会被拆开；
+    带引号的玩家名作为一个整体，引号不成对时返回None
+    """
+    if not command.startswith('tellraw') or len(command) == 7 or not command[7].isspace():
+        return None
+    rest = command[7:].lstrip()
+    if not rest:
+        return None
+
+    end = 0
+    if rest[0] == '@':
+        end = 1
+        while end < len(rest) and (rest[end].isalnum() or rest[end] == '_'):
+            end += 1
+        if end < len(rest) and rest[end] == '[':
+            # 找到与参数区开头匹配的 ]
+            depth = 0
+            in_string = False
+            index = end
+            while index < len(rest):
+                char = rest[index]
+                if in_string:
+                    if char == '\\':
+                        index += 1
+                    elif char == '"':
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char in '[{':
+                    depth += 1
+                elif char in ']}':
+                    depth -= 1
+                    if depth == 0:
+                        break
+                index += 1
+            if index >= len(rest):
+                return None
+            end = index + 1
+    elif rest[0] == '"':
+        # 带引号的玩家名（基岩版允许名称中有空格），整体作为选择器
+        end = rest.find('"', 1) + 1
+        if end == 0 or (end < len(rest) and not rest[end].isspace()):
+            return None
+    else:
+        # 玩家名
+        while end < len(rest) and not rest[end].isspace():
+            end += 1
+
+    selector = rest[:end]
+    text = rest[end:].strip()
+    if not text:
+        return None
+    return selector, text
+
+def convert_mcfunction_line(line, target_version):
+    """
+    转换.mcfunction文件中的一行（bytes），返回(新行, 是否为已转换的tellraw命令)
+    不是tellraw命令的行原样返回，第二项为False；无法转换的tellraw命令也原样返回，第二项为None
+    """
+    if _stage_hooks:
+        start = time.perf_counter_ns()
+    body = line.rstrip(b'\r\n')
+    command = body.lstrip()
+    if command.startswith(b'/'):
+        command = command[1:]
+    if not command.startswith(b'tellraw'):
+        return line, False
+
+    try:
+        decoded = command.decode('utf-8')
+    except UnicodeDecodeError:
+        return line, False
+    parts = split_tellraw_command(decoded.rstrip())
+    if parts is None:
+        return line, None if decoded.startswith('tellraw') and decoded[7:8].isspace() else False
+    selector, text = parts
+    converted = tellraw_text_to_message(text)
+    if converted is None:
+        return line, None
+    message, m_n_handling = converted
+    if _stage_hooks:
+        _stage_done('scan', start)
+
+    # 只转换目标版本的消息
+    new_command = _default_converter.convert(selector, message, m_n_handling).command(target_version)
+    # 保留原行的缩进、斜杠、行尾空白和换行符
+    prefix = body[:len(body) - len(command)]
+    suffix = decoded[len(decoded.rstrip()):].encode('utf-8') + line[len(body):]
+    return prefix + new_command.encode('utf-8') + suffix, True
+
+# 统计行数时每次复制和计数的字节数
+LINE_COUNT_BLOCK_SIZE = 1 << 24
+
+def _convert_mcfunction_stream(src, dst, target_version):
+    """逐行读取转换，用于无法映射到内存的输入（如管道），返回(行数, 转换的命令数, 保持原样的tellraw命令数)"""
+    lines = 0
+    converted = 0
+    skipped = 0
+    for line in src:
+        lines += 1
+        new_line, was_tellraw = convert_mcfunction_line(line, target_version)
+        if was_tellraw is None:
+            skipped += 1
+        elif was_tellraw:
+            converted += 1
+            if _stage_hooks:
+                start = time.perf_counter_ns()
+                dst.write(new_line)
+                _stage_done('write', start)
+                continue
+        dst.write(new_line)
+    return lines, converted, skipped
+
+def _count_lines(data, start, end):
+    """统计data[start:end]中的行数（换行符个数），分块复制，避免一次复制整个文件"""
+    count = 0
+    while start < end:
+        block_end = min(start + LINE_COUNT_BLOCK_SIZE, end)
+        count += data[start:block_end].count(b'\n')
+        start = block_end
+    return count
+
+def _convert_mcfunction_mapped(data, dst, target_version):
+    """
+    转换映射到内存的文件内容，返回(转换的命令数, 保持原样的tellraw命令数)
+    用bytes查找定位所有包含tellraw的行，只解码和转换行首（去掉空白和斜杠后）是tellraw的行，
+    其余内容按原字节整段写出，不逐行处理。生成的文件中相同的命令行很常见，
+    转换结果按行缓存（最多BATCH_CACHE_SIZE条，超出后清空重新缓存）
+    """
+    size = len(data)
+    view = memoryview(data)
+    line_cache = {}
+    converted = 0
+    skipped = 0
+    written = 0
+    search = 0
+    try:
+        while True:
+            index = data.find(b'tellraw', search)
+            if index < 0:
+                break
+            line_start = data.rfind(b'\n', 0, index) + 1
+            line_end = data.find(b'\n', index)
+            line_end = size if line_end < 0 else line_end + 1
+            search = line_end
+            # 与convert_mcfunction_line相同：去掉行首空白后可以有一个斜杠
+            if data[line_start:index].lstrip() not in (b'', b'/'):
+                continue
+            line = data[line_start:line_end]
+            cached = line_cache.get(line)
+            if cached is None:
+                if len(line_cache) >= BATCH_CACHE_SIZE:
+                    line_cache.clear()
+                cached = line_cache[line] = convert_mcfunction_line(line, target_version)
+            new_line, was_tellraw = cached
+            if not was_tellraw:
+                if was_tellraw is None:
+                    skipped += 1
+                continue
+            converted += 1
+            if _stage_hooks:
+                start = time.perf_counter_ns()
+                dst.write(view[written:line_start])
+                dst.write(new_line)
+                _stage_done('write', start)
+            else:
+                dst.write(view[written:line_start])
+                dst.write(new_line)
+            written = line_end
+        dst.write(view[written:size])
+    finally:
+        view.release()
+    return converted, skipped
+
+def convert_mcfunction(input_path, output_path, target_version):
+    """
+    转换.mcfunction文件：tellraw命令转换为目标版本（'java'或'bedrock'），其他行按原字节写出。
+    普通文件映射到内存，用bytes查找定位tellraw所在的行，只解码和转换这些行，其余内容整段复制；
+    无法映射的输入逐行流式转换。内存占用与文件大小无关，返回统计信息，
+    其中skipped_commands为无法转换而保持原样的tellraw命令数
+    """
+    if target_version not in ('java', 'bedrock'):
+        raise ValueError(f"未知的目标版本: {target_version}")
+    if os.path.exists(output_path) and os.path.samefile(input_path, output_path):
+        raise ValueError("输出文件不能与输入文件相同")
+
+    # 只有文件转换需要mmap
+    import mmap
+    start = time.perf_counter()
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        try:
+            data = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # 空文件、管道等无法映射的输入
+            data = None
+        if data is None:
+            lines, converted, skipped = _convert_mcfunction_stream(src, dst, target_version)
+        else:
+            with data:
+                converted, skipped = _convert_mcfunction_mapped(data, dst, target_version)
+                size = len(data)
+                lines = _count_lines(data, 0, size)
+                if size and data[size - 1] != 0x0a:
+                    # 最后一行没有换行符
+                    lines += 1
+    seconds = time.perf_counter() - start
+    return {
+        'lines': lines,
+        'converted': converted,
+        'skipped_commands': skipped,
+        'seconds': seconds,
+        'lines_per_second': lines / seconds if seconds > 0 else 0.0,
+    }
+
+# ==================== 数据包/行为包目录转换 ====================
+# 需要转换的函数文件扩展名，其他文件原样复制
+FUNCTION_FILE_EXTENSIONS = ('.mcfunction',)
+# 每个工作进程平均分到的任务块数，块越多负载越均衡，调度开销也越大
+PACK_CHUNKS_PER_JOB = 4
+
+def _collect_pack_files(input_dir, output_dir):
+    """按路径排序遍历目录，返回[(相对路径, 源文件, 目标文件, 文件大小)]"""
+    files = []
+    # input_dir为绝对路径，os.walk产生的路径都以它开头，直接截取比os.path.relpath快得多
+    prefix_length = len(os.path.join(input_dir, ''))
+    for root, dirs, names in os.walk(input_dir):
+        # 排序保证遍历顺序与文件系统无关
+        dirs.sort()
+        for name in sorted(names):
+            src = os.path.join(root, name)
+            rel = src[prefix_length:]
+            files.append((rel, src, os.path.join(output_dir, rel), os.path.getsize(src)))
+    return files
+
+def _chunk_files_by_size(files, chunk_count):
+    """
+    按文件大小将文件分成大致均衡的任务块：从大到小依次放入当前总大小最小的块
+    相同输入总是得到相同的分块结果
+    """
+    chunk_count = max(1, min(chunk_count, len(files)))
+    chunks = [[] for _ in range(chunk_count)]
+    sizes = [0] * chunk_count
+    for item in sorted(files, key=lambda item: (-item[3], item[0])):
+        index = sizes.index(min(sizes))
+        chunks[index].append(item)
+        sizes[index] += item[3]
+    return [chunk for chunk in chunks if chunk]
+
+def _convert_pack_chunk(chunk, target_version):
+    """转换一个任务块中的函数文件（在工作进程中执行），返回[(相对路径, 统计信息)]"""
+    results = []
+    for rel, src, dst, _ in chunk:
+        results.append((rel, convert_mcfunction(src, dst, target_version)))
+    return results
+
+# 增量转换时保存在输出目录中的清单文件名
+PACK_MANIFEST_NAME = '.tellraw_manifest.json'
+# 清单格式版本，格式改变时旧清单作废
+PACK_MANIFEST_VERSION = 1
+# 计算文件哈希时每次读取的字节数
+HASH_READ_SIZE = 1 << 20
+# 修改时间距记录时不足这么多纳秒的源文件，下次检查时仍计算哈希，
+# 避免同一时间精度内再次修改且大小不变的文件被误认为未改变
+PACK_MTIME_SLACK_NS = 2_000_000_000
+
+@functools.lru_cache(maxsize=None)
+def tool_fingerprint():
+    """tellraw.py源文件的SHA-256，转换规则或代码改变时随之改变"""
+    import hashlib
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _file_sha256(path):
+    """计算文件内容的SHA-256"""
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(HASH_READ_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def _pack_options(target_version):
+    """影响转换结果的选项，写入清单，与清单中的不同时全部重新转换"""
+    return {'target_version': target_version}
+
+def _load_pack_manifest(path, target_version):
+    """
+    读取增量转换清单，返回(上次输出的相对路径, 可复用的{相对路径: 条目})
+    清单不存在或无效时都为空；工具版本或选项不同时条目不可复用，但仍返回上次输出的文件
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return (), {}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('files'), dict):
+        return (), {}
+    files = manifest['files']
+    if (manifest.get('version') != PACK_MANIFEST_VERSION or manifest.get('tool') != tool_fingerprint()
+            or manifest.get('options') != _pack_options(target_version)):
+        return tuple(files), {}
+    return tuple(files), files
+
+def _save_pack_manifest(path, target_version, files):
+    """写入增量转换清单（先写临时文件再替换，中断时旧清单保持不变）"""
+    temp_path = path + '.tmp'
+    # json.dumps使用C实现的编码器，比逐块写出的json.dump快得多
+    text = json.dumps({'version': PACK_MANIFEST_VERSION, 'tool': tool_fingerprint(),
+                       'options': _pack_options(target_version), 'files': files},
+                      ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+def _pack_manifest_entry(src, dst, src_stat=None, sha256=None):
+    """
+    生成一个文件的清单条目：源文件的大小、修改时间和哈希，输出文件的大小和修改时间，
+    stable表示源文件的修改时间已足够久，下次可以只比较大小和修改时间
+    """
+    src_stat = src_stat or os.stat(src)
+    dst_stat = os.stat(dst)
+    return {
+        'size': src_stat.st_size,
+        'mtime_ns': src_stat.st_mtime_ns,
+        'stable': time.time_ns() - src_stat.st_mtime_ns > PACK_MTIME_SLACK_NS,
+        'sha256': sha256 or _file_sha256(src),
+        'output_size': dst_stat.st_size,
+        'output_mtime_ns': dst_stat.st_mtime_ns,
+    }
+
+def _pack_entry_unchanged(entry, src, dst):
+    """
+    检查文件自上次转换后是否未改变，返回更新后的清单条目，已改变时返回None
+    源文件大小和修改时间都相同且记录时已稳定时不再计算哈希，否则比较哈希。
+    输出文件被删除或修改过时也视为已改变
+    """
+    if not isinstance(entry, dict):
+        return None
+    try:
+        src_stat = os.stat(src)
+        dst_stat = os.stat(dst)
+    except OSError:
+        return None
+    if dst_stat.st_size != entry.get('output_size') or dst_stat.st_mtime_ns != entry.get('output_mtime_ns'):
+        return None
+    if src_stat.st_size != entry.get('size'):
+        return None
+    if src_stat.st_mtime_ns != entry.get('mtime_ns') or not entry.get('stable'):
+        sha256 = _file_sha256(src)
+        if sha256 != entry.get('sha256'):
+            return None
+        entry = _pack_manifest_entry(src, dst, src_stat, sha256)
+    return entry
+
+def convert_pack(input_dir, output_dir, target_version, jobs=None, incremental=False):
+    """
+    转换整个数据包或行为包目录：函数文件中的tellraw命令转换为目标版本，其他文件原样复制，
+    输出目录与输入目录结构相同。jobs为工作进程数（默认为CPU核心数），按文件大小分块并行转换
+    返回统计信息，其中files按相对路径排序，与进程数无关
+    incremental为True时在输出目录中保存清单（PACK_MANIFEST_NAME），记录每个源文件的哈希以及
+    工具版本和选项；再次转换时跳过源文件和输出文件都未改变的文件（输出保持原样），删除源文件已不存在的
+    输出文件，工具版本或选项改变时全部重新转换。跳过的文件数记录在skipped中，files和行数只统计本次转换的文件
+    """
+    if target_version not in ('java', 'bedrock'):
+        raise ValueError(f"未知的目标版本: {target_version}")
+    input_dir = os.path.abspath(input_dir)
+    output_dir = os.path.abspath(output_dir)
+    if output_dir == input_dir or output_dir.startswith(input_dir + os.sep):
+        raise ValueError("输出目录不能是输入目录或其子目录")
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    start = time.perf_counter()
+    manifest_path = os.path.join(output_dir, PACK_MANIFEST_NAME)
+    old_files, old_entries = _load_pack_manifest(manifest_path, target_version) if incremental else ((), {})
+    entries = {}
+    function_files = []
+    copied = 0
+    skipped = 0
+    made_dirs = set()
+    for item in _collect_pack_files(input_dir, output_dir):
+        rel, src, dst, _ = item
+        if incremental:
+            entry = _pack_entry_unchanged(old_entries.get(rel), src, dst)
+            if entry is not None:
+                entries[rel] = entry
+                skipped += 1
+                continue
+        dst_dir = os.path.dirname(dst)
+        if dst_dir not in made_dirs:
+            os.makedirs(dst_dir, exist_ok=True)
+            made_dirs.add(dst_dir)
+        if rel.endswith(FUNCTION_FILE_EXTENSIONS):
+            function_files.append(item)
+        else:
+            shutil.copyfile(src, dst)
+            if incremental:
+                entries[rel] = _pack_manifest_entry(src, dst)
+            copied += 1
+
+    converted_files = []
+    if jobs <= 1 or len(function_files) <= 1:
+        converted_files.extend(_convert_pack_chunk(function_files, target_version))
+    else:
+        # 只有多进程转换需要concurrent.futures（会导入logging等模块），避免拖慢启动
+        import concurrent.futures
+        chunks = _chunk_files_by_size(function_files, jobs * PACK_CHUNKS_PER_JOB)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(_convert_pack_chunk, chunk, target_version) for chunk in chunks]
+            for future in futures:
+                converted_files.extend(future.result())
+    file_stats = dict(converted_files)
+
+    if incremental:
+        paths = {item[0]: item for item in function_files}
+        for rel, _ in converted_files:
+            _, src, dst, _ = paths[rel]
+            entries[rel] = _pack_manifest_entry(src, dst)
+        # 删除源文件已不存在的输出文件
+        for rel in old_files:
+            if rel not in entries and not os.path.isabs(rel) and os.path.normpath(rel) == rel \
+                    and not rel.startswith(os.pardir):
+                try:
+                    os.remove(os.path.join(output_dir, rel))
+                except OSError:
+                    pass
+        # 没有任何改变时不重写清单
+        if entries != old_entries:
+            _save_pack_manifest(manifest_path, target_version, entries)
+
+    files = [(rel, file_stats[rel]) for rel in sorted(file_stats)]
+    seconds = time.perf_counter() - start
+    lines = sum(stats['lines'] for _, stats in files)
+    return {
+        'files': files,
+        'copied': copied,
+        'skipped': skipped,
+        'lines': lines,
+        'converted': sum(stats['converted'] for _, stats in files),
+        'skipped_commands': sum(stats['skipped_commands'] for _, stats in files),
+        'seconds': seconds,
+        'lines_per_second': lines / seconds if seconds > 0 else 0.0,
+    }
+
+# ==================== JSONL服务模式 ====================
+# 长期运行的进程从输入流逐行读取JSON请求，每个请求输出一行JSON响应，
+# 免去每条命令都启动解释器、加载提示文件和编译正则表达式的开销
+
+TARGET_VERSIONS = ('java', 'bedrock')
+
+# 服务模式支持的§m/§n处理方式，混合模式按请求中的m_n_decisions决定，不会询问用户
+SERVICE_M_N_HANDLINGS = frozenset(['none', 'color', 'font', 'mixed'])
+
+# 每次从输入流读取的最大字节数
+SERVE_READ_SIZE = 65536
+
+def service_converter():
+    """服务模式使用的转换器：混合模式下不询问用户，请求没有指定的§m/§n按字体方式处理"""
+    return TellrawConverter(m_n_policy=MNDecisionPolicy(record=False))
+
+# convert_request没有传入转换器时使用，不缓存消息
+_service_converter = TellrawConverter(message_cache_size=0, m_n_policy=MNDecisionPolicy(record=False))
+
+def convert_request(request, converter=None):
+    """
+    处理一个转换请求，返回响应字典
+    请求格式：{"id": 任意值（可选）, "selector": 选择器, "message": 消息,
+              "m_n_handling": none|color|font|mixed（可选，默认按消息是否包含§m/§n决定）,
+              "m_n_decisions": 混合模式下的§m/§n决策表（可选，格式见normalize_m_n_decisions）,
+              "targets": ["java", "bedrock"]（可选，默认两个版本）}
+    响应中每个目标版本包含command、removed_params和reminders，请求无效时抛出ValueError
+    """
+    if not isinstance(request, dict):
+        raise ValueError("请求必须是JSON对象")
+    selector = request.get('selector')
+    message = request.get('message')
+    if not isinstance(selector, str) or not isinstance(message, str):
+        raise ValueError("请求缺少字符串类型的selector或message")
+    m_n_handling = request.get('m_n_handling') or _default_m_n_handling(message)
+    # 先检查类型，列表、对象等不可哈希的值不能用于集合成员检查
+    if not isinstance(m_n_handling, str) or m_n_handling not in SERVICE_M_N_HANDLINGS:
+        raise ValueError(f"不支持的m_n_handling: {m_n_handling!r}")
+    targets = request.get('targets', TARGET_VERSIONS)
+    if isinstance(targets, str):
+        targets = [targets]
+    if (not isinstance(targets, (list, tuple)) or not targets
+            or any(not isinstance(target, str) or target not in TARGET_VERSIONS for target in targets)):
+        raise ValueError("targets只能包含java和bedrock")
+    m_n_decisions = normalize_m_n_decisions(request.get('m_n_decisions'))
+
+    result = (converter or _service_converter).convert(selector, message, m_n_handling, m_n_decisions)
+    response = {'id': request.get('id')}
+    if 'java' in targets:
+        response['java'] = {
+            'command': result.java_command,
+            'removed_params': list(result.java_removed_params),
+            'reminders': list(result.java_reminders),
+        }
+    if 'bedrock' in targets:
+        response['bedrock'] = {
+            'command': result.bedrock_command,
+            'removed_params': list(result.bedrock_removed_params),
+            'reminders': list(result.bedrock_reminders),
+        }
+    response['was_converted'] = result.was_converted
+    response['converted_selector'] = result.converted_selector
+    return response
+
+def convert_request_line(line, converter=None):
+    """处理一行JSON请求（bytes或str），返回一行JSON响应（str，不含换行符）"""
+    request_id = None
+    try:
+        request = json.loads(line)
+        if isinstance(request, dict):
+            request_id = request.get('id')
+        response = convert_request(request, converter)
+    except (ValueError, RecursionError) as e:
+        # json.JSONDecodeError和UnicodeDecodeError都是ValueError的子类
+        response = {'id': request_id, 'error': str(e)}
+    except Exception as e:
+        # 其他意外错误也只影响这一个请求，服务不会因为某一行输入而退出
+        response = {'id': request_id, 'error': f"{type(e).__name__}: {e}"}
+    return json.dumps(response, ensure_ascii=False, separators=(',', ':'))
+
+def convert_request_lines(lines, converter=None):
+    """按顺序处理多行JSON请求，返回用换行符连接的响应（str，不含最后的换行符）"""
+    return '\n'.join([convert_request_line(line, converter) for line in lines])
+
+def serve_stdio(input_stream=None, output_stream=None):
+    """
+    JSONL服务模式：从input_stream（默认标准输入）逐行读取请求，向output_stream（默认标准输出）
+    按请求顺序逐行写出响应，空行被忽略，返回处理的请求数。
+    支持流水线：客户端可以连续发送多个请求而不必等待响应，每次读到的所有完整请求
+    处理完后合并写出并刷新一次
+    """
+    input_stream = input_stream or sys.stdin.buffer
+    output_stream = output_stream or sys.stdout.buffer
+    # read1最多进行一次底层读取，只返回当前已到达的数据，不会等待缓冲区填满
+    read = getattr(input_stream, 'read1', input_stream.read)
+    converter = service_converter()
+    handled = 0
+    pending = b''
+    while True:
+        chunk = read(SERVE_READ_SIZE)
+        if chunk:
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+        else:
+            # 输入结束，处理最后一行没有换行符的请求
+            lines = [pending]
+            pending = b''
+        lines = [line for line in lines if line.strip()]
+        if lines:
+            handled += len(lines)
+            output_stream.write((convert_request_lines(lines, converter) + '\n').encode('utf-8'))
+            output_stream.flush()
+        if not chunk:
+            return handled
+
+
+# ==================== 套接字服务 ====================
+# 与JSONL服务模式使用相同的请求和响应格式，每个连接可以连续发送多个请求（流水线），
+# 响应按请求顺序返回；转换在有界的线程池中进行，单个耗时的请求不会阻塞事件循环
+
+# 单行请求的最大字节数
+SOCKET_LINE_LIMIT = 1024 * 1024
+# 每个连接最多同时处理的请求批数，超出后暂停读取该连接的后续请求
+SOCKET_PIPELINE_DEPTH = 64
+# 默认工作线程数
+SOCKET_WORKERS = 4
+
+def parse_socket_address(address):
+    """解析 主机:端口 或 unix:路径 形式的地址，返回('tcp', 主机, 端口)或('unix', 路径, None)"""
+    if address.startswith('unix:'):
+        path = address[5:]
+        if not path:
+            raise ValueError("Unix套接字路径不能为空")
+        return 'unix', path, None
+    host, sep, port = address.rpartition(':')
+    if not sep or not port.isdigit() or int(port) > 65535:
+        raise ValueError(f"无效的地址: {address}（应为 主机:端口 或 unix:路径）")
+    # 允许 [::1]:8000 形式的IPv6地址
+    if host.startswith('[') and host.endswith(']'):
+        host = host[1:-1]
+    return 'tcp', host or None, int(port)
+
+def serve_socket(address, workers=SOCKET_WORKERS, pipeline_depth=SOCKET_PIPELINE_DEPTH, ready=None):
+    """
+    启动asyncio套接字服务，一直运行到被中断
+    address为 主机:端口（端口为0时自动分配）或 unix:路径；workers为转换线程数，
+    每次从连接读到的所有完整请求作为一批处理，同一时间排队和处理中的批数不超过 workers * pipeline_depth。
+    ready(地址列表)在开始监听后调用，可用于显示实际监听的地址
+    """
+    # 只有服务模式需要asyncio和concurrent.futures，避免拖慢命令行模式的启动
+    import asyncio
+    import concurrent.futures
+
+    kind, host, port = parse_socket_address(address)
+    if kind == 'unix' and not hasattr(asyncio, 'start_unix_server'):
+        raise ValueError("当前系统不支持Unix套接字")
+
+    converter = service_converter()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tellraw')
+
+    async def write_responses(writer, pending):
+        """
+        按请求顺序写出响应；连接断开后继续取出队列中的请求，直到收到None。
+        队列中的每一项是(future, 请求数)，一批请求处理失败时为其中每个请求写出一行错误响应，
+        后续请求的响应照常写出
+        """
+        broken = False
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            future, count = item
+            try:
+                response = await future
+            except Exception as e:
+                error = json.dumps({'id': None, 'error': f"{type(e).__name__}: {e}"},
+                                   ensure_ascii=False, separators=(',', ':'))
+                response = '\n'.join([error] * count)
+            if broken:
+                continue
+            try:
+                writer.write(response.encode('utf-8') + b'\n')
+                # 还有排队的响应时先不等待发送完成，多个响应合并发送
+                if pending.empty():
+                    await writer.drain()
+            except ConnectionError:
+                broken = True
+
+    async def handle_connection(reader, writer):
+        loop = asyncio.get_running_loop()
+        pending = asyncio.Queue(maxsize=pipeline_depth)
+        writer_task = asyncio.create_task(write_responses(writer, pending))
+        partial = b''
+        skipping = False
+        try:
+            while True:
+                try:
+                    chunk = await reader.read(SERVE_READ_SIZE)
+                except ConnectionError:
+                    break
+                data = partial + chunk
+                if skipping:
+                    # 丢弃过长请求的剩余部分，直到下一个换行符
+                    newline = chunk.find(b'\n')
+                    if newline == -1:
+                        if not chunk:
+                            break
+                        continue
+                    skipping = False
+                    data = chunk[newline + 1:]
+                if chunk:
+                    lines = data.split(b'\n')
+                    partial = lines.pop()
+                else:
+                    lines = [data]
+                lines = [line for line in lines if line.strip()]
+                if lines:
+                    # 已到达的所有完整请求作为一批交给线程池，减少线程切换
+                    await slots.acquire()
+                    future = loop.run_in_executor(executor, convert_request_lines, lines, converter)
+                    future.add_done_callback(lambda _: slots.release())
+                    await pending.put((future, len(lines)))
+                if not chunk:
+                    break
+                if len(partial) > SOCKET_LINE_LIMIT:
+                    # 请求超过长度限制，返回错误并跳过这一行，连接继续可用
+                    future = loop.create_future()
+                    future.set_result(json.dumps({'id': None, 'error': '请求过长'}, ensure_ascii=False, separators=(',', ':')))
+                    await pending.put((future, 1))
+                    partial = b''
+                    skipping = True
+        finally:
+            await pending.put(None)
+            await writer_task
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def run():
+        nonlocal slots
+        slots = asyncio.Semaphore(workers * pipeline_depth)
+        if kind == 'unix':
+            server = await asyncio.start_unix_server(handle_connection, path=host)
+        else:
+            server = await asyncio.start_server(handle_connection, host, port)
+        if ready is not None:
+            ready([sock.getsockname() for sock in server.sockets])
+        async with server:
+            await server.serve_forever()
+
+    slots = None
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ==================== HTTP服务 ====================
+# 只使用标准库的HTTP接口，请求和响应格式与JSONL服务模式相同：
+#   POST /convert        请求体为单个JSON对象，返回单个JSON对象
+#   POST /convert/batch  请求体为JSON数组或NDJSON（每行一个JSON对象），按相同格式返回，
+#                        响应以分块传输编码边转换边发送
+# 使用HTTP/1.1持久连接，客户端可以在同一连接上连续发送多个请求
+
+# 需要完整读入的请求体（单个请求和JSON数组）的最大字节数
+HTTP_MAX_BODY = 64 * 1024 * 1024
+# 流式响应每个分块的目标大小
+HTTP_STREAM_CHUNK_SIZE = 16 * 1024
+
+def _compact_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def _read_chunked_body(rfile):
+    """逐块读取分块传输编码的请求体"""
+    while True:
+        size_line = rfile.readline(1024)
+        try:
+            size = int(size_line.split(b';', 1)[0], 16)
+        except ValueError:
+            raise ValueError("无效的分块传输编码")
+        if size == 0:
+            # 跳过尾部字段直到空行
+            while rfile.readline(1024).strip():
+                pass
+            return
+        data = rfile.read(size)
+        if len(data) != size:
+            raise ValueError("请求体不完整")
+        rfile.readline(1024)
+        yield data
+
+def _read_sized_body(rfile, length):
+    """按Content-Length逐块读取请求体"""
+    while length > 0:
+        data = rfile.read(min(length, SERVE_READ_SIZE))
+        if not data:
+            raise ValueError("请求体不完整")
+        length -= len(data)
+        yield data
+
+def _ndjson_lines(chunks):
+    """把请求体分块拆分为非空行"""
+    partial = b''
+    for chunk in chunks:
+        lines = (partial + chunk).split(b'\n')
+        partial = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if partial.strip():
+        yield partial
+
+def _make_http_handler(converter):
+    """创建处理转换请求的HTTP请求处理类"""
+    # 只有HTTP服务模式需要http.server，避免拖慢命令行模式的启动
+    import http.server
+
+    class TellrawHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        server_version = 'tellraw'
+
+        def log_message(self, format, *args):
+            # 高吞吐量时逐条记录请求的开销太大，不输出访问日志
+            pass
+
+        def send_json(self, status, value):
+            body = _compact_json(value).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            if self.close_connection:
+                self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def body_chunks(self):
+            """请求体分块的迭代器，没有请求体时返回空迭代器"""
+            if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+                return _read_chunked_body(self.rfile)
+            length = self.headers.get('Content-Length', '0')
+            if not length.isdigit():
+                raise ValueError("无效的Content-Length")
+            return _read_sized_body(self.rfile, int(length))
+
+        def read_body(self):
+            """完整读入请求体，超过HTTP_MAX_BODY时抛出OverflowError"""
+            length = self.headers.get('Content-Length', '0')
+            if length.isdigit() and int(length) > HTTP_MAX_BODY:
+                raise OverflowError("请求体过大")
+            chunks = []
+            size = 0
+            for chunk in self.body_chunks():
+                size += len(chunk)
+                if size > HTTP_MAX_BODY:
+                    raise OverflowError("请求体过大")
+                chunks.append(chunk)
+            return b''.join(chunks)
+
+        def do_GET(self):
+            self.send_json(405 if self.path in ('/convert', '/convert/batch') else 404, {'error': '只支持POST请求'})
+
+        def do_POST(self):
+            try:
+                if self.path == '/convert':
+                    self.handle_convert()
+                elif self.path == '/convert/batch':
+                    self.handle_batch()
+                else:
+                    # 请求体没有读取，不能继续使用这个连接
+                    self.close_connection = True
+                    self.send_json(404, {'error': f'未知路径: {self.path}'})
+            except OverflowError as e:
+                # 剩余的请求体没有读取，不能继续使用这个连接
+                self.close_connection = True
+                self.send_json(413, {'error': str(e)})
+            except ValueError as e:
+                # 请求体格式错误（如分块编码无效）
+                self.close_connection = True
+                self.send_json(400, {'error': str(e)})
+
+        def handle_convert(self):
+            body = self.read_body()
+            try:
+                response = convert_request(json.loads(body), converter)
+            except (ValueError, RecursionError) as e:
+                # 请求体已经完整读取，连接可以继续使用
+                self.send_json(400, {'error': str(e)})
+                return
+            except Exception as e:
+                # 其他意外错误同样只影响这个请求，客户端收到错误响应而不是断开的连接
+                self.send_json(400, {'error': f"{type(e).__name__}: {e}"})
+                return
+            self.send_json(200, response)
+
+        def handle_batch(self):
+            content_type = self.headers.get('Content-Type', '')
+            if 'ndjson' in content_type or 'jsonl' in content_type:
+                # NDJSON边读边转换
+                lines = _ndjson_lines(self.body_chunks())
+                self.stream_responses((convert_request_line(line, converter) for line in lines), False)
+                return
+            body = self.read_body()
+            try:
+                requests = json.loads(body)
+            except ValueError as e:
+                self.send_json(400, {'error': str(e)})
+                return
+            if not isinstance(requests, list):
+                self.send_json(400, {'error': '批量请求必须是JSON数组或NDJSON'})
+                return
+            self.stream_responses((self.convert_item(request) for request in requests), True)
+
+        def convert_item(self, request):
+            request_id = request.get('id') if isinstance(request, dict) else None
+            try:
+                return _compact_json(convert_request(request, converter))
+            except (ValueError, RecursionError) as e:
+                return _compact_json({'id': request_id, 'error': str(e)})
+            except Exception as e:
+                # 其他意外错误只影响批量结果中的这一项
+                return _compact_json({'id': request_id, 'error': f"{type(e).__name__}: {e}"})
+
+        def stream_responses(self, responses, as_array):
+            """
+            以分块传输编码发送响应，as_array为True时输出JSON数组，否则输出NDJSON；
+            第一条结果立即发送，之后每积累HTTP_STREAM_CHUNK_SIZE字节发送一次
+            """
+            self.send_response(200)
+            self.send_header('Content-Type', ('application/json' if as_array else 'application/x-ndjson')
+                             + '; charset=utf-8')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            write = self.wfile.write
+            pieces = [b'['] if as_array else []
+            size = 0
+            count = 0
+            try:
+                for response in responses:
+                    data = response.encode('utf-8')
+                    if as_array:
+                        if count:
+                            pieces.append(b',')
+                        pieces.append(data)
+                    else:
+                        pieces.append(data + b'\n')
+                    size += len(data) + 1
+                    count += 1
+                    if count == 1 or size >= HTTP_STREAM_CHUNK_SIZE:
+                        block = b''.join(pieces)
+                        write(b'%x\r\n%s\r\n' % (len(block), block))
+                        self.wfile.flush()
+                        pieces = []
+                        size = 0
+            except ValueError:
+                # 响应头已经发出，读取NDJSON请求体出错时只能中断连接
+                self.close_connection = True
+                return
+            if as_array:
+                pieces.append(b']')
+            block = b''.join(pieces)
+            if block:
+                write(b'%x\r\n%s\r\n' % (len(block), block))
+            write(b'0\r\n\r\n')
+            self.wfile.flush()
+
+    return TellrawHTTPRequestHandler
+
+def serve_http(address, ready=None):
+    """
+    启动HTTP服务，一直运行到被中断；address为 主机:端口（端口为0时自动分配）
+    每个连接由单独的线程处理，ready(地址)在开始监听后调用
+    """
+    import http.server
+
+    kind, host, port = parse_socket_address(address)
+    if kind != 'tcp':
+        raise ValueError("HTTP服务只支持 主机:端口 形式的地址")
+    server = http.server.ThreadingHTTPServer((host or '', port), _make_http_handler(service_converter()))
+    server.daemon_threads = True
+    try:
+        if ready is not None:
+            ready(server.server_address)
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+def handle_m_n_codes(message):
+    """
+    处理§m§n代码，询问用户选择
+    选项1: Java版使用字体方式，基岩版使用颜色代码方式
+    选项2: Java版和基岩版都使用颜色代码方式
+    选项3: 混合模式：每次遇到§m§n都询问
+    """
+    if '§m' in message or '§n' in message:
+        print(get_prompts()["prompts"]["m_n_choice"])
+        
+        choice = input("请选择 (1/2/3): ").strip()
+        if choice == '1':
+            # Java版使用字体，基岩版使用颜色代码
+            return message, "font", None
+        elif choice == '2':
+            # 都使用颜色代码
+            return message, "color", None
+        elif choice == '3':
+            # 混合模式
+            return message, "mixed", None
+        else:
+            print("无效选择，默认使用选项1")
+            return message, "font", None
+    
+    return message, "none", None
+
+def get_user_input():
+    """获取用户交互式输入"""
+    print("=== Minecraft Tellraw 生成器 ===")
     
     # 输入目标选择器
-    selector = input(PROMPTS["prompts"]["selector_input"] + " ").strip()
+    selector = input(get_prompts()["prompts"]["selector_input"] + " ").strip()
     
     # 检测选择器类型
     selector_type = detect_selector_type(selector)
-    print(PROMPTS["prompts"]["selector_type"].format(selector_type))
+    print(get_prompts()["prompts"]["selector_type"].format(selector_type))
     
     # 输入文本消息
-    message = input(PROMPTS["prompts"]["message_input"] + " ").strip()
+    message = input(get_prompts()["prompts"]["message_input"] + " ").strip()
     
     # 处理§m§n代码
     message, m_n_option, _ = handle_m_n_codes(message)
@@ -3200,7 +4613,7 @@ def show_commands(java_cmd, bedrock_cmd, was_converted=False, original_selector=
     """显示生成的命令"""
     print("\n=== 生成的命令 ===")
     if was_converted:
-        print(PROMPTS["prompts"]["selector_conversion_note"].format(original_selector, converted_selector))
+        print(get_prompts()["prompts"]["selector_conversion_note"].format(original_selector, converted_selector))
     
     # 合并所有Java版提醒信息并去重
     all_java_reminders = []
@@ -3246,32 +4659,155 @@ def show_commands(java_cmd, bedrock_cmd, was_converted=False, original_selector=
     for reminder in bedrock_specific_reminders:
         print(f"注意: {reminder}")
     
-    print(PROMPTS["prompts"]["java_command"].format(java_cmd))
-    print(PROMPTS["prompts"]["bedrock_command"].format(bedrock_cmd))
+    print(get_prompts()["prompts"]["java_command"].format(java_cmd))
+    print(get_prompts()["prompts"]["bedrock_command"].format(bedrock_cmd))
+
+def show_result(result):
+    """显示TellrawResult中的命令和提醒"""
+    # 先生成两个版本的命令（混合模式下会询问用户），再显示提醒
+    java_cmd = result.java_command
+    bedrock_cmd = result.bedrock_command
+    show_commands(java_cmd, bedrock_cmd, result.was_converted, result.selector, result.converted_selector,
+                  result.java_removed_params, result.bedrock_removed_params,
+                  result.java_reminders, result.bedrock_reminders)
 
 def main():
-    if len(sys.argv) == 3:
+    if len(sys.argv) > 2 and sys.argv[1] == '--profile':
+        # 性能分析：去掉--profile和输出前缀后照常运行，结束时写入分析结果
+        prefix = sys.argv[2]
+        del sys.argv[1:3]
+        try:
+            profile_call(prefix, _run_main)
+        finally:
+            print(f"性能分析结果已写入 {prefix}.pstats 和 {prefix}.folded", file=sys.stderr)
+    elif len(sys.argv) > 1 and sys.argv[1] == '--memory-report':
+        # 内存报告：去掉--memory-report后照常运行，结束时把报告输出到标准错误
+        del sys.argv[1]
+        report = MemoryReport()
+        try:
+            with report:
+                _run_main()
+        finally:
+            print(report.format_report(), file=sys.stderr)
+    else:
+        _run_main()
+
+def _run_main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--mcfunction':
+        # .mcfunction文件转换模式
+        if len(sys.argv) != 5 or sys.argv[4] not in ('java', 'bedrock'):
+            print(get_prompts()["prompts"]["usage"])
+            sys.exit(1)
+        try:
+            stats = convert_mcfunction(sys.argv[2], sys.argv[3], sys.argv[4])
+        except (OSError, ValueError) as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        print(f"已处理 {stats['lines']} 行，转换 {stats['converted']} 条tellraw命令，"
+              f"保留 {stats['skipped_commands']} 条无法转换的tellraw命令，"
+              f"耗时 {stats['seconds']:.3f} 秒（{stats['lines_per_second']:.0f} 行/秒）")
+    elif len(sys.argv) > 1 and sys.argv[1] == '--pack':
+        # 数据包/行为包目录转换模式
+        args = sys.argv[2:]
+        jobs = None
+        incremental = False
+        if '--incremental' in args:
+            args.remove('--incremental')
+            incremental = True
+        if len(args) == 5 and args[3] == '--jobs' and args[4].isdigit() and int(args[4]) > 0:
+            jobs = int(args[4])
+            args = args[:3]
+        if len(args) != 3 or args[2] not in ('java', 'bedrock'):
+            print(get_prompts()["prompts"]["usage"])
+            sys.exit(1)
+        try:
+            stats = convert_pack(args[0], args[1], args[2], jobs, incremental)
+        except (OSError, ValueError) as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        print(f"已转换 {len(stats['files'])} 个函数文件，复制 {stats['copied']} 个其他文件，"
+              f"跳过 {stats['skipped']} 个未改变的文件，"
+              f"共 {stats['lines']} 行，转换 {stats['converted']} 条tellraw命令，"
+              f"保留 {stats['skipped_commands']} 条无法转换的tellraw命令，"
+              f"耗时 {stats['seconds']:.3f} 秒（{stats['lines_per_second']:.0f} 行/秒）")
+    elif len(sys.argv) == 2 and sys.argv[1] == '--serve-stdio':
+        # JSONL服务模式
+        try:
+            serve_stdio()
+        except KeyboardInterrupt:
+            pass
+    elif len(sys.argv) > 1 and sys.argv[1] == '--serve-socket':
+        # 套接字服务模式
+        args = sys.argv[2:]
+        workers = SOCKET_WORKERS
+        if len(args) == 3 and args[1] == '--workers' and args[2].isdigit() and int(args[2]) > 0:
+            workers = int(args[2])
+            args = args[:1]
+        if len(args) != 1:
+            print(get_prompts()["prompts"]["usage"])
+            sys.exit(1)
+
+        def show_address(addresses):
+            for sock_address in addresses:
+                if isinstance(sock_address, tuple):
+                    sock_address = f'{sock_address[0]}:{sock_address[1]}'
+                print(f"正在监听 {sock_address}", flush=True)
+
+        try:
+            serve_socket(args[0], workers, ready=show_address)
+        except (OSError, ValueError) as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+    elif len(sys.argv) == 3 and sys.argv[1] == '--serve-http':
+        # HTTP服务模式
+        try:
+            serve_http(sys.argv[2], ready=lambda sock_address: print(
+                f"正在监听 http://{sock_address[0]}:{sock_address[1]}", flush=True))
+        except (OSError, ValueError) as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+    elif len(sys.argv) in (3, 5) and sys.argv[1] == '--m-n-decisions':
+        # 记录/重放混合模式：决策文件中已有的消息直接重放，新消息的每个§m/§n只询问一次并写入文件
+        try:
+            policy = MNDecisionPolicy.load(sys.argv[2], fallback=_mixed_m_n_callback)
+        except (OSError, ValueError) as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        if len(sys.argv) == 5:
+            selector, message = sys.argv[3], sys.argv[4]
+        else:
+            print("=== Minecraft Tellraw 生成器 ===")
+            selector = input(get_prompts()["prompts"]["selector_input"] + " ").strip()
+            print(get_prompts()["prompts"]["selector_type"].format(detect_selector_type(selector)))
+            message = input(get_prompts()["prompts"]["message_input"] + " ").strip()
+        m_n_option = "mixed" if '§m' in message or '§n' in message else "none"
+        converter = TellrawConverter(message_cache_size=0, m_n_policy=policy)
+        show_result(converter.convert(selector, message, m_n_option))
+        try:
+            policy.save(sys.argv[2])
+        except OSError as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+    elif len(sys.argv) == 3:
         # 命令行参数模式
         selector = sys.argv[1]
         message = sys.argv[2]
         
-        # 检查是否包含§m§n代码
-        if '§m' in message or '§n' in message:
-            # 在命令行模式下，如果包含§m§n代码，默认使用颜色代码方式
-            m_n_option = "color"
-        else:
-            m_n_option = "none"
+        # 在命令行模式下，如果包含§m§n代码，默认使用颜色代码方式
+        m_n_option = _default_m_n_handling(message)
         
-        java_cmd, bedrock_cmd, was_converted, converted_selector, java_removed_params, bedrock_removed_params, java_gamemode_reminders, bedrock_gamemode_reminders = generate_tellraw_commands(selector, message, m_n_option)
-        show_commands(java_cmd, bedrock_cmd, was_converted, selector, converted_selector, java_removed_params, bedrock_removed_params, java_gamemode_reminders, bedrock_gamemode_reminders)
+        show_result(_default_converter.convert(selector, message, m_n_option))
     elif len(sys.argv) == 1:
         # 交互式模式
         selector, message, m_n_option = get_user_input()
         
-        java_cmd, bedrock_cmd, was_converted, converted_selector, java_removed_params, bedrock_removed_params, java_gamemode_reminders, bedrock_gamemode_reminders = generate_tellraw_commands(selector, message, m_n_option)
-        show_commands(java_cmd, bedrock_cmd, was_converted, selector, converted_selector, java_removed_params, bedrock_removed_params, java_gamemode_reminders, bedrock_gamemode_reminders)
+        show_result(_default_converter.convert(selector, message, m_n_option))
     else:
-        print(PROMPTS["prompts"]["usage"])
+        print(get_prompts()["prompts"]["usage"])
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,486 @@
+"""
+tellraw.py的回归测试
+固定常见选择器和消息的转换结果（generate_tellraw_commands返回的元组），以及选择器转换重写后
+与最初版本结果不同的情况（有意的修复：level写在scores内、hasitem数量范围、gamemode反选、
+基岩版r/rm/rx/ry/l/lm转换等），重构后可以用来检查转换结果有没有改变。
+另外覆盖SNBT解析、hasitem字段分割、.mcfunction文件扫描和服务模式的错误处理
+运行：python -m pytest -q test_tellraw.py
+"""
+import io
+import json
+import random
+import re
+
+import pytest
+
+import tellraw
+
+
+# (选择器, 消息, m_n_handling, generate_tellraw_commands的结果)
+# 结果依次为Java版命令、基岩版命令、是否转换了选择器变量、转换后的选择器、
+# Java版移除的参数、基岩版移除的参数、Java版提醒、基岩版提醒
+CONVERSION_CASES = [
+    ('@a', '§aHello §lWorld', 'none',
+     ('tellraw @a {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      [])),
+    ('@p[r=10]', '§aHello §lWorld', 'none',
+     ('tellraw @p[distance=..10] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @p[r=10] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      ['基岩版r=10参数已转换为Java版distance=..10'])),
+    ('@a[tag=boss]', '§aHello §lWorld', 'none',
+     ('tellraw @a[tag=boss] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[tag=boss] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      [])),
+    ('@e[type=zombie,limit=3,sort=nearest]', '§aHello §lWorld', 'none',
+     ('tellraw @e[type=zombie,limit=3,sort=nearest] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @e[type=zombie,c=3] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      ['Java版limit=3参数已转换为基岩版c=3'],
+      ['Java版非@p/@a选择器的sort=nearest参数在基岩版中不支持，已移除'])),
+    ('@a[c=3]', '§aHello §lWorld', 'none',
+     ('tellraw @a[limit=3] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[c=3] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      ['基岩版c=3参数已转换为Java版limit=3'])),
+    ('@a[c=-2]', '§aHello §lWorld', 'none',
+     ('tellraw @a[limit=2,sort=furthest] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[c=-2] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      ['基岩版c=-2参数已转换为Java版limit=2,sort=furthest'])),
+    ('@a[l=10,lm=5]', '§aHello §lWorld', 'none',
+     ('tellraw @a[level=5..10] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[l=10,lm=5] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      ['基岩版lm=5,l=10参数已转换为Java版level=5..10'])),
+    ('@a[level=5..10]', '§aHello §lWorld', 'none',
+     ('tellraw @a[level=5..10] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[lm=5,l=10] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      ['Java版level=5..10参数已转换为基岩版lm=5,l=10'])),
+    ('@a[rx=45,rxm=-45,ry=90,rym=90]', '§aHello §lWorld', 'none',
+     ('tellraw @a[x_rotation=-45..45,y_rotation=90] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[rx=45,rxm=-45,ry=90,rym=90] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      ['基岩版rxm=-45,rx=45参数已转换为Java版x_rotation=-45..45', '基岩版rym=90,ry=90参数（相等值）已转换为Java版y_rotation=90'])),
+    ('@initiator[r=5]', '§aHello §lWorld', 'none',
+     ('tellraw @a[distance=..5] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @initiator[r=5] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      True, '@a[r=5]', [], [],
+      ['基岩版r参数已转换为Java版distance=..5', '基岩版选择器 @initiator 在Java版中不支持，已转换为 @a'],
+      ['基岩版r=5参数已转换为Java版distance=..5'])),
+    ('@a[hasitem={item=diamond,quantity=3..}]', '§aHello §lWorld', 'none',
+     ('tellraw @a[nbt={Inventory:[{id:"minecraft:diamond"}]}] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[hasitem={item=diamond,quantity=3..}] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'], [],
+      ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'],
+      [])),
+    ('@a[nbt={SelectedItem:{id:"minecraft:diamond_sword"}}]', '§aHello §lWorld', 'none',
+     ('tellraw @a[nbt={SelectedItem:{id:"minecraft:diamond_sword"}}] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[hasitem={item=diamond_sword,location=slot.weapon.mainhand}] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], ['nbt参数转换为hasitem参数，可能无法完全保留原意', 'nbt参数已转换为hasitem格式，可能无法完全保留原意'],
+      [],
+      [])),
+    ('@a[scores={a=!1}]', '§aHello §lWorld', 'none',
+     ('tellraw @a {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[scores={a=!1}] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, ['基岩版scores反选参数scores={a=!1}在Java版中不支持，已移除'], [],
+      [],
+      [])),
+    ('@s[distance=..5]', '§aHello §lWorld', 'none',
+     ('tellraw @s[distance=..5] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @s[r=5] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      ['Java版distance=..5参数已转换为基岩版r=5'])),
+    ('@a[gamemode=spectator]', '§aHello §lWorld', 'none',
+     ('tellraw @a[gamemode=spectator] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[m=survival] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      ['Java版旁观模式(gamemode=spectator)在基岩版中不支持，已转换为生存模式'],
+      [])),
+    ('@a[m=d]', '§aHello §lWorld', 'none',
+     ('tellraw @a[gamemode=survival] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @a[m=d] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      ['基岩版默认模式(m=d)在Java版中不支持，已转换为生存模式'])),
+    ('@a[sort=random]', '§aHello §lWorld', 'none',
+     ('tellraw @a[sort=random] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @r[c=9999] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      [],
+      ['Java版@a[sort=random]已转换为基岩版@r'])),
+    ('@a[limit=2,sort=random]', '§aHello §lWorld', 'none',
+     ('tellraw @a[limit=2,sort=random] {"text": "Hello ", "color": "green", "extra": [{"text": "World", "color": "green", "bold": true}]}',
+      'tellraw @r[c=2] {"rawtext": [{"text": "§aHello §lWorld"}]}',
+      False, None, [], [],
+      ['Java版limit=2参数已转换为基岩版c=2'],
+      ['Java版@a[sort=random]已转换为基岩版@r'])),
+    ('@a', '§m§nmix§r done', 'none',
+     ('tellraw @a {"text": "mix", "strikethrough": true, "underlined": true, "extra": [{"text": " done"}]}',
+      'tellraw @a {"rawtext": [{"text": "§m§nmix§r done"}]}',
+      False, None, [], [],
+      [],
+      [])),
+    ('@a', '§m§nmix§r done', 'color',
+     ('tellraw @a {"text": "mix", "color": "red", "extra": [{"text": " done"}]}',
+      'tellraw @a {"rawtext": [{"text": "§m§nmix§r done"}]}',
+      False, None, [], [],
+      [],
+      [])),
+    ('@a', '§m§nmix§r done', 'font',
+     ('tellraw @a {"text": "mix", "strikethrough": true, "underlined": true, "extra": [{"text": " done"}]}',
+      'tellraw @a {"rawtext": [{"text": "§m§nmix§r done"}]}',
+      False, None, [], [],
+      [],
+      [])),
+]
+
+# 与最初版本结果不同的情况，结果为修复后的转换结果
+CHANGED_CASES = [
+    ('@r[y=60, x_rotation=-34.., l=13, attributes=[{id:generic.max_health,base=20}], gamemode=!creative]', '§dworld ', 'none',
+     ('tellraw @r[y=60,x_rotation=-34..,l=13,attributes=[{id:generic.max_health,base=20}],gamemode=!creative] {"text": "world ", "color": "light_purple"}',
+      'tellraw @r[y=60,l=13,attributes=[{id:generic.max_health,base=20}],m=!creative,rxm=-34] {"rawtext": [{"text": "§dworld "}]}',
+      False, None, [], [],
+      [],
+      ['基岩版l=13参数已转换为Java版level=..13', 'Java版x_rotation=-34..参数已转换为基岩版rxm=-34'])),
+    ('@a[rm=9, sort=furthest, attributes=[{id:generic.max_health,base=20}], r=43, gamemode=!creative, limit=5]', '§1 \\§sworld §ra\nb', 'none',
+     ('tellraw @a[rm=9,sort=furthest,attributes=[{id:generic.max_health,base=20}],r=43,gamemode=!creative,limit=5] {"text": " \\\\", "color": "dark_blue", "extra": [{"text": "world ", "color": "aqua"}, {"text": "a\\nb"}]}',
+      'tellraw @a[rm=9,attributes=[{id:generic.max_health,base=20}],r=43,m=!creative,c=-5] {"rawtext": [{"text": "§1 \\\\§sworld §ra\\nb"}]}',
+      False, None, [], [],
+      ['Java版limit=5参数已转换为基岩版c=5'],
+      ['基岩版rm=9,r=43参数已转换为Java版distance=9..43', 'Java版sort=furthest已转换为基岩版c=-5'])),
+    ('@s[distance=13,attributes=[{id:generic.max_health,base=20}],l=3,l=14,family=monster,gamemode=!spectator]', '§n你好你好§m §p §o §v你好', 'none',
+     ('tellraw @s[distance=13,attributes=[{id:generic.max_health,base=20}],gamemode=!spectator,level=..3] {"text": "你好你好", "underlined": true, "extra": [{"text": " ", "underlined": true, "strikethrough": true}, {"text": " ", "underlined": true, "strikethrough": true, "color": "gold"}, {"text": " 你好", "underlined": true, "strikethrough": true, "color": "gold", "italic": true}]}',
+      'tellraw @s[attributes=[{id:generic.max_health,base=20}],l=3,l=14,family=monster,m=!survival,rm=13,r=13] {"rawtext": [{"text": "§n你好你好§m §p §o §v你好"}]}',
+      False, None, ['警告：基岩版family参数在Java版中没有直接对应的功能，已移除。建议使用type参数指定实体类型作为替代'], ['Java版反选旁观模式(gamemode=!spectator)在基岩版中不支持，已转换为反选生存模式'],
+      ['Java版反选旁观模式(gamemode=!spectator)在基岩版中不支持，已转换为反选生存模式'],
+      ['基岩版l=3参数已转换为Java版level=..3', 'Java版distance=13参数已转换为基岩版rm=13,r=13'])),
+    ('@s[attributes=[{id:generic.max_health,base=20}],hasitem={quantity=1..5,item=iron_sword}]', '§v"q"§va\nb§2a\nb§i ', 'none',
+     ('tellraw @s[attributes=[{id:generic.max_health,base=20}],nbt={Inventory:[{id:"minecraft:iron_sword"}]}] {"text": "\\"q\\"a\\nb", "color": "gold", "extra": [{"text": "a\\nb", "color": "dark_green"}, {"text": " ", "color": "gray"}]}',
+      'tellraw @s[attributes=[{id:generic.max_health,base=20}],hasitem={quantity=1..5,item=iron_sword}] {"rawtext": [{"text": "§v\\"q\\"§va\\nb§2a\\nb§i "}]}',
+      False, None, ['hasitem数量范围1..5取中间值3', 'hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'], [],
+      ['hasitem数量范围1..5取中间值3', 'hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'],
+      [])),
+    ('@s[z=62,attributes=[{id:generic.max_health,base=20}],hasitem={item=diamond,quantity=3..}]', '§q你好§o\\§e"q"  x§l\\', 'none',
+     ('tellraw @s[z=62,attributes=[{id:generic.max_health,base=20}],nbt={Inventory:[{id:"minecraft:diamond"}]}] {"text": "你好", "color": "green", "extra": [{"text": "\\\\", "color": "green", "italic": true}, {"text": "\\"q\\"  x", "color": "yellow", "italic": true}, {"text": "\\\\", "color": "yellow", "italic": true, "bold": true}]}',
+      'tellraw @s[z=62,attributes=[{id:generic.max_health,base=20}],hasitem={item=diamond,quantity=3..}] {"rawtext": [{"text": "§q你好§o\\\\§e\\"q\\"  x§l\\\\"}]}',
+      False, None, ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'], [],
+      ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'],
+      [])),
+    ('@a[type=!player,hasitem=[{item=iron_sword},{quantity=3..,item=diamond}],distance=..49,predicate=ns:p]', '§7"q"§2world §c 你好§k§g"q"', 'none',
+     ('tellraw @a[type=!player,nbt={Inventory:[{id:"minecraft:iron_sword"},{id:"minecraft:diamond"}]},distance=..49,predicate=ns:p] {"text": "\\"q\\"", "color": "gray", "extra": [{"text": "world ", "color": "dark_green"}, {"text": " 你好", "color": "red"}, {"text": "\\"q\\"", "color": "gold", "obfuscated": true}]}',
+      'tellraw @a[type=!player,hasitem=[{item=iron_sword},{item=diamond}],r=49] {"rawtext": [{"text": "§7\\"q\\"§2world §c 你好§k§g\\"q\\""}]}',
+      False, None, [], ['nbt参数转换为hasitem参数，可能无法完全保留原意', 'nbt参数已转换为hasitem格式，可能无法完全保留原意', '警告：Java版predicate参数在基岩版中不支持，已移除。基岩版中没有谓词系统'],
+      ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'],
+      ['Java版distance=..49参数已转换为基岩版r=49'])),
+    ('@v[scores={obj0=0,level=1}]', '', 'none',
+     ('tellraw @a[scores={obj0=0,level=1}] {"text": ""}',
+      'tellraw @v[scores={obj0=0,lm=1,l=1}] {"rawtext": [{"text": ""}]}',
+      True, '@a[scores={obj0=0,level=1}]', [], ['Java版level=1参数已转换为基岩版lm=1,l=1'],
+      ['基岩版选择器 @v 在Java版中不支持，已转换为 @a'],
+      [])),
+    ('@e[scores={obj0=!4,level=5},ry=-138]', '§m你好', 'none',
+     ('tellraw @e[y_rotation=..-138] {"text": "你好", "strikethrough": true}',
+      'tellraw @e[scores={obj0=!4,lm=5,l=5},ry=-138] {"rawtext": [{"text": "§m你好"}]}',
+      False, None, ['基岩版scores反选参数scores={obj0=!4,level=5}在Java版中不支持，已移除'], ['Java版level=5参数已转换为基岩版lm=5,l=5'],
+      [],
+      ['基岩版ry=-138参数已转换为Java版y_rotation=..-138'])),
+    ('@p[scores={obj0=..11,level=4}, c=5]', '§u§ra\nb', 'none',
+     ('tellraw @p[scores={obj0=..11,level=4},limit=5] {"text": "a\\nb"}',
+      'tellraw @p[scores={obj0=..11,lm=4,l=4},c=5] {"rawtext": [{"text": "§u§ra\\nb"}]}',
+      False, None, [], ['Java版level=4参数已转换为基岩版lm=4,l=4'],
+      [],
+      ['基岩版c=5参数已转换为Java版limit=5'])),
+    ('@v[scores = {obj0=11..,level=2},scores={obj0=11..13}]', 'Hello你好 x§9 ', 'none',
+     ('tellraw @a[scores={obj0=11..,level=2},scores={obj0=11..13}] {"text": "Hello你好 x", "extra": [{"text": " ", "color": "blue"}]}',
+      'tellraw @v[scores = {obj0=11..,level=2},scores={obj0=11..13}] {"rawtext": [{"text": "Hello你好 x§9 "}]}',
+      True, '@a[scores={obj0=11..,level=2},scores={obj0=11..13}]', [], [],
+      ['基岩版选择器 @v 在Java版中不支持，已转换为 @a'],
+      [])),
+    ('@v[scores = {obj0=2..5,obj1=!2..,level=4}, y_rotation=..-81]', '§a"q"§p\\§lworld ', 'none',
+     ('tellraw @a[y_rotation=..-81] {"text": "\\"q\\"", "color": "green", "extra": [{"text": "\\\\", "color": "gold"}, {"text": "world ", "color": "gold", "bold": true}]}',
+      'tellraw @v[scores = {obj0=2..5,obj1=!2..,level=4},ry=-81] {"rawtext": [{"text": "§a\\"q\\"§p\\\\§lworld "}]}',
+      True, '@a[scores={obj0=2..5,obj1=!2..,level=4},y_rotation=..-81]', ['基岩版scores反选参数scores={obj0=2..5,obj1=!2..,level=4}在Java版中不支持，已移除'], [],
+      ['基岩版选择器 @v 在Java版中不支持，已转换为 @a'],
+      ['Java版y_rotation=..-81参数已转换为基岩版ry=-81'])),
+    ('@p[nbt={Tags:["a","b"]},type=zombie,rym=107]', ' ', 'none',
+     ('tellraw @p[nbt={Tags:["a","b"]},type=zombie,y_rotation=107..] {"text": " "}',
+      'tellraw @p[type=zombie,rym=107] {"rawtext": [{"text": " "}]}',
+      False, None, [], ['警告：Java版nbt参数在基岩版中不支持，已尝试转换为hasitem参数，如果转换失败则已移除'],
+      [],
+      ['基岩版rym=107参数已转换为Java版y_rotation=107..'])),
+    ('@r[attributes=[{id:generic.max_health,base=20}],l=9]', '', 'none',
+     ('tellraw @r[attributes=[{id:generic.max_health,base=20}],level=..9] {"text": ""}',
+      'tellraw @r[attributes=[{id:generic.max_health,base=20}],l=9] {"rawtext": [{"text": ""}]}',
+      False, None, [], [],
+      [],
+      ['基岩版l=9参数已转换为Java版level=..9'])),
+    ('@p[attributes=[{id:generic.max_health,base=20}],rxm=29]', '', 'none',
+     ('tellraw @p[attributes=[{id:generic.max_health,base=20}],x_rotation=29..] {"text": ""}',
+      'tellraw @p[attributes=[{id:generic.max_health,base=20}],rxm=29] {"rawtext": [{"text": ""}]}',
+      False, None, [], [],
+      [],
+      ['基岩版rxm=29参数已转换为Java版x_rotation=29..'])),
+    ('@c[lm=3, lm=6, scores={obj0=2..,level=1}]', '', 'none',
+     ('tellraw @a[lm=6,scores={obj0=2..,level=1},level=3..] {"text": ""}',
+      'tellraw @c[lm=3,lm=6,scores={obj0=2..,lm=1,l=1}] {"rawtext": [{"text": ""}]}',
+      True, '@a[lm=3,lm=6,scores={obj0=2..,level=1}]', [], ['Java版level=1参数已转换为基岩版lm=1,l=1'],
+      ['基岩版lm参数已转换为Java版level=3..', '基岩版选择器 @c 在Java版中不支持，已转换为 @a'],
+      ['基岩版lm=3参数已转换为Java版level=3..'])),
+    ('@a[l=4,gamemode=creative,scores={obj0=13..13,obj1=7..,level=2}]', '§9 Hello§nHello\\', 'none',
+     ('tellraw @a[gamemode=creative,scores={obj0=13..13,obj1=7..,level=2},level=..4] {"text": " Hello", "color": "blue", "extra": [{"text": "Hello\\\\", "color": "blue", "underlined": true}]}',
+      'tellraw @a[l=4,m=creative,scores={obj0=13..13,obj1=7..,lm=2,l=2}] {"rawtext": [{"text": "§9 Hello§nHello\\\\"}]}',
+      False, None, [], ['Java版level=2参数已转换为基岩版lm=2,l=2', 'Java版gamemode=creative参数已转换为基岩版m=creative'],
+      [],
+      ['基岩版l=4参数已转换为Java版level=..4'])),
+    ('@v[lm=6, r=43, advancements={story/root=true}, dx=4, scores={obj0=5..20,level=3}]', ' §9\\', 'none',
+     ('tellraw @a[advancements={story/root=true},dx=4,scores={obj0=5..20,level=3},level=6..,distance=..43] {"text": " ", "extra": [{"text": "\\\\", "color": "blue"}]}',
+      'tellraw @v[lm=6,r=43,dx=4,scores={obj0=5..20,lm=3,l=3}] {"rawtext": [{"text": " §9\\\\"}]}',
+      True, '@a[lm=6,r=43,advancements={story/root=true},dx=4,scores={obj0=5..20,level=3}]', [], ['Java版level=3参数已转换为基岩版lm=3,l=3', '警告：Java版advancements参数在基岩版中不支持，已移除。基岩版中没有进度系统'],
+      ['基岩版lm参数已转换为Java版level=6..', '基岩版r参数已转换为Java版distance=..43', '基岩版选择器 @v 在Java版中不支持，已转换为 @a'],
+      ['基岩版r=43参数已转换为Java版distance=..43', '基岩版lm=6参数已转换为Java版level=6..'])),
+    ('@p[hasitem=[{item=diamond,quantity=3..},{item=iron_sword,slot=3,location=slot.inventory,quantity=1..5}],team=!blue,z=49,rx=-16,level=1..,team=]', '', 'none',
+     ('tellraw @p[nbt={Inventory:[{id:"minecraft:diamond"},{id:"minecraft:iron_sword",Slot:3b}]},team=!blue,z=49,rx=-16,level=1..,team=] {"text": ""}',
+      'tellraw @p[hasitem=[{item=diamond},{item=iron_sword,location=slot.hotbar,slot=3..3}],z=49,rx=-16,lm=1] {"rawtext": [{"text": ""}]}',
+      False, None, [], ['nbt参数转换为hasitem参数，可能无法完全保留原意', 'nbt参数已转换为hasitem格式，可能无法完全保留原意', '警告：Java版team参数在基岩版中不支持，已移除。基岩版中没有队伍系统的直接对应功能', '警告：Java版team参数在基岩版中不支持，已移除。基岩版中没有队伍系统的直接对应功能'],
+      ['hasitem数量范围1..5取中间值3', 'hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'],
+      ['基岩版rx=-16参数已转换为Java版x_rotation=..-16', 'Java版level=1..参数已转换为基岩版lm=1'])),
+    ('@r[distance=2..48,nbt={Inventory:[{id:"stone",Count:1b,Slot:0b}]},distance=23..,rm=5,family=monster,hasitem={quantity=0,item=iron_sword}]', '§e x\\§e §m', 'none',
+     ('tellraw @r[distance=2..48,nbt={Inventory:[{id:"stone",Count:1b,Slot:0b}]},distance=23..,nbt={Inventory:[{id:"minecraft:iron_sword"}]},distance=5..] {"text": " x\\\\ ", "color": "yellow"}',
+      'tellraw @r[hasitem={item=stone,quantity=1..,location=slot.weapon.mainhand},family=monster,hasitem={quantity=0,item=iron_sword},rm=2,r=48] {"rawtext": [{"text": "§e x\\\\§e §m"}]}',
+      False, None, ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段', '警告：基岩版family参数在Java版中没有直接对应的功能，已移除。建议使用type参数指定实体类型作为替代'], ['nbt参数转换为hasitem参数，可能无法完全保留原意', 'nbt参数已转换为hasitem格式，可能无法完全保留原意'],
+      ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'],
+      ['基岩版rm=5参数已转换为Java版distance=5..', 'Java版distance=2..48参数已转换为基岩版rm=2,r=48'])),
+    ('@s[x=-8,hasitem=[{item="golden_apple",quantity=3..},{item=minecraft:stick,quantity=!1}],predicate=ns:p,x_rotation=..84,lm=0,level=25]', '§4world  §ga\nb"q"', 'none',
+     ('tellraw @s[x=-8,nbt={Inventory:[{id:"minecraft:golden_apple"},{id:"minecraft:stick"}]},predicate=ns:p,x_rotation=..84,lm=0,level=25] {"text": "world  ", "color": "dark_red", "extra": [{"text": "a\\nb\\"q\\"", "color": "gold"}]}',
+      'tellraw @s[x=-8,hasitem=[{item=golden_apple},{item=stick}],rx=84,lm=25,l=25] {"rawtext": [{"text": "§4world  §ga\\nb\\"q\\""}]}',
+      False, None, [], ['nbt参数转换为hasitem参数，可能无法完全保留原意', 'nbt参数已转换为hasitem格式，可能无法完全保留原意', '警告：Java版predicate参数在基岩版中不支持，已移除。基岩版中没有谓词系统'],
+      ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'],
+      ['基岩版lm=0参数已转换为Java版level=0..', 'Java版x_rotation=..84参数已转换为基岩版rx=84', 'Java版level=25参数已转换为基岩版lm=25,l=25'])),
+    ('@s[nbt={Tags:["a","b"]},dx=6,m=5]', '§aworld §e x\\', 'none',
+     ('tellraw @s[nbt={Tags:["a","b"]},dx=6,gamemode=survival] {"text": "world ", "color": "green", "extra": [{"text": " x\\\\", "color": "yellow"}]}',
+      'tellraw @s[dx=6,m=5] {"rawtext": [{"text": "§aworld §e x\\\\"}]}',
+      False, None, [], ['警告：Java版nbt参数在基岩版中不支持，已尝试转换为hasitem参数，如果转换失败则已移除'],
+      [],
+      ['基岩版默认模式(m=5)在Java版中不支持，已转换为生存模式'])),
+    ('@e[m=adventure,attributes=[{id:generic.max_health,base=20}],tag=,limit=3]', '\\§9 §5 ', 'none',
+     ('tellraw @e[gamemode=adventure,attributes=[{id:generic.max_health,base=20}],tag=,limit=3] {"text": "\\\\", "extra": [{"text": " ", "color": "blue"}, {"text": " ", "color": "dark_purple"}]}',
+      'tellraw @e[m=adventure,attributes=[{id:generic.max_health,base=20}],tag=,c=3] {"rawtext": [{"text": "\\\\§9 §5 "}]}',
+      False, None, ['基岩版m=adventure参数已转换为Java版gamemode=adventure'], [],
+      ['Java版limit=3参数已转换为基岩版c=3'],
+      [])),
+    ('@s[nbt={Tags:["a","b"]}, m=d, m=5, dx=9, advancements={story/root=true}]', '§b §d"q"Hello', 'none',
+     ('tellraw @s[nbt={Tags:["a","b"]},gamemode=survival,gamemode=survival,dx=9,advancements={story/root=true}] {"text": " ", "color": "aqua", "extra": [{"text": "\\"q\\"Hello", "color": "light_purple"}]}',
+      'tellraw @s[m=d,m=5,dx=9] {"rawtext": [{"text": "§b §d\\"q\\"Hello"}]}',
+      False, None, [], ['警告：Java版nbt参数在基岩版中不支持，已尝试转换为hasitem参数，如果转换失败则已移除', '警告：Java版advancements参数在基岩版中不支持，已移除。基岩版中没有进度系统'],
+      [],
+      ['基岩版默认模式(m=d)在Java版中不支持，已转换为生存模式', '基岩版默认模式(m=5)在Java版中不支持，已转换为生存模式'])),
+    ('@p[y=40,attributes=[{id:generic.max_health,base=20}],lm=8,m=adventure,attributes=[{id:generic.max_health,base=20}],family=!zombie]', '"q"§o  你好Hello§g ', 'none',
+     ('tellraw @p[y=40,attributes=[{id:generic.max_health,base=20}],gamemode=adventure,attributes=[{id:generic.max_health,base=20}],level=8..] {"text": "\\"q\\"", "extra": [{"text": "  你好Hello", "italic": true}, {"text": " ", "italic": true, "color": "gold"}]}',
+      'tellraw @p[y=40,attributes=[{id:generic.max_health,base=20}],lm=8,m=adventure,attributes=[{id:generic.max_health,base=20}],family=!zombie] {"rawtext": [{"text": "\\"q\\"§o  你好Hello§g "}]}',
+      False, None, ['警告：基岩版family参数在Java版中没有直接对应的功能，已移除。建议使用type参数指定实体类型作为替代'], [],
+      [],
+      ['基岩版lm=8参数已转换为Java版level=8..'])),
+    ('@r[nbt={Inventory:[{id:"minecraft:diamond_sword",Count:2..5}]},m=adventure,distance=8..8,haspermission={camera=enabled,movement=disabled}]', 'HelloHello', 'none',
+     ('tellraw @r[nbt={Inventory:[{id:"minecraft:diamond_sword",Count:2..5}]},gamemode=adventure,distance=8..8] {"text": "HelloHello"}',
+      'tellraw @r[hasitem={item=diamond_sword,quantity=2..},m=adventure,haspermission={camera=enabled,movement=disabled},rm=8,r=8] {"rawtext": [{"text": "HelloHello"}]}',
+      False, None, ['警告：基岩版haspermission参数在Java版中没有对应的功能，已移除'], ['nbt参数转换为hasitem参数，可能无法完全保留原意', 'nbt参数已转换为hasitem格式，可能无法完全保留原意'],
+      [],
+      ['Java版distance=8..8参数已转换为基岩版rm=8,r=8'])),
+    ('@s[rym=172,attributes=[{id:generic.max_health,base=20}],x_rotation=-66,attributes=[{id:generic.max_health,base=20}],advancements={story/root=true},m=c]', '§7§u\\§3"q"§c你好', 'none',
+     ('tellraw @s[rym=172,attributes=[{id:generic.max_health,base=20}],x_rotation=-66,attributes=[{id:generic.max_health,base=20}],advancements={story/root=true},gamemode=creative] {"text": "\\\\", "color": "light_purple", "extra": [{"text": "\\"q\\"", "color": "dark_aqua"}, {"text": "你好", "color": "red"}]}',
+      'tellraw @s[rym=172,attributes=[{id:generic.max_health,base=20}],attributes=[{id:generic.max_health,base=20}],m=c,rxm=-66,rx=-66] {"rawtext": [{"text": "§7§u\\\\§3\\"q\\"§c你好"}]}',
+      False, None, ['基岩版m=c参数已转换为Java版gamemode=creative'], ['警告：Java版advancements参数在基岩版中不支持，已移除。基岩版中没有进度系统'],
+      [],
+      ['基岩版rym=172参数已转换为Java版y_rotation=172..', 'Java版x_rotation=-66参数已转换为基岩版rxm=-66,rx=-66'])),
+    ('@r[level=2..2,rym=97,scores={obj0=16..16,level=5}]', '', 'none',
+     ('tellraw @r[level=2..2,scores={obj0=16..16,level=5},y_rotation=97..] {"text": ""}',
+      'tellraw @r[rym=97,scores={obj0=16..16,lm=5,l=5},lm=2,l=2] {"rawtext": [{"text": ""}]}',
+      False, None, [], ['Java版level=5参数已转换为基岩版lm=5,l=5'],
+      [],
+      ['基岩版rym=97参数已转换为Java版y_rotation=97..', 'Java版level=2..2参数已转换为基岩版lm=2,l=2'])),
+    ('@a[attributes = [{id:generic.max_health,base=20}], dx=8, advancements={story/root=true}, y_rotation=135]', ' §v x§l"q"§q\\', 'none',
+     ('tellraw @a[attributes=[{id:generic.max_health,base=20}],dx=8,advancements={story/root=true},y_rotation=135] {"text": " ", "extra": [{"text": " x", "color": "gold"}, {"text": "\\"q\\"", "color": "gold", "bold": true}, {"text": "\\\\", "color": "green", "bold": true}]}',
+      'tellraw @a[attributes=[{id:generic.max_health,base=20}],dx=8,rym=135,ry=135] {"rawtext": [{"text": " §v x§l\\"q\\"§q\\\\"}]}',
+      False, None, [], ['警告：Java版advancements参数在基岩版中不支持，已移除。基岩版中没有进度系统'],
+      [],
+      ['Java版y_rotation=135参数已转换为基岩版rym=135,ry=135'])),
+    ('@p[rxm = -43,nbt={Inventory:[{id:"minecraft:diamond",Count:2..5}]},distance=24..,sort=nearest]', '§6world world  xworld Hello', 'none',
+     ('tellraw @p[rxm=-43,nbt={Inventory:[{id:"minecraft:diamond",Count:2b}]},distance=24..,sort=nearest] {"text": "world world  xworld Hello", "color": "gold"}',
+      'tellraw @p[rxm=-43,hasitem={item=diamond,quantity=2..},rm=24,c=9999] {"rawtext": [{"text": "§6world world  xworld Hello"}]}',
+      False, None, [], ['nbt参数转换为hasitem参数，可能无法完全保留原意', 'nbt参数已转换为hasitem格式，可能无法完全保留原意'],
+      [],
+      ['Java版distance=24..参数已转换为基岩版rm=24', 'Java版sort=nearest已转换为基岩版c=9999'])),
+    ('@r[sort = nearest,y_rotation=..14,name=Steve]', '§1world §u"q"§dHello', 'none',
+     ('tellraw @r[sort=nearest,y_rotation=..14,name=Steve] {"text": "world ", "color": "dark_blue", "extra": [{"text": "\\"q\\"Hello", "color": "light_purple"}]}',
+      'tellraw @r[name=Steve,ry=14,c=9999] {"rawtext": [{"text": "§1world §u\\"q\\"§dHello"}]}',
+      False, None, [], ['Java版sort=nearest已转换为基岩版c=9999'],
+      [],
+      ['Java版y_rotation=..14参数已转换为基岩版ry=14'])),
+    ('@s[attributes=[{id:generic.max_health,base=20}],dx=5,hasitem={item=iron_sword}]', '', 'none',
+     ('tellraw @s[attributes=[{id:generic.max_health,base=20}],dx=5,nbt={Inventory:[{id:"minecraft:iron_sword"}]}] {"text": ""}',
+      'tellraw @s[attributes=[{id:generic.max_health,base=20}],dx=5,hasitem={item=iron_sword}] {"rawtext": [{"text": ""}]}',
+      False, None, ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'], [],
+      ['hasitem参数已转换为nbt格式，可能无法完全保留原意', '注意：Java版NBT不需要Count值，hasitem的quantity参数未转换为NBT的Count字段'],
+      [])),
+]
+
+
+@pytest.mark.parametrize('selector, message, m_n_handling, expected', CONVERSION_CASES + CHANGED_CASES)
+def test_generate_tellraw_commands(selector, message, m_n_handling, expected):
+    assert tellraw.generate_tellraw_commands(selector, message, m_n_handling) == expected
+
+
+@pytest.mark.parametrize('selector, message, m_n_handling, expected', CONVERSION_CASES + CHANGED_CASES)
+def test_converter_result_matches_generate(selector, message, m_n_handling, expected):
+    """TellrawResult的各个属性和as_tuple与generate_tellraw_commands的结果一致"""
+    result = tellraw.TellrawConverter().convert(selector, message, m_n_handling)
+    assert result.java_command == expected[0]
+    assert result.bedrock_command == expected[1]
+    assert result.as_tuple() == expected
+
+
+def test_as_tuple_uses_cached_result():
+    """as_tuple不重新转换，返回的提醒是新建的列表"""
+    converter = tellraw.TellrawConverter(m_n_policy=tellraw.MNDecisionPolicy(record=False))
+    calls = []
+    java_text = converter.java_text
+    converter.java_text = lambda *args: calls.append(args) or java_text(*args)
+    result = converter.convert('@a[r=10]', '§m删除线§n下划线', 'mixed')
+    first = result.as_tuple()
+    assert result.as_tuple() == first
+    assert len(calls) == 1
+    first[7].append('额外的提醒')
+    assert '额外的提醒' not in result.bedrock_reminders
+
+
+def test_parse_snbt():
+    root = tellraw.parse_snbt('{SelectedItem:{id:"minecraft:stone",Count:3..}}')
+    assert root.kind == 'compound'
+    assert [(key, node.kind, node.raw) for key, node in root.walk()] == [
+        ('SelectedItem', 'compound', None),
+        ('id', 'string', '"minecraft:stone"'),
+        ('Count', 'range', '3..'),
+    ]
+
+
+@pytest.mark.parametrize('text', ['{a:', '{a:1', '}', '{a:[1,2}'])
+def test_parse_snbt_invalid(text):
+    with pytest.raises(ValueError):
+        tellraw.parse_snbt(text)
+
+
+def test_deeply_nested_snbt():
+    """显式栈解析，嵌套层数不受递归深度限制"""
+    depth = 10000
+    root = tellraw.parse_snbt('{a:' * depth + '1' + '}' * depth)
+    assert root.end == depth * 4 + 1
+
+
+def test_process_range_values():
+    assert (tellraw.process_range_values('nbt={Inventory:[{id:"a",Count:3..}]},tag=x')
+            == 'nbt={Inventory:[{id:"a",Count:3b}]},tag=x')
+
+
+def test_nbt_content_to_hasitem():
+    assert tellraw.try_convert_nbt_content_to_hasitem('{SelectedItem:{id:"minecraft:stone",Count:3b}}') == (
+        '{item=stone,quantity=3..,location=slot.weapon.mainhand}',
+        ['nbt参数转换为hasitem参数，可能无法完全保留原意'])
+
+
+def test_split_hasitem_fields_matches_lookahead():
+    """线性扫描与原来的正则前瞻分割结果相同"""
+    lookahead = re.compile(r',(?![^{}]*\})')
+    rng = random.Random(0)
+    for _ in range(20000):
+        text = ''.join(rng.choice('ab,{}=') for _ in range(rng.randint(0, 12)))
+        assert tellraw._split_hasitem_fields(text) == lookahead.split(text)
+
+
+# (原行, 转换为基岩版后的行)
+MCFUNCTION_BEDROCK_LINES = [
+    (b'tellraw @a {"text":"hi","color":"green"}\n', b'tellraw @a {"rawtext": [{"text": "\xc2\xa7ahi"}]}\n'),
+    # 保留缩进、斜杠、行尾空白和\r\n
+    (b'  /tellraw @p[r=5] "hi" \r\n', b'  /tellraw @p[r=5] {"rawtext": [{"text": "hi"}]} \r\n'),
+    # 带引号的玩家名作为一个整体
+    (b'tellraw "Player Name" "hi"\n', b'tellraw "Player Name" {"rawtext": [{"text": "hi"}]}\n'),
+    (b'say tellraw @a "hi"\n', b'say tellraw @a "hi"\n'),
+    (b'# tellraw @a "hi"\n', b'# tellraw @a "hi"\n'),
+]
+
+# 无法转换、原样保留并计入skipped_commands的tellraw命令
+MCFUNCTION_SKIPPED_LINES = [
+    b'tellraw @a {bad json\n',
+    b'tellraw @a [1,\n',
+    b'tellraw "Player Name {"text":"x"}\n',
+    b'tellraw @a\n',
+]
+
+
+@pytest.mark.parametrize('line, expected', MCFUNCTION_BEDROCK_LINES)
+def test_convert_mcfunction_line(line, expected):
+    assert tellraw.convert_mcfunction_line(line, 'bedrock')[0] == expected
+
+
+@pytest.mark.parametrize('line', MCFUNCTION_SKIPPED_LINES)
+def test_convert_mcfunction_line_keeps_malformed_commands(line):
+    assert tellraw.convert_mcfunction_line(line, 'java') == (line, None)
+
+
+def test_convert_mcfunction(tmp_path):
+    """映射到内存和逐行流式转换的结果相同"""
+    data = b''.join([line for line, _ in MCFUNCTION_BEDROCK_LINES] + MCFUNCTION_SKIPPED_LINES) + b'tellraw @a "end"'
+    src = tmp_path / 'in.mcfunction'
+    dst = tmp_path / 'out.mcfunction'
+    src.write_bytes(data)
+    stats = tellraw.convert_mcfunction(str(src), str(dst), 'bedrock')
+    assert stats['lines'] == len(MCFUNCTION_BEDROCK_LINES) + len(MCFUNCTION_SKIPPED_LINES) + 1
+    assert stats['converted'] == 4
+    assert stats['skipped_commands'] == len(MCFUNCTION_SKIPPED_LINES)
+    expected = b''.join([line for _, line in MCFUNCTION_BEDROCK_LINES] + MCFUNCTION_SKIPPED_LINES)
+    assert dst.read_bytes() == expected + b'tellraw @a {"rawtext": [{"text": "end"}]}'
+
+    streamed = io.BytesIO()
+    assert tellraw._convert_mcfunction_stream(io.BytesIO(data), streamed, 'bedrock') == (
+        stats['lines'], stats['converted'], stats['skipped_commands'])
+    assert streamed.getvalue() == dst.read_bytes()
+
+
+@pytest.mark.parametrize('request_line', [
+    '{"id": 1, "selector": "@a", "message": "hi", "m_n_handling": ["x"]}',
+    '{"id": 1, "selector": "@a", "message": "hi", "m_n_handling": {"a": 1}}',
+    '{"id": 1, "selector": "@a", "message": "hi", "targets": [["java"]]}',
+    '{"id": 1, "selector": "@a", "message": "hi", "m_n_decisions": [["font"]]}',
+    '{"id": 1, "selector": ["@a"], "message": "hi"}',
+])
+def test_convert_request_line_invalid(request_line):
+    response = json.loads(tellraw.convert_request_line(request_line))
+    assert response['id'] == 1
+    assert 'error' in response
+
+
+def test_serve_stdio_continues_after_errors():
+    requests = (b'{"id": 1, "selector": "@a", "message": "hi", "m_n_handling": ["x"]}\n'
+                b'not json\n'
+                b'\n'
+                b'{"id": 3, "selector": "@a[r=10]", "message": "\xc2\xa7ahi", "targets": "java"}\n')
+    output = io.BytesIO()
+    assert tellraw.serve_stdio(io.BytesIO(requests), output) == 3
+    responses = [json.loads(line) for line in output.getvalue().decode('utf-8').splitlines()]
+    assert [response['id'] for response in responses] == [1, None, 3]
+    assert 'error' in responses[0] and 'error' in responses[1]
+    assert responses[2]['java']['command'] == 'tellraw @a[distance=..10] {"text": "hi", "color": "green"}'
+    assert 'bedrock' not in responses[2]